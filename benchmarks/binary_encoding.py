@@ -0,0 +1,54 @@
+"""List representations: JSON against MessagePack and CBOR.
+
+Measures the body size, the server encoding time and the client decoding time.
+Run with ``python -m benchmarks.binary_encoding``.
+"""
+import json
+from typing import Any, Callable
+
+from flask import g
+
+from shadow_lib.api import representations
+from shadow_lib.api.schemas import BookSchema, OrderSchema
+
+from .common import bench_app, report, timed
+from .serializers import make_rows
+
+
+def formats() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    available = {"json": (representations.dumps, json.loads)}
+    if representations.orjson is not None:
+        available["json"] = (representations.dumps, representations.orjson.loads)
+    if representations.msgpack is not None:
+        available["msgpack"] = (representations.dumps_msgpack, representations.msgpack.unpackb)
+    if representations.cbor2 is not None:
+        available["cbor"] = (representations.dumps_cbor, representations.cbor2.loads)
+    return available
+
+
+def run(rows: int = 10000) -> None:
+    with bench_app() as app, app.test_request_context():
+        data = make_rows(rows)
+        g.current_user = data["users"][0]
+        payloads = {
+            "books": {"books": BookSchema(many=True).dump(data["books"])},
+            "orders": {"orders": OrderSchema(many=True).dump(data["orders"])},
+        }
+
+        table = []
+        for name, payload in payloads.items():
+            for encoding, (dumps, loads) in formats().items():
+                body = dumps(payload)
+                encode = timed(lambda: dumps(payload), repeat=10)
+                decode = timed(lambda: loads(body), repeat=10)
+                table.append([name, encoding, len(body), encode["median"], decode["median"]])
+
+        report(
+            f"Encode and decode {rows} rows",
+            ["payload", "format", "bytes", "encode ms", "decode ms"],
+            table,
+        )
+
+
+if __name__ == "__main__":
+    run()
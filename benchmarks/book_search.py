@@ -0,0 +1,64 @@
+"""Book search: legacy join + unique() against the semi-join search with facets.
+
+Run with ``python -m benchmarks.book_search``.
+"""
+from typing import Any
+
+from sqlalchemy import or_
+from sqlalchemy.sql import select
+
+from shadow_lib.models import Author, Book, BookAuthor, db
+
+from .common import QueryCounter, bench_app, create_catalogue, create_user, report, timed
+
+QUERIES = ["leopard", "calvino", "SKU-0001", "a"]
+
+
+def legacy_search(valid_filters: dict) -> list[Book]:
+    pattern = "%" + valid_filters["q"] + "%"
+    book_query = select(Book).join(BookAuthor).join(Author)
+    book_query = book_query.where(
+        or_(
+            Book.title.ilike(pattern),
+            Author.first_name.ilike(pattern),
+            Author.last_name.ilike(pattern),
+            Book.EAN.ilike(pattern),
+            Book.SKU.ilike(pattern),
+        )
+    )
+    return db.session.execute(book_query).unique().scalars().all()
+
+
+def run(books: int = 5000, authors: int = 1000) -> None:
+    strategies = {
+        "join + unique": lambda q: legacy_search({"q": q}),
+        "semi-join + facets": lambda q: Book.get_books_by_ids(Book.search_book_ids({"q": q})[0]),
+    }
+
+    with bench_app():
+        create_catalogue(create_user(), books=books, authors=authors, authors_per_book=(1, 5))
+
+        rows: list[list[Any]] = []
+        for q in QUERIES:
+            for name, search in strategies.items():
+
+                def once() -> int:
+                    results = len(search(q))
+                    db.session.expunge_all()
+                    return results
+
+                with QueryCounter() as counter:
+                    results = once()
+
+                timing = timed(once, repeat=10)
+                rows.append([q, name, results, counter.statements, counter.rows, timing["median"]])
+
+        report(
+            f"Search over {books} books with 1-5 authors each",
+            ["q", "strategy", "results", "statements", "db rows", "median ms"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+"""End of day returns: a close request per order against one bulk close.
+
+Each order borrows one copy of 3 books. Per order, every close pays the
+authentication, the load of the order with its borrowed books, its commit
+and the serialization of the order; the bulk close closes them all and
+restores their stock with two UPDATEs and one commit.
+Run with ``python -m benchmarks.bulk_close``.
+"""
+import statistics
+import time
+import uuid
+from datetime import date
+from typing import Any, Callable
+
+from flask.testing import FlaskClient
+
+from shadow_lib.models import Book, BorrowedBook, Customer, Order, db
+
+from .common import QueryCounter, bench_app, create_catalogue, create_user, report
+
+ORDERS = [10, 100, 500]
+
+
+def open_orders(customer_id: uuid.UUID, book_ids: list[uuid.UUID], count: int) -> list[str]:
+    orders = []
+    for index in range(count):
+        order = Order(customer_id=customer_id, due_date=date(2022, 1, 1))
+        lines = [book_ids[(index + offset) % len(book_ids)] for offset in range(3)]
+        order.borrowed_books = [BorrowedBook(book_id=book_id, qty=1) for book_id in lines]
+        orders.append(order)
+    db.session.add_all(orders)
+    db.session.commit()
+    order_ids = [str(order.id) for order in orders]
+    db.session.expunge_all()
+    return order_ids
+
+
+def close_one_by_one(client: FlaskClient, headers: dict[str, str], order_ids: list[str]) -> None:
+    for order_id in order_ids:
+        assert client.patch(f"/api/v1/orders/{order_id}/close", headers=headers).status_code == 200
+
+
+def close_at_once(client: FlaskClient, headers: dict[str, str], order_ids: list[str]) -> None:
+    res = client.patch("/api/v1/orders/close", json=dict(order_ids=order_ids), headers=headers)
+    assert list(res.json["orders"].values()) == ["closed"] * len(order_ids)
+
+
+def run(repeat: int = 5) -> None:
+    strategies: dict[str, Callable[[FlaskClient, dict[str, str], list[str]], None]] = {
+        "PATCH /orders/<id>/close": close_one_by_one,
+        "PATCH /orders/close": close_at_once,
+    }
+
+    with bench_app() as app:
+        user = create_user()
+        book_ids = create_catalogue(user, books=50, authors=10)
+        db.session.execute(Book.__table__.update().values(qty=0))
+        customer = Customer(fullname="bench", document_type="generic_id", document_id="1", created_by_id=user.id)
+        customer.save()
+        customer_id = customer.id
+
+        client = app.test_client()
+        token = client.post("/api/v1/login", json=dict(email=user.email, password="bench")).json["access_token"]
+        headers = {"authorization": f"Bearer {token}"}
+
+        rows: list[list[Any]] = []
+        for count in ORDERS:
+            for name, close in strategies.items():
+                durations, statements = [], 0
+                for _ in range(repeat):
+                    order_ids = open_orders(customer_id, book_ids, count)
+                    with QueryCounter() as counter:
+                        start = time.perf_counter()
+                        close(client, headers, order_ids)
+                        durations.append((time.perf_counter() - start) * 1000)
+                    statements = counter.statements
+                rows.append([count, name, statements, statistics.median(durations)])
+
+        report(
+            f"Closing 10 to {ORDERS[-1]} orders of 3 lines",
+            ["orders", "strategy", "statements", "median ms"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,190 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks run against the test database (``TestConfig``, configured through the
+``TEST_DB_*`` variables). Its tables are dropped and recreated on every run.
+"""
+import os
+import random
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Any, Callable, Generator, Iterable
+
+from flask import Flask
+from sqlalchemy import event
+
+from shadow_lib.app import create_app
+from shadow_lib.models import Author, Book, BookAuthor, User, db
+
+
+@contextmanager
+def bench_app() -> Generator[Flask, None, None]:
+    os.environ.setdefault("SHADOW_LIB_CONFIG_PATH", "shadow_lib.config.TestConfig")
+    app = create_app(testing=True)
+
+    with app.app_context():
+        db.drop_db()
+        db.init_db()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_db()
+
+
+def timed(fn: Callable[[], Any], repeat: int = 20, warmup: int = 2) -> dict[str, float]:
+    """Run ``fn`` and return its median, min and max duration in milliseconds"""
+    for _ in range(warmup):
+        fn()
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "max": max(durations),
+    }
+
+
+class QueryCounter:
+    """Count the statements sent to the database and the rows they returned"""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.rows = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):  # type: ignore
+        self.statements += 1
+        self.rows += max(cursor.rowcount, 0)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(db.get_engine(), "after_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        event.remove(db.get_engine(), "after_cursor_execute", self._count)
+
+
+def report(title: str, header: Iterable[str], rows: Iterable[Iterable[Any]]) -> None:
+    lines = [[str(cell) for cell in header]]
+    for row in rows:
+        lines.append([f"{cell:.2f}" if isinstance(cell, float) else str(cell) for cell in row])
+
+    widths = [max(len(line[i]) for line in lines) for i in range(len(lines[0]))]
+
+    print(f"\n{title}")
+    for index, line in enumerate(lines):
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+
+def create_user() -> User:
+    user = User(email=f"{uuid.uuid4()}@bench.com", password="bench", is_active=True)
+    user.save()
+    return user
+
+
+def create_catalogue(
+    user: User,
+    books: int,
+    authors: int,
+    authors_per_book: tuple[int, int] = (1, 5),
+    seed: int = 42,
+) -> list[uuid.UUID]:
+    """Bulk insert a synthetic catalogue where books have several authors"""
+    rnd = random.Random(seed)
+
+    author_rows = [
+        {
+            "id": uuid.uuid4(),
+            "first_name": rnd.choice(FIRST_NAMES),
+            "last_name": f"{rnd.choice(LAST_NAMES)}{index}",
+            "created_by_id": user.id,
+        }
+        for index in range(authors)
+    ]
+
+    book_rows = [
+        {
+            "id": uuid.uuid4(),
+            "title": f"{rnd.choice(TITLE_WORDS)} {rnd.choice(TITLE_WORDS)} {index}",
+            "EAN": f"{rnd.randrange(10**12):013d}",
+            "SKU": f"SKU-{index:06d}",
+            "release_date": date(1950, 1, 1) + timedelta(days=rnd.randrange(365 * 70)),
+            "qty": rnd.randrange(0, 30),
+            "created_by_id": user.id,
+        }
+        for index in range(books)
+    ]
+
+    link_rows = [
+        {"book_id": book["id"], "author_id": author["id"]}
+        for book in book_rows
+        for author in rnd.sample(author_rows, rnd.randint(*authors_per_book))
+    ]
+
+    db.session.execute(Author.__table__.insert(), author_rows)
+    db.session.execute(Book.__table__.insert(), book_rows)
+    db.session.execute(BookAuthor.__table__.insert(), link_rows)
+    db.session.commit()
+
+    return [book["id"] for book in book_rows]
+
+
+FIRST_NAMES = [
+    "Alessandro",
+    "Beatrice",
+    "Carlo",
+    "Chiara",
+    "Dante",
+    "Elena",
+    "Francesca",
+    "Giovanni",
+    "Italo",
+    "Lucia",
+    "Natalia",
+    "Primo",
+    "Umberto",
+    "Grazia",
+]
+
+LAST_NAMES = [
+    "Alighieri",
+    "Calvino",
+    "Deledda",
+    "Eco",
+    "Ferrante",
+    "Ginzburg",
+    "Levi",
+    "Manzoni",
+    "Morante",
+    "Pavese",
+    "Pirandello",
+    "Sciascia",
+    "Svevo",
+    "Verga",
+]
+
+TITLE_WORDS = [
+    "baron",
+    "castle",
+    "city",
+    "conscience",
+    "garden",
+    "invisible",
+    "journey",
+    "leopard",
+    "moon",
+    "name",
+    "night",
+    "rose",
+    "sea",
+    "winter",
+]
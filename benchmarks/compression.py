@@ -0,0 +1,73 @@
+"""Response compression: CPU time against bytes saved, per encoding and level.
+
+Streamed bodies are compressed one row per chunk, as NDJSON lists would be.
+Run with ``python -m benchmarks.compression``.
+"""
+import json
+
+from flask import g
+
+from shadow_lib.api import compression
+from shadow_lib.api.representations import dumps
+from shadow_lib.api.schemas import BookSchema, CustomerSchema, OrderSchema
+
+from .common import bench_app, report, timed
+from .serializers import make_rows
+
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 11]
+
+
+def run(rows: int = 10000) -> None:
+    settings = [("gzip", "COMPRESSION_GZIP_LEVEL", level) for level in GZIP_LEVELS]
+    if compression.brotli is not None:
+        settings += [("br", "COMPRESSION_BROTLI_QUALITY", quality) for quality in BROTLI_QUALITIES]
+
+    with bench_app() as app, app.test_request_context():
+        data = make_rows(rows)
+        g.current_user = data["users"][0]
+        payloads = {
+            "books": BookSchema(many=True).dump(data["books"]),
+            "orders": OrderSchema(many=True).dump(data["orders"]),
+            "customers": CustomerSchema(many=True).dump(data["customers"]),
+        }
+
+        table = []
+        for name, items in payloads.items():
+            body = dumps({name: items})
+            lines = [json.dumps(item, default=str).encode() + b"\n" for item in items]
+
+            for encoding, setting, level in settings:
+                app.config[setting] = level
+                size = len(compression.compress(body, encoding))
+                whole = timed(lambda: compression.compress(body, encoding), repeat=5, warmup=1)
+
+                def stream() -> int:
+                    chunks = compression.compress_stream(lines, compression.compressor(encoding))
+                    return sum(len(chunk) for chunk in chunks)
+
+                streamed_size = stream()
+                streamed = timed(stream, repeat=5, warmup=1)
+
+                table.append(
+                    [
+                        name,
+                        f"{encoding} {level}",
+                        len(body),
+                        size,
+                        len(body) / size,
+                        whole["median"],
+                        streamed_size,
+                        streamed["median"],
+                    ]
+                )
+
+        report(
+            f"Compress {rows} rows",
+            ["payload", "encoding", "bytes", "compressed", "ratio", "median ms", "streamed", "streamed ms"],
+            table,
+        )
+
+
+if __name__ == "__main__":
+    run()
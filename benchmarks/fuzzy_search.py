@@ -0,0 +1,53 @@
+"""Fuzzy book search with misspelled queries: trigram GIN indexes against a sequential scan.
+
+Run with ``python -m benchmarks.fuzzy_search``.
+"""
+from typing import Any
+
+from sqlalchemy import text
+
+from shadow_lib.models import Book, db
+
+from .common import QueryCounter, bench_app, create_catalogue, create_user, report, timed
+
+# Broad misspellings match many rows, the numbered ones a handful
+QUERIES = ["Calvnio", "invisble citi", "Pirandelo1234", "leoprad gardn 12345"]
+
+
+def run(books: int = 50000, authors: int = 5000) -> None:
+    strategies = {
+        "gin index": "on",
+        "seq scan": "off",
+    }
+
+    with bench_app():
+        create_catalogue(create_user(), books=books, authors=authors, authors_per_book=(1, 3))
+        db.session.execute(text("ANALYZE"))
+
+        rows: list[list[Any]] = []
+        for q in QUERIES:
+            for name, index_scans in strategies.items():
+
+                def once() -> int:
+                    # The planner settings are transaction local, like the similarity threshold
+                    db.session.execute(text(f"SET LOCAL enable_bitmapscan = {index_scans}"))
+                    db.session.execute(text(f"SET LOCAL enable_indexscan = {index_scans}"))
+                    results = len(Book.search_book_ids({"q": q, "fuzzy": True})[0])
+                    db.session.rollback()
+                    return results
+
+                with QueryCounter() as counter:
+                    results = once()
+
+                timing = timed(once, repeat=10)
+                rows.append([q, name, results, counter.statements, timing["median"]])
+
+        report(
+            f"Fuzzy search over {books} books and {authors} authors",
+            ["q", "strategy", "results", "statements", "median ms"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,100 @@
+"""Checkout throughput on a single hot book, with and without holds.
+
+Each checkout waits for the customer to fill the order (``think`` ms), then
+places it. Without holds nothing is set aside meanwhile and the placement
+may find the copies gone; with holds one copy is held first, without
+locking the book row, and the placement confirms it.
+Run with ``python -m benchmarks.holds``.
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable
+
+from flask import Flask
+
+from shadow_lib.models import Book, BookHold, BorrowedBook, Customer, Order, User, db
+
+from .common import bench_app, create_catalogue, create_user, report
+
+
+def new_order(customer_id: uuid.UUID, book: Book) -> Order:
+    order = Order(customer_id=customer_id, due_date=date(2030, 1, 1))
+    order.borrowed_books = [BorrowedBook(book=book, qty=1)]
+    return order
+
+
+def checkout_without_hold(book_id: uuid.UUID, customer_id: uuid.UUID, user: User, think: float) -> bool:
+    time.sleep(think)
+    return not Order.place(new_order(customer_id, db.session.get(Book, book_id)))
+
+
+def checkout_with_hold(book_id: uuid.UUID, customer_id: uuid.UUID, user: User, think: float) -> bool:
+    hold = BookHold.place(book_id, 1, ttl=60, current_user=user)
+    db.session.commit()
+    if hold is None:
+        return False
+
+    time.sleep(think)
+    order = new_order(customer_id, db.session.get(Book, book_id))
+    order.hold_ids = [hold.id]
+    return not Order.place(order)
+
+
+def throughput(
+    app: Flask,
+    checkout: Callable[..., bool],
+    book_id: uuid.UUID,
+    customer_id: uuid.UUID,
+    user_id: uuid.UUID,
+    think: float,
+    checkouts: int,
+    workers: int,
+) -> float:
+    def run_one(_: int) -> bool:
+        with app.app_context():
+            try:
+                return checkout(book_id, customer_id, db.session.get(User, user_id), think)
+            finally:
+                db.session.remove()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        placed = sum(executor.map(run_one, range(checkouts)))
+    elapsed = time.perf_counter() - start
+
+    assert placed == checkouts
+    return checkouts / elapsed
+
+
+def run(checkouts: int = 200, workers: int = 8) -> None:
+    strategies: dict[str, Callable[..., bool]] = {
+        "place, no hold": checkout_without_hold,
+        "hold, then place": checkout_with_hold,
+    }
+
+    with bench_app() as app:
+        user = create_user()
+        book_id = create_catalogue(user, books=1, authors=1, authors_per_book=(1, 1))[0]
+        db.session.execute(Book.__table__.update().values(qty=10**6))
+        customer = Customer(fullname="bench", document_type="generic_id", document_id="1", created_by_id=user.id)
+        customer.save()
+        customer_id, user_id = customer.id, user.id
+        db.session.remove()
+
+        rows: list[list[Any]] = []
+        for think in [0.0, 0.005, 0.02]:
+            for name, checkout in strategies.items():
+                rate = throughput(app, checkout, book_id, customer_id, user_id, think, checkouts, workers)
+                rows.append([think * 1000, name, rate])
+
+        report(
+            f"{checkouts} checkouts of one hot book from {workers} threads",
+            ["think ms", "strategy", "checkouts/s"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,39 @@
+"""Encoding list responses: orjson against the stdlib json fallback.
+
+Run with ``python -m benchmarks.json_encoding``.
+"""
+from flask import g
+
+from shadow_lib.api import representations
+from shadow_lib.api.schemas import BookSchema, OrderSchema
+
+from .common import bench_app, report, timed
+from .serializers import make_rows
+
+
+def run(rows: int = 10000) -> None:
+    orjson = representations.orjson
+    encoders = {"stdlib json": None, "orjson": orjson} if orjson else {"stdlib json": None}
+
+    with bench_app() as app, app.test_request_context():
+        data = make_rows(rows)
+        g.current_user = data["users"][0]
+        payloads = {
+            "books": {"books": BookSchema(many=True).dump(data["books"])},
+            "orders": {"orders": OrderSchema(many=True).dump(data["orders"])},
+        }
+
+        table = []
+        for name, payload in payloads.items():
+            for encoder, module in encoders.items():
+                representations.orjson = module
+                size = len(representations.dumps(payload))
+                timing = timed(lambda: representations.dumps(payload), repeat=10)
+                table.append([name, encoder, size, timing["median"]])
+        representations.orjson = orjson
+
+        report(f"Encode {rows} rows", ["payload", "encoder", "bytes", "median ms"], table)
+
+
+if __name__ == "__main__":
+    run()
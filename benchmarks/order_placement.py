@@ -0,0 +1,78 @@
+"""Order placement: a stock UPDATE and a commit per line against Order.place.
+
+The per line strategy is what order creation did before: a conditional stock
+UPDATE committed for each line, then the order insert and its commit.
+Run with ``python -m benchmarks.order_placement``.
+"""
+import uuid
+from datetime import date
+from typing import Any, Callable
+
+from shadow_lib.models import Book, BorrowedBook, Customer, Order, db
+
+from .common import QueryCounter, bench_app, create_catalogue, create_user, report, timed
+
+LINES = [1, 5, 10, 25, 50]
+
+
+def new_order(customer_id: uuid.UUID, books: list[Book]) -> Order:
+    order = Order(customer_id=customer_id, due_date=date(2030, 1, 1))
+    order.borrowed_books = [BorrowedBook(book=book, qty=1) for book in books]
+    return order
+
+
+def place_per_line(order: Order) -> None:
+    with db.session.no_autoflush:
+        for br_book in order.borrowed_books:
+            if Book.decrement_stock(br_book.book.id, br_book.qty) is None:
+                raise RuntimeError("out of stock")
+            db.session.commit()
+
+    db.session.add(order)
+    db.session.commit()
+
+
+def place_at_once(order: Order) -> None:
+    if Order.place(order):
+        raise RuntimeError("out of stock")
+
+
+def run(books: int = 500) -> None:
+    strategies: dict[str, Callable[[Order], None]] = {
+        "commit per line": place_per_line,
+        "Order.place": place_at_once,
+    }
+
+    with bench_app():
+        user = create_user()
+        book_ids = create_catalogue(user, books=books, authors=50)
+        # Enough copies for every run
+        db.session.execute(Book.__table__.update().values(qty=10**6))
+        customer = Customer(fullname="bench", document_type="generic_id", document_id="1", created_by_id=user.id)
+        customer.save()
+        customer_id = customer.id
+
+        rows: list[list[Any]] = []
+        for lines in LINES:
+            for name, place in strategies.items():
+
+                def once() -> None:
+                    order_books = Book.get_books_by_ids(book_ids[:lines])
+                    place(new_order(customer_id, order_books))
+                    db.session.expunge_all()
+
+                with QueryCounter() as counter:
+                    once()
+
+                timing = timed(once, repeat=20)
+                rows.append([lines, name, counter.statements, timing["median"]])
+
+        report(
+            "Placing an order of 1 to 50 lines, one copy each",
+            ["lines", "strategy", "statements", "median ms"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,69 @@
+"""Per-request schema construction against the shared dump schemas.
+
+Each iteration is what one request does: get a schema and dump one object or
+a page of them. Allocations are measured with tracemalloc.
+Run with ``python -m benchmarks.schema_reuse``.
+"""
+import tracemalloc
+from typing import Any, Callable
+
+from flask import g
+
+from shadow_lib.api.schemas import BookSchema, OrderSchema, UserSchema, schema_dumper
+
+from .common import bench_app, report, timed
+from .serializers import make_rows
+
+
+def allocated(fn: Callable[[], Any], repeat: int = 200) -> float:
+    """Mean peak of the memory allocated during one call of ``fn``"""
+    fn()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            fn()
+            total += tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return total / repeat
+
+
+def run(page: int = 20) -> None:
+    with bench_app() as app, app.test_request_context():
+        data = make_rows(page + 2)
+        g.current_user = data["users"][0]
+
+        cases: dict[str, tuple[Callable[[], Any], Callable[[], Any]]] = {
+            "book": (
+                lambda: BookSchema().dump(data["books"][0]),
+                lambda: schema_dumper(BookSchema).dump(data["books"][0]),
+            ),
+            f"{page} orders": (
+                lambda: OrderSchema(many=True).dump(data["orders"][:page]),
+                lambda: schema_dumper(OrderSchema).dump(data["orders"][:page], many=True),
+            ),
+            "user": (
+                lambda: UserSchema(exclude=["password"]).dump(data["users"][0]),
+                lambda: schema_dumper(UserSchema, exclude=["password"]).dump(data["users"][0]),
+            ),
+        }
+
+        table = []
+        for name, (per_request, shared) in cases.items():
+            assert per_request() == shared()
+            for mode, fn in [("per request", per_request), ("shared", shared)]:
+                timing = timed(fn, repeat=500, warmup=20)
+                table.append([name, mode, timing["median"] * 1000, allocated(fn) / 1024])
+
+        report(
+            "Schema per request against shared dump schemas",
+            ["payload", "schema", "median us", "peak KiB"],
+            table,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,117 @@
+"""List serialization: marshmallow against the compiled dump functions.
+
+Objects are built in memory so only the serialization is measured.
+Run with ``python -m benchmarks.serializers``.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+from flask import g
+
+from shadow_lib.api.representations import dumps
+from shadow_lib.api.schemas import BookSchema, CustomerSchema, OrderSchema, UserSchema
+from shadow_lib.models import Author, Book, BorrowedBook, Customer, Order, User
+from shadow_lib.models.user import UserRoles
+
+from .common import bench_app, report, timed
+
+
+def make_rows(rows: int) -> dict[str, list[Any]]:
+    now = datetime(2023, 1, 1, 12, 30)
+    user = User(id=uuid.uuid4(), email="bench@bench.com", password="bench", role=UserRoles.user, is_active=True)
+    authors = [Author(id=uuid.uuid4(), first_name="Italo", last_name=f"Calvino{index}") for index in range(50)]
+    customer = Customer(id=uuid.uuid4(), fullname="Bench", document_type="passport", document_id="X1")
+
+    books = []
+    for index in range(rows):
+        book = Book(
+            id=uuid.uuid4(),
+            title=f"Book {index}",
+            EAN=f"{index:013d}",
+            SKU=f"SKU-{index:06d}",
+            release_date=date(2000, 1, 1) + timedelta(days=index % 8000),
+            qty=index % 30,
+            created_at=now,
+            updated_at=now,
+        )
+        book.created_by = user
+        first = index % 50
+        book.authors = authors[first:first + 3]
+        books.append(book)
+
+    orders = []
+    for index in range(rows):
+        order = Order(id=uuid.uuid4(), due_date=date(2023, 2, 1), has_been_returned=False, created_at=now, updated_at=now)
+        order.created_by = user
+        order.customer = customer
+        first = index % (rows - 2)
+        for book in books[first:first + 2]:
+            order.borrowed_books.append(BorrowedBook(id=uuid.uuid4(), book=book, qty=1, created_at=now, updated_at=now))
+        orders.append(order)
+
+    customers = [
+        Customer(
+            id=uuid.uuid4(),
+            fullname=f"Customer {index}",
+            document_type="passport",
+            document_id=f"D{index}",
+            created_by=user,
+            created_at=now,
+            updated_at=now,
+        )
+        for index in range(rows)
+    ]
+
+    users = [
+        User(
+            id=uuid.uuid4(),
+            email=f"user{index}@bench.com",
+            password="hash",
+            first_name="Bench",
+            last_name=f"User {index}",
+            role=UserRoles.user,
+            is_active=True,
+            created_at=now,
+            updated_at=now,
+        )
+        for index in range(rows)
+    ]
+
+    return {"books": books, "orders": orders, "customers": customers, "users": users}
+
+
+def run(rows: int = 10000) -> None:
+    with bench_app() as app, app.test_request_context():
+        data = make_rows(rows)
+        g.current_user = data["users"][0]
+
+        schemas: dict[str, tuple[Callable[[], Any], list[Any]]] = {
+            "BookSchema": (lambda: BookSchema(many=True), data["books"]),
+            "OrderSchema": (lambda: OrderSchema(many=True), data["orders"]),
+            "CustomerSchema": (lambda: CustomerSchema(many=True), data["customers"]),
+            "UserSchema": (lambda: UserSchema(many=True, exclude=["password"]), data["users"]),
+        }
+
+        def dump(make_schema: Callable[[], Any], objs: list[Any], compiled: bool) -> bytes:
+            app.config["COMPILED_SERIALIZERS"] = compiled
+            return dumps(make_schema().dump(objs))
+
+        table = []
+        for name, (make_schema, objs) in schemas.items():
+            assert dump(make_schema, objs, True) == dump(make_schema, objs, False)
+
+            reference = timed(lambda: dump(make_schema, objs, False), repeat=5, warmup=1)
+            compiled = timed(lambda: dump(make_schema, objs, True), repeat=5, warmup=1)
+            table.append([name, "marshmallow", reference["median"], 1.0])
+            table.append([name, "compiled", compiled["median"], reference["median"] / compiled["median"]])
+
+        report(
+            f"Dump {rows} rows",
+            ["schema", "serializer", "median ms", "speedup"],
+            table,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,78 @@
+"""Concurrent borrowings of one hot book, single row stock against stock slots.
+
+Each borrowing takes one copy, adds it to an order and commits. With the
+single row every borrowing queues on the book row until the one before
+commits; with stock slots they take their copy from a random free slot.
+``work`` is the time spent in the transaction after taking the copy.
+Run with ``python -m benchmarks.sharded_stock``.
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any
+
+from flask import Flask
+
+from shadow_lib.models import Book, BorrowedBook, Customer, Order, db
+
+from .common import bench_app, create_catalogue, create_user, report
+
+
+def borrow(book_id: uuid.UUID, order_id: uuid.UUID, work: float) -> bool:
+    if Book.decrement_stock(book_id, 1) is None:
+        return False
+
+    db.session.add(BorrowedBook(book_id=book_id, order_id=order_id, qty=1))
+    db.session.flush()
+    time.sleep(work)
+    db.session.commit()
+    return True
+
+
+def throughput(
+    app: Flask, book_id: uuid.UUID, order_id: uuid.UUID, work: float, borrowings: int, workers: int
+) -> float:
+    def run_one(_: int) -> bool:
+        with app.app_context():
+            try:
+                return borrow(book_id, order_id, work)
+            finally:
+                db.session.remove()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        borrowed = sum(executor.map(run_one, range(borrowings)))
+    elapsed = time.perf_counter() - start
+
+    assert borrowed == borrowings
+    return borrowings / elapsed
+
+
+def run(borrowings: int = 400, workers: int = 16) -> None:
+    with bench_app() as app:
+        user = create_user()
+        book_id = create_catalogue(user, books=1, authors=1, authors_per_book=(1, 1))[0]
+        customer = Customer(fullname="bench", document_type="generic_id", document_id="1", created_by_id=user.id)
+        customer.save()
+        order = Order(customer_id=customer.id, due_date=date(2030, 1, 1))
+        order.save()
+        order_id = order.id
+
+        rows: list[list[Any]] = []
+        for work in [0.0, 0.002, 0.005]:
+            for slots in [0, 4, 16]:
+                Book.shard_stock(book_id, slots, qty=10**6)
+                db.session.commit()
+                rate = throughput(app, book_id, order_id, work, borrowings, workers)
+                rows.append([work * 1000, "single row" if not slots else f"{slots} slots", rate])
+
+        report(
+            f"{borrowings} borrowings of one hot book from {workers} threads",
+            ["work ms", "stock", "borrowings/s"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,40 @@
+"""Added prefix indexes for suggestions
+
+Revision ID: 0a299c619cea
+Revises: fb2ff0d058c9
+Create Date: 2026-10-19 13:36:04.253155
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a299c619cea'
+down_revision = 'fb2ff0d058c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_books_title_prefix',
+        'books',
+        [sa.text('lower(title) text_pattern_ops')],
+    )
+    op.create_index(
+        'ix_authors_full_name_prefix',
+        'authors',
+        [sa.text("lower(first_name || ' ' || last_name) text_pattern_ops")],
+    )
+    op.create_index(
+        'ix_authors_last_name_prefix',
+        'authors',
+        [sa.text('lower(last_name) text_pattern_ops')],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_authors_last_name_prefix', table_name='authors')
+    op.drop_index('ix_authors_full_name_prefix', table_name='authors')
+    op.drop_index('ix_books_title_prefix', table_name='books')
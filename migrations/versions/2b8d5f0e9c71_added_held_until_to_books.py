@@ -0,0 +1,29 @@
+"""Added held_until to books
+
+Revision ID: 2b8d5f0e9c71
+Revises: f1c6d2e8b374
+Create Date: 2026-10-19 23:41:08.514230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2b8d5f0e9c71'
+down_revision = 'f1c6d2e8b374'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('books', sa.Column('held_until', sa.DateTime(timezone=True), nullable=True))
+    # Holds placed before the column existed are checked until they expire
+    op.execute(
+        "UPDATE books SET held_until = holds.expires_at "
+        "FROM (SELECT book_id, max(expires_at) AS expires_at FROM book_holds GROUP BY book_id) AS holds "
+        "WHERE books.id = holds.book_id"
+    )
+
+
+def downgrade():
+    op.drop_column('books', 'held_until')
@@ -0,0 +1,25 @@
+"""Added updated_at indexes for exports
+
+Revision ID: 3b9e2f6c1d84
+Revises: 6d1e4b0f7a2c
+Create Date: 2026-10-19 16:05:41.207318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e2f6c1d84'
+down_revision = '6d1e4b0f7a2c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_updated_at', 'orders', ['updated_at'])
+    op.create_index('ix_borrowed_books_updated_at', 'borrowed_books', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_borrowed_books_updated_at', table_name='borrowed_books')
+    op.drop_index('ix_orders_updated_at', table_name='orders')
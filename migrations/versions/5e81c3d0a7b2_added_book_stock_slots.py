@@ -0,0 +1,45 @@
+"""Added book stock slots
+
+Revision ID: 5e81c3d0a7b2
+Revises: 9c4a7e2b5f13
+Create Date: 2026-10-19 18:40:27.106532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5e81c3d0a7b2'
+down_revision = '9c4a7e2b5f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'books',
+        sa.Column('stock_slots', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.create_table(
+        'book_stock_slots',
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('slot', sa.Integer(), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.CheckConstraint('qty >= 0', name='ck_book_stock_slots_qty'),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id', 'slot')
+    )
+
+
+def downgrade():
+    # Copies in the slots go back to the shelf
+    op.execute(
+        'UPDATE books SET qty = books.qty + slots.qty '
+        'FROM (SELECT book_id, sum(qty) AS qty FROM book_stock_slots GROUP BY book_id) AS slots '
+        'WHERE books.id = slots.book_id'
+    )
+    op.drop_table('book_stock_slots')
+    op.drop_column('books', 'stock_slots')
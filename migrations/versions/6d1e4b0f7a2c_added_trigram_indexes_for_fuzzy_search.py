@@ -0,0 +1,37 @@
+"""Added trigram indexes for fuzzy search
+
+Revision ID: 6d1e4b0f7a2c
+Revises: 0a299c619cea
+Create Date: 2026-10-19 13:52:17.481920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1e4b0f7a2c'
+down_revision = '0a299c619cea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_books_title_trgm',
+        'books',
+        [sa.text('title gin_trgm_ops')],
+        postgresql_using='gin',
+    )
+    op.create_index(
+        'ix_authors_full_name_trgm',
+        'authors',
+        [sa.text("(first_name || ' ' || last_name) gin_trgm_ops")],
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    op.drop_index('ix_authors_full_name_trgm', table_name='authors')
+    op.drop_index('ix_books_title_trgm', table_name='books')
@@ -0,0 +1,43 @@
+"""Added book holds table
+
+Revision ID: 9c4a7e2b5f13
+Revises: 3b9e2f6c1d84
+Create Date: 2026-10-19 17:12:08.448913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '9c4a7e2b5f13'
+down_revision = '3b9e2f6c1d84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'book_holds',
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_by_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['created_by_id'], ['backoffice_users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_book_holds_book_id_expires_at',
+        'book_holds',
+        ['book_id', 'expires_at'],
+        postgresql_include=['qty'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_book_holds_book_id_expires_at', table_name='book_holds')
+    op.drop_table('book_holds')
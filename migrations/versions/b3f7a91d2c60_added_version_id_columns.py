@@ -0,0 +1,27 @@
+"""Added version_id columns for optimistic concurrency
+
+Revision ID: b3f7a91d2c60
+Revises: 5e81c3d0a7b2
+Create Date: 2026-10-19 20:05:41.381027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7a91d2c60'
+down_revision = '5e81c3d0a7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('books', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('orders', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('borrowed_books', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('borrowed_books', 'version_id')
+    op.drop_column('orders', 'version_id')
+    op.drop_column('books', 'version_id')
@@ -0,0 +1,29 @@
+"""Added overdue orders index
+
+Revision ID: e4a09b6c3f58
+Revises: d7f25c8e1a94
+Create Date: 2026-10-19 22:18:05.603917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4a09b6c3f58'
+down_revision = 'd7f25c8e1a94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_orders_overdue',
+        'orders',
+        ['due_date', 'id'],
+        postgresql_include=['customer_id'],
+        postgresql_where=sa.text('has_been_returned = false'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_orders_overdue', table_name='orders')
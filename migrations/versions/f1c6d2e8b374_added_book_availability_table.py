@@ -0,0 +1,45 @@
+"""Added book availability table
+
+Revision ID: f1c6d2e8b374
+Revises: e4a09b6c3f58
+Create Date: 2026-10-19 23:02:51.274130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d2e8b374'
+down_revision = 'e4a09b6c3f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'book_availability',
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('borrowed', sa.Integer(), nullable=False),
+        sa.Column('available', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id', 'shard')
+    )
+    # Counted once from the stock and the open orders, kept by the stock changes after
+    op.execute(
+        'INSERT INTO book_availability (created_at, updated_at, book_id, shard, borrowed, available) '
+        'SELECT now(), now(), books.id, 0, '
+        '(SELECT coalesce(sum(borrowed_books.qty), 0) FROM borrowed_books '
+        'JOIN orders ON orders.id = borrowed_books.order_id '
+        'WHERE borrowed_books.book_id = books.id AND orders.has_been_returned = false), '
+        'books.qty + (SELECT coalesce(sum(book_stock_slots.qty), 0) FROM book_stock_slots '
+        'WHERE book_stock_slots.book_id = books.id) '
+        'FROM books'
+    )
+
+
+def downgrade():
+    op.drop_table('book_availability')
@@ -20,7 +20,13 @@ setuptools.setup(
     use_scm_version=True,
     install_requires=REQUIRES,
     tests_require=DEV_REQUIRES,
-    extras_require={"dev": DEV_REQUIRES},
+    extras_require={
+        "dev": DEV_REQUIRES,
+        "fast": ["orjson"],
+        "cache": ["redis"],
+        "brotli": ["brotli"],
+        "binary": ["msgpack", "cbor2"],
+    },
     package_dir={"shadow_lib": "shadow_lib"},
-    packages=setuptools.find_packages(exclude=["tests", "migrations"]),
+    packages=setuptools.find_packages(exclude=["tests", "migrations", "benchmarks"]),
 )
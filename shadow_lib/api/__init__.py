@@ -1,6 +1,8 @@
 from flask import Blueprint
 from flask_restful import Api
 
+from . import representations
+from .representations import output_cbor, output_json, output_msgpack
 from .resources import (
     Login,
     RefreshToken,
@@ -18,18 +20,32 @@ from .resources import (
     BookDetailResource,
     BookListResource,
     BookSearchResource,
+    BookSuggestResource,
+    BookAvailabilityResource,
     CustomerDetailResource,
     CustomerListResource,
     OrderDetailResource,
     OrderListResource,
     OrderCloseResource,
+    OrderExportResource,
+    OrderOverdueResource,
+    OrdersCloseResource,
     BorrowedBookDetailResource,
     BorrowedBookListResource,
+    BorrowedBookExportResource,
+    BookHoldDetailResource,
+    BookHoldListResource,
 )
 
 api_blueprint = Blueprint("api", __name__, url_prefix="/api/v1")
 
 api = Api(api_blueprint)
+api.representation(representations.JSON_MIMETYPE)(output_json)
+if representations.msgpack is not None:
+    for mimetype in representations.MSGPACK_MIMETYPES:
+        api.representation(mimetype)(output_msgpack)
+if representations.cbor2 is not None:
+    api.representation(representations.CBOR_MIMETYPE)(output_cbor)
 
 # Swagger API
 api.add_resource(SwaggerView, "/docs", methods=["GET"])
@@ -51,6 +67,8 @@ api.add_resource(
 )
 api.add_resource(BookListResource, "/books", methods=["GET", "POST"])
 api.add_resource(BookSearchResource, "/books/search", methods=["GET"])
+api.add_resource(BookSuggestResource, "/books/suggest", methods=["GET"])
+api.add_resource(BookAvailabilityResource, "/books/availability", methods=["GET"])
 
 # Customer apis
 api.add_resource(
@@ -68,6 +86,9 @@ api.add_resource(
 )
 api.add_resource(OrderListResource, "/orders", methods=["GET", "POST"])
 api.add_resource(OrderCloseResource, "/orders/<uuid:order_id>/close", methods=["PATCH"])
+api.add_resource(OrderExportResource, "/orders/export", methods=["GET"])
+api.add_resource(OrderOverdueResource, "/orders/overdue", methods=["GET"])
+api.add_resource(OrdersCloseResource, "/orders/close", methods=["PATCH"])
 
 # BorrowedBook apis
 api.add_resource(
@@ -76,6 +97,13 @@ api.add_resource(
     methods=["GET", "PATCH", "DELETE"],
 )
 api.add_resource(BorrowedBookListResource, "/borrowed-books", methods=["GET", "POST"])
+api.add_resource(BorrowedBookExportResource, "/borrowed-books/export", methods=["GET"])
+
+# Hold apis
+api.add_resource(
+    BookHoldDetailResource, "/holds/<uuid:hold_id>", methods=["GET", "DELETE"]
+)
+api.add_resource(BookHoldListResource, "/holds", methods=["POST"])
 
 # User apis
 api.add_resource(
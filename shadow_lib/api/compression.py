@@ -0,0 +1,102 @@
+import zlib
+from typing import Any, Iterable, Iterator
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class _BrotliCompressor:
+    """``brotli.Compressor`` behind the ``zlib.compressobj`` interface"""
+
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self, mode: int = zlib.Z_FINISH) -> bytes:
+        if mode == zlib.Z_FINISH:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def available_encodings() -> list[str]:
+    # Preferred first when the client accepts both with the same quality
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compressor(encoding: str) -> Any:
+    if encoding == "br":
+        return _BrotliCompressor(current_app.config["COMPRESSION_BROTLI_QUALITY"])
+
+    # wbits 31 writes the gzip header and trailer around the deflate stream
+    return zlib.compressobj(
+        current_app.config["COMPRESSION_GZIP_LEVEL"], zlib.DEFLATED, 31
+    )
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressobj = compressor(encoding)
+    return compressobj.compress(data) + compressobj.flush()
+
+
+def compress_stream(chunks: Iterable[Any], compressobj: Any) -> Iterator[bytes]:
+    for chunk in chunks:
+        if not chunk:
+            continue
+
+        data = compressobj.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        # Sent with its chunk rather than left in the compressor until the end
+        yield data + compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    yield compressobj.flush()
+
+
+def compress_response(response: Response) -> Response:
+    """Compress the body with the best encoding the client accepts.
+
+    Bodies under ``COMPRESSION_MIN_SIZE`` are sent as they are, streamed
+    bodies are compressed chunk by chunk as they are produced.
+    """
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    if not response.is_streamed and (
+        response.direct_passthrough
+        or response.calculate_content_length()
+        < current_app.config["COMPRESSION_MIN_SIZE"]
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, compressor(encoding))
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body differs byte for byte from the identity one
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def init_app(app: Flask) -> None:
+    app.after_request(compress_response)
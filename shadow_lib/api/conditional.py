@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime
+from typing import Callable
+
+from flask import Response, abort, current_app, request
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+from shadow_lib.api.representations import encoders, negotiate
+from shadow_lib.models import CONFLICT_ERR_MESSAGE
+
+
+def validators(resource: str, version: tuple) -> dict[str, str]:
+    """ETag and Last-Modified headers for a payload identified by ``version``.
+
+    The version is what a cheap query returns for the payload (update times
+    and row counts), so the payload changes whenever the version does. The
+    ETag is strong, so it also covers the representation negotiated from
+    ``Accept``: JSON and MessagePack bodies are not byte-identical.
+    """
+    headers = {"ETag": quote_etag(entity_tag(resource, version, negotiate()))}
+
+    updates = [part for part in version if isinstance(part, datetime)]
+    if updates:
+        headers["Last-Modified"] = http_date(max(updates))
+
+    return headers
+
+
+def entity_tag(resource: str, version: tuple, mimetype: str) -> str:
+    identity = (resource, mimetype, version)
+    return hashlib.sha1(repr(identity).encode()).hexdigest()
+
+
+def is_not_modified(headers: dict[str, str], use_last_modified: bool = True) -> bool:
+    """Whether the client copy is still fresh, per If-None-Match or If-Modified-Since.
+
+    Deletes don't move the last update of a listing, so lists are only
+    compared by ETag.
+    """
+    return not is_resource_modified(
+        request.environ,
+        etag=headers["ETag"].strip('"'),
+        last_modified=headers.get("Last-Modified") if use_last_modified else None,
+    )
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    resp = Response(status=304, headers=headers)
+    # A 304 carries the same Vary as the 200 it stands for
+    resp.vary.add("Accept")
+    return resp
+
+
+def check_if_match(resource: str, version: Callable[[], tuple]) -> None:
+    """Abort with a 409 when the copy the client sent in If-Match is not current.
+
+    Check once the instance to write is loaded: a change committed after
+    that fails the write itself, on the row version. Only the version
+    matters, not the representation the ETag was read as: a copy read as
+    MessagePack can be written back as JSON, and the tag made weak by the
+    compression of the response still matches.
+    """
+    if not request.if_match:
+        return
+
+    current = version()
+    if not any(
+        request.if_match.contains_weak(entity_tag(resource, current, mimetype))
+        for mimetype in encoders()
+    ):
+        abort(409, CONFLICT_ERR_MESSAGE)
+
+
+def write_attempts() -> int:
+    """Attempts at a read-modify-write, retried unless the client sent If-Match"""
+    return 1 if request.if_match else current_app.config["CONFLICT_RETRIES"]
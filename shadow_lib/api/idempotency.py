@@ -0,0 +1,78 @@
+import hashlib
+import json
+from functools import wraps
+from typing import Any, Callable
+
+from flask import current_app, g, request
+from flask_restful.utils import unpack
+
+from shadow_lib.models import (
+    IDEMPOTENCY_KEY_LOST_ERR_MESSAGE,
+    IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE,
+    IdempotencyKey,
+    db,
+)
+
+from .representations import dumps
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+def request_hash() -> str:
+    parts = [request.method, request.path, request.get_data()]
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def replay(record: IdempotencyKey, request_hash: str) -> Any:
+    if record.request_hash != request_hash:
+        return {"message": IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE}, 422
+
+    record = IdempotencyKey.wait_for_response(
+        record, current_app.config["IDEMPOTENCY_KEY_WAIT"]
+    )
+    if record.status is None:
+        return {"message": IDEMPOTENCY_KEY_LOST_ERR_MESSAGE}, 409
+
+    return record.body, record.status, {"Idempotent-Replayed": "true"}
+
+
+def idempotent(fn: Callable) -> Callable:
+    """Answer the retries of a creation sending the same Idempotency-Key with its response.
+
+    Retries are answered from the stored response, without validating or
+    writing anything again. Only successful responses are stored: a failed
+    request wrote nothing, and its retry runs again.
+    """
+
+    @wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return fn(*args, **kwargs)
+
+        if not 1 <= len(key) <= 255:
+            return {IDEMPOTENCY_KEY_HEADER: ["Length must be between 1 and 255."]}, 422
+
+        user_id = g.current_user.id
+        fingerprint = request_hash()
+        record = IdempotencyKey.claim(
+            user_id, key, fingerprint, current_app.config["IDEMPOTENCY_KEY_TTL"]
+        )
+        if record is not None:
+            return replay(record, fingerprint)
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            raise
+
+        data, code, headers = unpack(result)
+        if 200 <= code < 300:
+            # Stored as the JSON representation encodes it
+            IdempotencyKey.store(user_id, key, code, json.loads(dumps(data)))
+        else:
+            IdempotencyKey.release(user_id, key)
+        return result
+
+    return wrapper
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import threading
+
+from flask import Flask, current_app
+from werkzeug.http import quote_etag
+
+from .representations import dumps
+
+_lock = threading.Lock()
+
+
+class OpenAPIDocument:
+    """Serialized OpenAPI document and its ETag"""
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.etag = quote_etag(hashlib.sha1(body).hexdigest())
+
+
+def build_document() -> bytes:
+    # Registering the paths needs the app, so it's done on first build
+    from shadow_lib.api.swaggers_paths import api_spec
+
+    return dumps(api_spec.to_dict())
+
+
+def openapi_document() -> OpenAPIDocument:
+    """The document of the current app, built on first use unless prebuilt"""
+    document = current_app.extensions.get("openapi")
+    if document is None:
+        with _lock:
+            document = current_app.extensions.get("openapi")
+            if document is None:
+                document = OpenAPIDocument(build_document())
+                current_app.extensions["openapi"] = document
+
+    return document
+
+
+def init_app(app: Flask) -> None:
+    # A document written by ``flask build-openapi`` is served as it is
+    path = app.config["OPENAPI_PATH"]
+    if path and os.path.exists(path):
+        with open(path, "rb") as file:
+            app.extensions["openapi"] = OpenAPIDocument(file.read())
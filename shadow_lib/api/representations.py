@@ -0,0 +1,152 @@
+import datetime
+import json
+import uuid
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from flask import Response, current_app, make_response, request
+from flask_restful import abort
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ["application/msgpack", "application/x-msgpack"]
+CBOR_MIMETYPE = "application/cbor"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def json_default(value: Any) -> Any:
+    """Encode the types the stdlib json module doesn't know, like orjson does"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """Encode ``data`` with orjson when installed, else with the stdlib json module.
+
+    UUIDs, dates and datetimes are encoded natively by both.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if current_app.debug:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+
+    settings = {"default": json_default, **current_app.config.get("RESTFUL_JSON", {})}
+    if current_app.debug:
+        settings.setdefault("indent", 4)
+
+    # Always end with a new line like flask_restful does
+    return (json.dumps(data, **settings) + "\n").encode()
+
+
+def ndjson_lines(batches: Iterable[list]) -> Iterator[bytes]:
+    """One JSON document per line, a chunk per batch of rows"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        for batch in batches:
+            yield b"".join(orjson.dumps(row, option=option) for row in batch)
+        return
+
+    settings = {"default": json_default, "separators": (",", ":")}
+    for batch in batches:
+        yield "".join(json.dumps(row, **settings) + "\n" for row in batch).encode()
+
+
+def dumps_msgpack(data: Any) -> bytes:
+    # Same values as the JSON representation, UUIDs and dates as strings
+    return msgpack.packb(data, default=json_default)
+
+
+def plain_values(data: Any) -> Any:
+    """``data`` with UUIDs and dates as strings, as ``json_default`` encodes them"""
+    if isinstance(data, dict):
+        return {key: plain_values(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [plain_values(value) for value in data]
+    if isinstance(data, (uuid.UUID, datetime.date, datetime.time)):
+        return json_default(data)
+    return data
+
+
+def dumps_cbor(data: Any) -> bytes:
+    # Same values as the JSON and MessagePack representations: cbor2 would
+    # tag UUIDs and datetimes natively, without calling a default hook
+    return cbor2.dumps(plain_values(data))
+
+
+def encoders() -> dict[str, Callable[[Any], bytes]]:
+    """Encoder of each available representation, JSON first as the default"""
+    available: dict[str, Callable[[Any], bytes]] = {JSON_MIMETYPE: dumps}
+    if msgpack is not None:
+        available.update(dict.fromkeys(MSGPACK_MIMETYPES, dumps_msgpack))
+    if cbor2 is not None:
+        available[CBOR_MIMETYPE] = dumps_cbor
+    return available
+
+
+def decoders() -> dict[str, Callable[[bytes], Any]]:
+    available: dict[str, Callable[[bytes], Any]] = {}
+    if msgpack is not None:
+        available.update(dict.fromkeys(MSGPACK_MIMETYPES, msgpack.unpackb))
+    if cbor2 is not None:
+        available[CBOR_MIMETYPE] = cbor2.loads
+    return available
+
+
+def negotiate() -> str:
+    """Representation picked for the request ``Accept`` header, JSON when none fits"""
+    return request.accept_mimetypes.best_match(list(encoders()), default=JSON_MIMETYPE)
+
+
+def request_body() -> Any:
+    """Request body decoded according to its ``Content-Type``: JSON, MessagePack or CBOR"""
+    loads = decoders().get(request.mimetype)
+    if loads is None:
+        return request.json
+
+    try:
+        return loads(request.get_data())
+    except ValueError:
+        abort(400, message=f"Failed to decode the {request.mimetype} body")
+
+
+def encoded_response(
+    body: bytes, code: int, headers: Optional[dict], mimetype: str
+) -> Response:
+    resp = make_response(body, code)
+    resp.headers.extend(headers or {})
+    resp.mimetype = mimetype
+    # The representation depends on the Accept header
+    resp.vary.add("Accept")
+    return resp
+
+
+def output_json(data: Any, code: int, headers: Optional[dict] = None) -> Response:
+    """``application/json`` representation of the API"""
+    return encoded_response(dumps(data), code, headers, JSON_MIMETYPE)
+
+
+def output_msgpack(data: Any, code: int, headers: Optional[dict] = None) -> Response:
+    """``application/msgpack`` representation of the API"""
+    return encoded_response(dumps_msgpack(data), code, headers, MSGPACK_MIMETYPES[0])
+
+
+def output_cbor(data: Any, code: int, headers: Optional[dict] = None) -> Response:
+    """``application/cbor`` representation of the API"""
+    return encoded_response(dumps_cbor(data), code, headers, CBOR_MIMETYPE)
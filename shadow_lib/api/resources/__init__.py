@@ -9,10 +9,28 @@ from .user import (
 )
 from .token import RefreshToken, RevokeAccessToken, RevokeRefreshToken
 from .author import AuthorDetailResource, AuthorListResource
-from .book import BookDetailResource, BookListResource, BookSearchResource
+from .book import (
+    BookAvailabilityResource,
+    BookDetailResource,
+    BookListResource,
+    BookSearchResource,
+    BookSuggestResource,
+)
 from .customer import CustomerDetailResource, CustomerListResource
-from .order import OrderDetailResource, OrderListResource, OrderCloseResource
-from .borrowed_book import BorrowedBookDetailResource, BorrowedBookListResource
+from .order import (
+    OrderDetailResource,
+    OrderListResource,
+    OrderCloseResource,
+    OrderExportResource,
+    OrderOverdueResource,
+    OrdersCloseResource,
+)
+from .borrowed_book import (
+    BorrowedBookDetailResource,
+    BorrowedBookListResource,
+    BorrowedBookExportResource,
+)
+from .hold import BookHoldDetailResource, BookHoldListResource
 
 
 __all__ = [
@@ -32,11 +50,19 @@ __all__ = [
     "BookDetailResource",
     "BookListResource",
     "BookSearchResource",
+    "BookSuggestResource",
+    "BookAvailabilityResource",
     "CustomerDetailResource",
     "CustomerListResource",
     "OrderDetailResource",
     "OrderListResource",
     "OrderCloseResource",
+    "OrderExportResource",
+    "OrderOverdueResource",
+    "OrdersCloseResource",
     "BorrowedBookDetailResource",
     "BorrowedBookListResource",
+    "BorrowedBookExportResource",
+    "BookHoldDetailResource",
+    "BookHoldListResource",
 ]
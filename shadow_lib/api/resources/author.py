@@ -1,15 +1,18 @@
 import uuid
 
-from flask import current_app, g, request
+from flask import Response, current_app, g, request
 from flask_restful import Resource
 from marshmallow import ValidationError
 
 from shadow_lib.decorators import authenticate_user, check_bearer_token
 
 
+from shadow_lib.api.response_cache import cached_response
+from shadow_lib.api.representations import request_body
+from shadow_lib.api.conditional import is_not_modified, not_modified, validators
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
 from shadow_lib.models import Author
-from shadow_lib.api.schemas import AuthorSchema
+from shadow_lib.api.schemas import AuthorSchema, schema_dumper
 
 
 class AuthorDetailResource(Resource):
@@ -19,10 +22,16 @@ class AuthorDetailResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self, author_id: uuid.UUID) -> SuccessResponseType:
-        schema = AuthorSchema()
+    def get(self, author_id: uuid.UUID) -> SuccessResponseType | Response:
+        headers = validators(
+            "author", Author.get_author_version(author_id, g.current_user)
+        )
+        if is_not_modified(headers):
+            return not_modified(headers)
+
+        schema = schema_dumper(AuthorSchema)
         author = Author.get_author(author_id, g.current_user)
-        return {"author": schema.dump(author)}
+        return {"author": schema.dump(author)}, 200, headers
 
     def patch(self, author_id: uuid.UUID) -> SuccessResponseType | ErrorResponseType:
         author = Author.get_author(author_id, g.current_user)
@@ -51,15 +60,20 @@ class AuthorListResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self) -> SuccessResponseType:
-        schema = AuthorSchema(many=True)
+    @cached_response(Author)
+    def get(self) -> SuccessResponseType | Response:
+        headers = validators("authors", Author.get_authors_version(g.current_user))
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
+
+        schema = schema_dumper(AuthorSchema)
         authors = Author.get_authors(g.current_user)
-        return {"authors": schema.dump(authors)}
+        return {"authors": schema.dump(authors, many=True)}, 200, headers
 
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
             schema = AuthorSchema()
-            author: Author = schema.load(request.json)
+            author: Author = schema.load(request_body())
         except ValidationError as err:
             return err.messages, 422
 
@@ -1,16 +1,41 @@
 import uuid
 
-from flask import current_app, g, request
+from flask import Response, current_app, g, request
 from flask_restful import Resource
 from marshmallow import ValidationError
 
 from shadow_lib.decorators import authenticate_user, check_bearer_token
 
 
+from shadow_lib.commons import RequestCoalescer
+from shadow_lib.api.response_cache import cached_response
+from shadow_lib.api.representations import request_body
+from shadow_lib.api.conditional import (
+    check_if_match,
+    is_not_modified,
+    not_modified,
+    validators,
+    write_attempts,
+)
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
-from shadow_lib.models import Book
-
-from shadow_lib.api.schemas import BookSchema, BookSearchSchema
+from shadow_lib.models import (
+    Author,
+    Book,
+    BookAuthor,
+    BookAvailability,
+    BookStockSlot,
+    db,
+)
+
+from shadow_lib.api.schemas import (
+    BookAvailabilityFiltersSchema,
+    BookAvailabilitySchema,
+    BookSchema,
+    BookSearchSchema,
+    BookSearchFacetsSchema,
+    BookSuggestSchema,
+    schema_dumper,
+)
 
 
 class BookDetailResource(Resource):
@@ -20,28 +45,48 @@ class BookDetailResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self, book_id: uuid.UUID) -> SuccessResponseType:
-        schema = BookSchema()
+    def get(self, book_id: uuid.UUID) -> SuccessResponseType | Response:
+        headers = validators("book", Book.get_book_version(book_id, g.current_user))
+        if is_not_modified(headers):
+            return not_modified(headers)
+
+        schema = schema_dumper(BookSchema)
         book = Book.get_book(book_id, g.current_user)
-        return {"book": schema.dump(book)}
+        return {"book": schema.dump(book)}, 200, headers
 
     def patch(self, book_id: uuid.UUID) -> SuccessResponseType | ErrorResponseType:
-        book = Book.get_book(book_id, g.current_user)
-        schema = BookSchema(partial=True, instance=book)
+        def update() -> SuccessResponseType | ErrorResponseType:
+            book = Book.get_book(book_id, g.current_user)
+            check_if_match(
+                "book", lambda: Book.get_book_version(book_id, g.current_user)
+            )
+            schema = BookSchema(partial=True, instance=book)
 
-        try:
-            book = schema.load(request.json)
-        except ValidationError as err:
-            return err.messages, 422
+            try:
+                book = schema.load(request.json)
+            except ValidationError as err:
+                return err.messages, 422
 
-        book.save()
-        return {"message": "book updated", "book": schema.dump(book)}
+            if book.stock_slots and "qty" in request.json:
+                # The new stock is spread over the slots again
+                Book.shard_stock(book.id, book.stock_slots, book.qty)
+
+            book.save()
+            return {"message": "book updated", "book": schema.dump(book)}
+
+        return db.Model.retry_on_conflict(update, write_attempts())
 
     def delete(self, book_id: uuid.UUID) -> SuccessResponseType:
-        book = Book.get_book(book_id, g.current_user)
-        book.delete()
-        current_app.logger.info(f"book {book.id} deleted")
-        return {"message": "book deleted"}
+        def delete() -> SuccessResponseType:
+            book = Book.get_book(book_id, g.current_user)
+            check_if_match(
+                "book", lambda: Book.get_book_version(book_id, g.current_user)
+            )
+            book.delete()
+            current_app.logger.info(f"book {book.id} deleted")
+            return {"message": "book deleted"}
+
+        return db.Model.retry_on_conflict(delete, write_attempts())
 
 
 class BookListResource(Resource):
@@ -52,15 +97,20 @@ class BookListResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self) -> SuccessResponseType:
-        schema = BookSchema(many=True)
+    @cached_response(Book, Author, BookAuthor, BookStockSlot)
+    def get(self) -> SuccessResponseType | Response:
+        headers = validators("books", Book.get_books_version(g.current_user))
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
+
+        schema = schema_dumper(BookSchema)
         books = Book.get_books(g.current_user)
-        return {"books": schema.dump(books)}
+        return {"books": schema.dump(books, many=True)}, 200, headers
 
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
             schema = BookSchema()
-            book: Book = schema.load(request.json)
+            book: Book = schema.load(request_body())
         except ValidationError as err:
             return err.messages, 422
 
@@ -90,6 +140,62 @@ class BookSearchResource(Resource):
         except ValidationError as err:
             return err.messages, 422
 
-        schema = BookSchema(many=True)
-        books = Book.search_books(g.current_user, validated_filters)
-        return {"books": schema.dump(books)}
+        schema = schema_dumper(BookSchema)
+        books, facets = Book.search_books(g.current_user, validated_filters)
+        return {
+            "books": schema.dump(books, many=True),
+            "facets": schema_dumper(BookSearchFacetsSchema).dump(facets),
+        }
+
+
+class BookSuggestResource(Resource):
+    """Typeahead completions for titles and author names"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    # Identical prefixes requested concurrently share a single lookup
+    coalescer = RequestCoalescer()
+
+    def get(self) -> SuccessResponseType | ErrorResponseType:
+        try:
+            validated_filters = BookSuggestSchema().load(request.args)
+        except ValidationError as err:
+            return err.messages, 422
+
+        prefix = validated_filters["prefix"].lower()
+        limit = validated_filters["limit"]
+
+        def suggest() -> dict[str, list[str]]:
+            return {
+                "titles": Book.suggest_titles(prefix, limit),
+                "authors": Author.suggest_names(prefix, limit),
+            }
+
+        return {"suggestions": self.coalescer.do((prefix, limit), suggest)}
+
+
+class BookAvailabilityResource(Resource):
+    """Copies, borrowed and available copies of each book"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def get(self) -> SuccessResponseType | ErrorResponseType:
+        try:
+            filters = BookAvailabilityFiltersSchema().load(request.args)
+        except ValidationError as err:
+            return err.messages, 422
+
+        availability = BookAvailability.get_availability(
+            g.current_user,
+            filters.get("book_id"),
+            filters.get("in_stock"),
+            filters.get("min_available"),
+        )
+        schema = schema_dumper(BookAvailabilitySchema)
+        return {"availability": schema.dump(availability, many=True)}
@@ -1,17 +1,26 @@
 import uuid
 
-from flask import current_app, g, request
+from flask import Response, current_app, g, request, stream_with_context
 from flask_restful import Resource
 from marshmallow import ValidationError
 
 from shadow_lib.decorators import authenticate_user, check_bearer_token
 
 
+from shadow_lib.api.representations import (
+    NDJSON_MIMETYPE,
+    ndjson_lines,
+    request_body,
+)
+from shadow_lib.api.conditional import is_not_modified, not_modified, validators
+from shadow_lib.api.idempotency import idempotent
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
-from shadow_lib.models import BorrowedBook
+from shadow_lib.models import Book, BorrowedBook, db
 from shadow_lib.api.schemas import (
+    ExportSchema,
     BorrowedBookSingleUpdateSchema,
     BorrowedBookSingleCreationSchema,
+    schema_dumper,
 )
 
 
@@ -23,37 +32,49 @@ class BorrowedBookDetailResource(Resource):
     ]
 
     def get(self, borrowed_book_id: uuid.UUID) -> SuccessResponseType:
-        schema = BorrowedBookSingleUpdateSchema()
+        schema = schema_dumper(BorrowedBookSingleUpdateSchema)
         br_book = BorrowedBook.get_borrowed_book(borrowed_book_id, g.current_user)
         return {"borrowed_book": schema.dump(br_book)}
 
     def patch(
         self, borrowed_book_id: uuid.UUID
     ) -> SuccessResponseType | ErrorResponseType:
-        br_book = BorrowedBook.get_borrowed_book(borrowed_book_id, g.current_user)
-        schema = BorrowedBookSingleUpdateSchema(partial=True, instance=br_book)
-
-        try:
-            br_book = schema.load(request.json)
-        except ValidationError as err:
-            return err.messages, 422
-
-        br_book.save()
-        return {
-            "message": "borrowed book updated",
-            "borrowed_book": schema.dump(br_book),
-        }
+        def update() -> SuccessResponseType | ErrorResponseType:
+            br_book = BorrowedBook.get_borrowed_book(borrowed_book_id, g.current_user)
+            schema = BorrowedBookSingleUpdateSchema(partial=True, instance=br_book)
+
+            try:
+                br_book = schema.load(request.json)
+            except ValidationError as err:
+                db.session.rollback()
+                return err.messages, 422
+
+            br_book.save()
+            return {
+                "message": "borrowed book updated",
+                "borrowed_book": schema.dump(br_book),
+            }
+
+        # The stock moves by the difference with the quantity read, so a
+        # concurrent change of that quantity sends it back to reading
+        return db.Model.retry_on_conflict(
+            update, current_app.config["CONFLICT_RETRIES"]
+        )
 
     def delete(self, borrowed_book_id: uuid.UUID) -> SuccessResponseType:
-        br_book = BorrowedBook.get_borrowed_book(borrowed_book_id, g.current_user)
-        br_book.delete()
+        def delete() -> SuccessResponseType:
+            br_book = BorrowedBook.get_borrowed_book(borrowed_book_id, g.current_user)
 
-        # Reset related book quantity
-        br_book.book.qty += br_book.qty
-        br_book.save()
+            # Reset related book quantity
+            Book.increment_stock(br_book.book_id, br_book.qty)
+            br_book.delete()
+
+            current_app.logger.info(f"borrowed book {br_book.id} deleted")
+            return {"message": "borrowed book deleted"}
 
-        current_app.logger.info(f"borrowed book {br_book.id} deleted")
-        return {"message": "borrowed book deleted"}
+        return db.Model.retry_on_conflict(
+            delete, current_app.config["CONFLICT_RETRIES"]
+        )
 
 
 class BorrowedBookListResource(Resource):
@@ -64,16 +85,24 @@ class BorrowedBookListResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self) -> SuccessResponseType:
-        schema = BorrowedBookSingleUpdateSchema(many=True)
+    def get(self) -> SuccessResponseType | Response:
+        headers = validators(
+            "borrowed_books", BorrowedBook.get_borrowed_books_version(g.current_user)
+        )
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
+
+        schema = schema_dumper(BorrowedBookSingleUpdateSchema)
         br_books = BorrowedBook.get_borrowed_books(g.current_user)
-        return {"borrowed_books": schema.dump(br_books)}
+        return {"borrowed_books": schema.dump(br_books, many=True)}, 200, headers
 
+    @idempotent
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
             schema = BorrowedBookSingleCreationSchema()
-            br_book: BorrowedBook = schema.load(request.json)
+            br_book: BorrowedBook = schema.load(request_body())
         except ValidationError as err:
+            db.session.rollback()
             return err.messages, 422
 
         # br_book.created_by_id = g.current_user.id
@@ -85,3 +114,23 @@ class BorrowedBookListResource(Resource):
             "message": "borrowed book created",
             "borrowed_book": schema.dump(br_book),
         }, 201
+
+
+class BorrowedBookExportResource(Resource):
+    """Borrowed books as NDJSON, streamed as they are read"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def get(self) -> Response | ErrorResponseType:
+        try:
+            filters = ExportSchema().load(request.args)
+        except ValidationError as err:
+            return err.messages, 422
+
+        rows = BorrowedBook.export_rows(g.current_user, filters.get("since"))
+        return Response(
+            stream_with_context(ndjson_lines(rows)), mimetype=NDJSON_MIMETYPE
+        )
@@ -1,15 +1,17 @@
 import uuid
 
-from flask import current_app, g, request
+from flask import Response, current_app, g, request
 from flask_restful import Resource
 from marshmallow import ValidationError
 
 from shadow_lib.decorators import authenticate_user, check_bearer_token
 
 
+from shadow_lib.api.representations import request_body
+from shadow_lib.api.conditional import is_not_modified, not_modified, validators
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
 from shadow_lib.models import Customer
-from shadow_lib.api.schemas import CustomerSchema
+from shadow_lib.api.schemas import CustomerSchema, schema_dumper
 
 
 class CustomerDetailResource(Resource):
@@ -20,7 +22,7 @@ class CustomerDetailResource(Resource):
     ]
 
     def get(self, customer_id: uuid.UUID) -> SuccessResponseType:
-        schema = CustomerSchema()
+        schema = schema_dumper(CustomerSchema)
         customer = Customer.get_customer(customer_id, g.current_user)
         return {"customer": schema.dump(customer)}
 
@@ -51,15 +53,21 @@ class CustomerListResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self) -> SuccessResponseType:
-        schema = CustomerSchema(many=True)
+    def get(self) -> SuccessResponseType | Response:
+        headers = validators(
+            "customers", Customer.get_customers_version(g.current_user)
+        )
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
+
+        schema = schema_dumper(CustomerSchema)
         customers = Customer.get_customers(g.current_user)
-        return {"customers": schema.dump(customers)}
+        return {"customers": schema.dump(customers, many=True)}, 200, headers
 
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
             schema = CustomerSchema()
-            customer: Customer = schema.load(request.json)
+            customer: Customer = schema.load(request_body())
         except ValidationError as err:
             return err.messages, 422
 
@@ -0,0 +1,65 @@
+import uuid
+
+from flask import current_app, g
+from flask_restful import Resource
+from marshmallow import ValidationError
+
+from shadow_lib.api.representations import request_body
+from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
+from shadow_lib.decorators import authenticate_user, check_bearer_token
+from shadow_lib.models import BOOK_QTY_EXCEEDED_ERR_MESSAGE, BookHold, db
+from shadow_lib.api.schemas import BookHoldSchema, schema_dumper
+
+
+class BookHoldDetailResource(Resource):
+    """Get and release"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def get(self, hold_id: uuid.UUID) -> SuccessResponseType:
+        schema = schema_dumper(BookHoldSchema)
+        hold = BookHold.get_hold(hold_id, g.current_user)
+        return {"hold": schema.dump(hold)}
+
+    def delete(self, hold_id: uuid.UUID) -> SuccessResponseType:
+        hold = BookHold.get_hold(hold_id, g.current_user)
+        hold.delete()
+
+        current_app.logger.info(f"hold {hold.id} released")
+        return {"message": "hold released"}
+
+
+class BookHoldListResource(Resource):
+    """Creation"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def post(self) -> SuccessResponseType | ErrorResponseType:
+        try:
+            data = BookHoldSchema().load(request_body())
+        except ValidationError as err:
+            return err.messages, 422
+
+        book_id = data["book"].id
+        hold = BookHold.place(
+            book_id, data["qty"], current_app.config["HOLD_TTL"], g.current_user
+        )
+        db.session.commit()
+        if hold is None:
+            message = BOOK_QTY_EXCEEDED_ERR_MESSAGE.format(book_id=book_id)
+            return {"book": [message]}, 422
+
+        current_app.logger.info(f"hold {hold.id} created")
+
+        schema = schema_dumper(BookHoldSchema)
+        return {
+            "message": "hold created",
+            "hold": schema.dump(hold),
+            "available": BookHold.available_qty(book_id),
+        }, 201
@@ -1,15 +1,35 @@
 import uuid
 
-from flask import current_app, g, request
+from flask import Response, current_app, g, request, stream_with_context
 from flask_restful import Resource
 from marshmallow import ValidationError
 
 from shadow_lib.decorators import authenticate_user, check_bearer_token
 
 
+from shadow_lib.api.representations import (
+    NDJSON_MIMETYPE,
+    ndjson_lines,
+    request_body,
+)
+from shadow_lib.api.conditional import (
+    check_if_match,
+    is_not_modified,
+    not_modified,
+    validators,
+    write_attempts,
+)
+from shadow_lib.api.idempotency import idempotent
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
-from shadow_lib.models import Order
-from shadow_lib.api.schemas import OrderSchema
+from shadow_lib.models import BOOK_QTY_EXCEEDED_ERR_MESSAGE, Order, db
+from shadow_lib.api.schemas import (
+    ExportSchema,
+    OrderSchema,
+    OrdersCloseSchema,
+    OverdueOrdersPageSchema,
+    OverdueOrdersSchema,
+    schema_dumper,
+)
 
 
 class OrderDetailResource(Resource):
@@ -19,38 +39,51 @@ class OrderDetailResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self, order_id: uuid.UUID) -> SuccessResponseType:
-        schema = OrderSchema()
-        order = Order.get_order(order_id, g.current_user)
-        return {"order": schema.dump(order)}
+    def get(self, order_id: uuid.UUID) -> SuccessResponseType | Response:
+        headers = validators("order", Order.get_order_version(order_id, g.current_user))
+        if is_not_modified(headers):
+            return not_modified(headers)
 
-    def patch(self, order_id: uuid.UUID) -> SuccessResponseType | ErrorResponseType:
+        schema = schema_dumper(OrderSchema)
         order = Order.get_order(order_id, g.current_user)
-        schema = OrderSchema(
-            partial=True,
-            instance=order,
-            exclude=["borrowed_books", "has_been_returned"],
-        )
-
-        try:
-            order = schema.load(request.json)
-        except ValidationError as err:
-            return err.messages, 422
+        return {"order": schema.dump(order)}, 200, headers
 
-        order.save()
-        return {"message": "order updated", "order": schema.dump(order)}
+    def patch(self, order_id: uuid.UUID) -> SuccessResponseType | ErrorResponseType:
+        def update() -> SuccessResponseType | ErrorResponseType:
+            order = Order.get_order(order_id, g.current_user)
+            check_if_match(
+                "order", lambda: Order.get_order_version(order_id, g.current_user)
+            )
+            schema = OrderSchema(
+                partial=True,
+                instance=order,
+                exclude=["borrowed_books", "has_been_returned", "hold_ids"],
+            )
+
+            try:
+                order = schema.load(request.json)
+            except ValidationError as err:
+                return err.messages, 422
+
+            order.save()
+            return {"message": "order updated", "order": schema.dump(order)}
+
+        return db.Model.retry_on_conflict(update, write_attempts())
 
     def delete(self, order_id: uuid.UUID) -> SuccessResponseType:
-        order = Order.get_order(order_id, g.current_user)
+        def delete() -> SuccessResponseType:
+            order = Order.get_order(order_id, g.current_user)
+            check_if_match(
+                "order", lambda: Order.get_order_version(order_id, g.current_user)
+            )
 
-        # Reset related books quantity
-        for br_book in order.borrowed_books:
-            br_book.book.qty += br_book.qty
-            br_book.save()
+            # Reset related books quantity, undone if the order changed meanwhile
+            Order.restore_stock(order.id)
+            order.delete()
+            current_app.logger.info(f"order {order.id} deleted")
+            return {"message": "order deleted"}
 
-        order.delete()
-        current_app.logger.info(f"order {order.id} deleted")
-        return {"message": "order deleted"}
+        return db.Model.retry_on_conflict(delete, write_attempts())
 
 
 class OrderListResource(Resource):
@@ -61,20 +94,32 @@ class OrderListResource(Resource):
         check_bearer_token,
     ]
 
-    def get(self) -> SuccessResponseType:
-        schema = OrderSchema(many=True)
+    def get(self) -> SuccessResponseType | Response:
+        headers = validators("orders", Order.get_orders_version(g.current_user))
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
+
+        schema = schema_dumper(OrderSchema)
         orders = Order.get_orders(g.current_user)
-        return {"orders": schema.dump(orders)}
+        return {"orders": schema.dump(orders, many=True)}, 200, headers
 
+    @idempotent
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
             schema = OrderSchema()
-            order: Order = schema.load(request.json)
+            order: Order = schema.load(request_body())
         except ValidationError as err:
+            db.session.rollback()
             return err.messages, 422
 
         order.created_by_id = g.current_user.id
-        order.save()
+        missing = Order.place(order)
+        if missing:
+            messages = [
+                BOOK_QTY_EXCEEDED_ERR_MESSAGE.format(book_id=book_id)
+                for book_id in missing
+            ]
+            return {"borrowed_books": {"book": messages}}, 422
 
         current_app.logger.info(f"order {order.id} created")
 
@@ -92,13 +137,87 @@ class OrderCloseResource(Resource):
     ]
 
     def patch(self, order_id: uuid.UUID) -> SuccessResponseType | ErrorResponseType:
-        order = Order.get_order(order_id, g.current_user)
-        order.has_been_returned = True
-        order.save()
+        def close() -> SuccessResponseType:
+            order = Order.get_order(order_id, g.current_user)
+            Order.restore_stock(order.id)
+            order.has_been_returned = True
+            order.save()
+
+            schema = schema_dumper(OrderSchema)
+            return {"message": "order closed", "order": schema.dump(order)}
+
+        # A concurrent close makes this one fail with a 404 on the retry
+        return db.Model.retry_on_conflict(close, current_app.config["CONFLICT_RETRIES"])
 
-        for br_book in order.borrowed_books:
-            br_book.book.qty += br_book.qty
-            br_book.save()
 
-        schema = OrderSchema()
-        return {"message": "order closed", "order": schema.dump(order)}
+class OrdersCloseResource(Resource):
+    """Closes many orders at once, for the returns of the day"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def patch(self) -> SuccessResponseType | ErrorResponseType:
+        try:
+            order_ids = OrdersCloseSchema().load(request_body())["order_ids"]
+        except ValidationError as err:
+            return err.messages, 422
+
+        # Once each, in the order sent
+        order_ids = list(dict.fromkeys(order_ids))
+        closed = set(Order.close_orders(order_ids, g.current_user))
+        current_app.logger.info(f"{len(closed)} orders closed")
+
+        return {
+            "message": f"{len(closed)} orders closed",
+            "orders": {
+                str(order_id): "closed" if order_id in closed else "not_found"
+                for order_id in order_ids
+            },
+        }
+
+
+class OrderOverdueResource(Resource):
+    """Open orders past their due date, oldest due first, a page at a time"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def get(self) -> SuccessResponseType | ErrorResponseType:
+        try:
+            filters = OverdueOrdersSchema().load(request.args)
+        except ValidationError as err:
+            return err.messages, 422
+
+        limit = filters["limit"]
+        orders = Order.get_overdue(g.current_user, limit, filters.get("cursor"))
+        # A full page may be followed by more
+        last = orders[-1] if len(orders) == limit else None
+        page = dict(
+            orders=orders,
+            next_cursor=(last["due_date"], last["id"]) if last else None,
+        )
+        return schema_dumper(OverdueOrdersPageSchema).dump(page), 200
+
+
+class OrderExportResource(Resource):
+    """Orders as NDJSON, one line per borrowed book, streamed as they are read"""
+
+    method_decorators = [
+        authenticate_user,
+        check_bearer_token,
+    ]
+
+    def get(self) -> Response | ErrorResponseType:
+        try:
+            filters = ExportSchema().load(request.args)
+        except ValidationError as err:
+            return err.messages, 422
+
+        rows = Order.export_rows(g.current_user, filters.get("since"))
+        return Response(
+            stream_with_context(ndjson_lines(rows)), mimetype=NDJSON_MIMETYPE
+        )
@@ -1,6 +1,9 @@
 from flask import Response, make_response, render_template
 from flask_restful import Resource
 
+from shadow_lib.api.conditional import is_not_modified, not_modified
+from shadow_lib.api.openapi import openapi_document
+
 
 class SwaggerView(Resource):  # pragma: no cover
     def get(self) -> Response:
@@ -8,10 +11,12 @@ class SwaggerView(Resource):  # pragma: no cover
         return make_response(render_template("swagger/index.html"), 200, headers)
 
 
-class SwaggerJsonView(Resource):  # pragma: no cover
+class SwaggerJsonView(Resource):
     def get(self) -> Response:
-        from shadow_lib.api.swaggers_paths import (
-            api_spec,
-        )  # Avoids ugly circular imports
+        document = openapi_document()
+
+        headers = {"ETag": document.etag}
+        if is_not_modified(headers, use_last_modified=False):
+            return not_modified(headers)
 
-        return api_spec.to_dict()
+        return Response(document.body, 200, headers, mimetype="application/json")
@@ -18,6 +18,7 @@ from shadow_lib.api.schemas import (
     ResetPasswordSchema,
     UserGetMeSchema,
     UserSchema,
+    schema_dumper,
 )
 from shadow_lib.custom_types import ErrorResponseType, SuccessResponseType
 from shadow_lib.models import User
@@ -38,7 +39,7 @@ class UserDetailResource(Resource):
     ]
 
     def get(self, user_id: uuid.UUID) -> SuccessResponseType:
-        schema = UserSchema(exclude=["password"])
+        schema = schema_dumper(UserSchema, exclude=["password"])
         user = User.get_user(user_id, g.current_user)
         return {"user": schema.dump(user)}
 
@@ -79,9 +80,9 @@ class UserListResource(Resource):
     ]
 
     def get(self) -> SuccessResponseType:
-        schema = UserSchema(many=True, exclude=["password"])
+        schema = schema_dumper(UserSchema, exclude=["password"])
         users = User.get_users(g.current_user)
-        return {"users": schema.dump(users)}
+        return {"users": schema.dump(users, many=True)}
 
     def post(self) -> SuccessResponseType | ErrorResponseType:
         try:
@@ -122,7 +123,7 @@ class UserGetMeResource(Resource):
     method_decorators = [authenticate_user, check_bearer_token]
 
     def get(self) -> SuccessResponseType:
-        schema = UserGetMeSchema()
+        schema = schema_dumper(UserGetMeSchema)
         return {"me": schema.dump(g.current_user)}
 
 
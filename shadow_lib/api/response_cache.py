@@ -0,0 +1,216 @@
+import hashlib
+import json
+from functools import wraps
+from typing import Any, Callable, Optional, Protocol
+
+from flask import Flask, Response, current_app, g, request
+from flask_restful.utils import unpack
+
+from shadow_lib.commons import LRUCache
+from shadow_lib.models.versions import table_versions
+
+from .conditional import is_not_modified, not_modified
+from .representations import encoded_response, encoders, negotiate
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        ...
+
+    def versions(self, tables: list[str]) -> tuple:
+        ...
+
+    def bump(self, tables: list[str]) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class LocalCacheBackend:
+    """Responses kept in an in-process LRU, versioned by the in-process table counters.
+
+    Writes in other workers don't move these counters, so an entry can be
+    served stale for up to its ttl when several workers run.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.entries = LRUCache(maxsize)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        # Entries of older versions are never hit again and age out of the LRU
+        self.entries.set(key, value, ttl)
+
+    def versions(self, tables: list[str]) -> tuple:
+        return table_versions.get(*tables)
+
+    def bump(self, tables: list[str]) -> None:
+        # The session events bump the in-process counters already
+        pass
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class SharedCacheBackend:
+    """Responses and table counters kept in a store shared by every worker.
+
+    ``client`` follows the redis-py API: ``get``, ``set`` with ``ex``, ``mget``
+    and ``incr``. Counters are shared too, so a write in one worker
+    invalidates the responses cached by all of them once committed.
+    """
+
+    def __init__(self, client: Any, prefix: str = "shadow_lib:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(f"{self.prefix}response:{key}")
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(f"{self.prefix}response:{key}", value, ex=ttl)
+
+    def versions(self, tables: list[str]) -> tuple:
+        counters = self.client.mget(
+            [f"{self.prefix}version:{table}" for table in tables]
+        )
+        return tuple(int(counter or 0) for counter in counters)
+
+    def bump(self, tables: list[str]) -> None:
+        # Runs once the write is committed: failing it would fail the request
+        # of a write that went through. Entries it leaves current expire after
+        # their ttl
+        try:
+            for table in tables:
+                self.client.incr(f"{self.prefix}version:{table}")
+        except Exception:
+            current_app.logger.exception(
+                f"Failed to bump the shared versions of {', '.join(tables)}"
+            )
+
+    def clear(self) -> None:
+        # Entries expire on their own, and counters must keep moving forward
+        pass
+
+
+def pack(headers: dict[str, str], body: bytes) -> bytes:
+    return json.dumps(headers).encode() + b"\n" + body
+
+
+def unpack_entry(entry: bytes) -> tuple[dict[str, str], bytes]:
+    headers, body = entry.split(b"\n", 1)
+    return json.loads(headers), body
+
+
+class ResponseCache:
+    """Encoded GET responses, keyed by route, query string, role and representation.
+
+    Keys include the write counters of the tables the response is built from,
+    so any write to them makes the next request miss.
+    """
+
+    def __init__(self) -> None:
+        self.backend: CacheBackend = LocalCacheBackend()
+        self.ttl = 300
+        table_versions.listen(self._bump)
+
+    def init_app(self, app: Flask, backend: Optional[CacheBackend] = None) -> None:
+        if backend is None:
+            redis_url = app.config["RESPONSE_CACHE_REDIS_URL"]
+            if redis_url:
+                if redis is None:
+                    raise RuntimeError(
+                        "RESPONSE_CACHE_REDIS_URL needs the redis package"
+                    )
+                backend = SharedCacheBackend(redis.Redis.from_url(redis_url))
+            else:
+                backend = LocalCacheBackend(app.config["RESPONSE_CACHE_SIZE"])
+
+        self.backend = backend
+        self.ttl = app.config["RESPONSE_CACHE_TTL"]
+        # Other in-process caches follow the shared counters too
+        table_versions.share(
+            self._shared_versions if isinstance(backend, SharedCacheBackend) else None
+        )
+
+    def _bump(self, tables: list[str]) -> None:
+        self.backend.bump(tables)
+
+    def _shared_versions(self, tables: list[str]) -> tuple:
+        try:
+            return self.backend.versions(tables)
+        except Exception:
+            # Entries keyed on the local counters alone still expire
+            current_app.logger.exception(
+                f"Failed to read the shared versions of {', '.join(tables)}"
+            )
+            return ()
+
+    def key(self, tables: list[str], mimetype: str) -> str:
+        # Versions are read before building the response, so an entry is never
+        # older than the counters it is stored under
+        parts = (
+            request.path,
+            sorted(request.args.items(multi=True)),
+            g.current_user.role.value,
+            mimetype,
+            tables,
+            self.backend.versions(tables),
+        )
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(*models: Any) -> Callable:
+    """Serve a GET from the response cache while ``models`` tables are unchanged.
+
+    Authentication still runs, the wrapped method only runs on a miss. Only
+    ``200`` responses are stored.
+    """
+    tables = [model.__tablename__ for model in models]
+
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            mimetype = negotiate()
+            key = response_cache.key(tables, mimetype)
+
+            entry = response_cache.backend.get(key)
+            if entry is not None:
+                headers, body = unpack_entry(entry)
+            else:
+                result = fn(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+
+                data, code, headers = unpack(result)
+                if code != 200:
+                    return result
+
+                headers = dict(headers)
+                body = encoders()[mimetype](data)
+                response_cache.backend.set(key, pack(headers, body), response_cache.ttl)
+
+            if "ETag" in headers and is_not_modified(headers, use_last_modified=False):
+                return not_modified(headers)
+            return encoded_response(body, 200, headers, mimetype)
+
+        return wrapper
+
+    return decorator
@@ -7,9 +7,24 @@ from .user import (
 )
 
 from .author import AuthorSchema
-from .book import BookSchema, BookSearchSchema
+from .book import (
+    BookAvailabilityFiltersSchema,
+    BookAvailabilitySchema,
+    BookSchema,
+    BookSearchSchema,
+    BookSearchFacetsSchema,
+    BookSuggestSchema,
+)
 from .customer import CustomerSchema
-from .order import OrderSchema
+from .order import (
+    ExportSchema,
+    OrderSchema,
+    OrdersCloseSchema,
+    OverdueOrdersPageSchema,
+    OverdueOrdersSchema,
+)
+from .dumpers import schema_dumper
+from .hold import BookHoldSchema
 from .borrowed_book import (
     BorrowedBookSingleUpdateSchema,
     BorrowedBookSingleCreationSchema,
@@ -25,8 +40,18 @@ __all__ = [
     "AuthorSchema",
     "BookSchema",
     "BookSearchSchema",
+    "BookSearchFacetsSchema",
+    "BookSuggestSchema",
+    "BookAvailabilityFiltersSchema",
+    "BookAvailabilitySchema",
     "CustomerSchema",
     "OrderSchema",
+    "OrdersCloseSchema",
+    "ExportSchema",
+    "OverdueOrdersSchema",
+    "OverdueOrdersPageSchema",
+    "BookHoldSchema",
     "BorrowedBookSingleUpdateSchema",
     "BorrowedBookSingleCreationSchema",
+    "schema_dumper",
 ]
@@ -1,10 +1,11 @@
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from shadow_lib.models import Author, db
 from marshmallow import fields
+from .compiled import CompiledDumpMixin
 from .custom_fields import FixedRelated
 
 
-class AuthorSchema(SQLAlchemyAutoSchema):
+class AuthorSchema(CompiledDumpMixin, SQLAlchemyAutoSchema):
 
     id = fields.UUID(dump_only=True)
     created_by = FixedRelated(dump_only=True)
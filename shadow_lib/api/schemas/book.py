@@ -1,16 +1,22 @@
-from marshmallow import Schema, validates, ValidationError
+from typing import Any
+
+from marshmallow import Schema, pre_load, validates, validates_schema, ValidationError
 
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow_sqlalchemy.fields import RelatedList
 from marshmallow import fields, validate
 
 from shadow_lib.models import Book, db
-from .custom_fields import FixedRelated
+from .compiled import CompiledDumpMixin
+from .custom_fields import FixedRelated, StockQty
+from .prefetch import PrefetchRelatedMixin
 
 
-class BookSchema(SQLAlchemyAutoSchema):
+class BookSchema(CompiledDumpMixin, PrefetchRelatedMixin, SQLAlchemyAutoSchema):
 
     id = fields.UUID(dump_only=True)
+    # Sharded books keep most of their copies in stock slots
+    qty = StockQty()
 
     authors = RelatedList(
         FixedRelated(),
@@ -27,6 +33,7 @@ class BookSchema(SQLAlchemyAutoSchema):
         model = Book
         sqla_session = db.session
         load_instance = True
+        exclude = ("stock_slots", "slots_qty", "version_id", "held_until")
 
 
 class BookSearchSchema(Schema):
@@ -34,4 +41,71 @@ class BookSearchSchema(Schema):
     q = fields.Str(
         required=True, validate=validate.Length(min=1)
     )  # searches in title and author name and EAN and SKU
-    release_date = fields.Str()
+    release_date = fields.Date()
+    release_date_from = fields.Date()
+    release_date_to = fields.Date()
+    author = fields.UUID()
+    in_stock = fields.Bool()
+    # Typo tolerant matching on title and author names, best matches first
+    fuzzy = fields.Bool(load_default=False)
+    similarity = fields.Float(validate=validate.Range(min=0, max=1))
+
+    @validates_schema
+    def validate_release_date_range(self, data: dict, **kwargs: Any) -> None:
+        if (
+            data.get("release_date_from")
+            and data.get("release_date_to")
+            and data["release_date_from"] > data["release_date_to"]
+        ):
+            raise ValidationError(
+                "release_date_from must not be after release_date_to.",
+                "release_date_from",
+            )
+
+
+class AuthorFacetSchema(Schema):
+    id = fields.UUID()
+    name = fields.Str()
+    count = fields.Int()
+
+
+class ReleaseYearFacetSchema(Schema):
+    year = fields.Int()
+    count = fields.Int()
+
+
+class AvailabilityFacetSchema(Schema):
+    in_stock = fields.Int()
+    out_of_stock = fields.Int()
+
+
+class BookSearchFacetsSchema(Schema):
+    authors = fields.List(fields.Nested(AuthorFacetSchema))
+    release_years = fields.List(fields.Nested(ReleaseYearFacetSchema))
+    availability = fields.Nested(AvailabilityFacetSchema)
+
+
+class BookSuggestSchema(Schema):
+
+    prefix = fields.Str(required=True, validate=validate.Length(min=1, max=255))
+    limit = fields.Int(load_default=10, validate=validate.Range(min=1, max=50))
+
+
+class BookAvailabilityFiltersSchema(Schema):
+    # Repeated for several books
+    book_id = fields.List(fields.UUID(), validate=validate.Length(max=200))
+    in_stock = fields.Bool()
+    min_available = fields.Int(validate=validate.Range(min=0))
+
+    @pre_load
+    def repeated_book_ids(self, data: Any, **kwargs: Any) -> Any:
+        if hasattr(data, "getlist") and "book_id" in data:
+            data = {**data.to_dict(), "book_id": data.getlist("book_id")}
+        return data
+
+
+class BookAvailabilitySchema(Schema):
+    book_id = fields.UUID()
+    copies = fields.Int()
+    borrowed = fields.Int()
+    available = fields.Int()
@@ -7,11 +7,15 @@ from marshmallow import post_load, ValidationError
 # from marshmallow import
 from marshmallow.fields import UUID, Int
 
-from shadow_lib.models import db, BorrowedBook
+from shadow_lib.models import db, Book, BorrowedBook
+from .compiled import CompiledDumpMixin
 from .custom_fields import FixedRelated
+from .prefetch import PrefetchRelatedMixin
 
 
-class BorrowedBookSingleUpdateSchema(SQLAlchemyAutoSchema):
+class BorrowedBookSingleUpdateSchema(
+    CompiledDumpMixin, PrefetchRelatedMixin, SQLAlchemyAutoSchema
+):
 
     error_messages = {
         "qty_exceeded": "Quantity for this book {book_id} is too much",
@@ -21,18 +25,24 @@ class BorrowedBookSingleUpdateSchema(SQLAlchemyAutoSchema):
     order = FixedRelated(data_key="order_id", required=True)
     book = FixedRelated(data_key="book_id", required=True, dump_only=True)
 
-    def reset_qty(self, data: dict):
-        # I in every case, reset the quantity without persisting it in the db
-        self.instance.book.qty += self.instance.qty
-
     @post_load
     def check_and_update_qty(self, data: dict, **kwargs: Any):
         if not data.get("qty"):
             return data
 
-        self.reset_qty(data)
-
-        if self.instance.book.qty < data["qty"]:
+        # Only the difference with the borrowed quantity moves the stock. The
+        # new quantity is written first: a stale one fails on its version
+        # instead of moving the stock by a wrong difference
+        difference = data["qty"] - self.instance.qty
+        self.instance.qty = data["qty"]
+        db.session.flush()
+
+        if difference < 0:
+            Book.increment_stock(self.instance.book_id, -difference)
+        elif (
+            difference > 0
+            and Book.decrement_stock(self.instance.book_id, difference) is None
+        ):
             raise ValidationError(
                 self.error_messages["qty_exceeded"].format(
                     book_id=self.instance.book_id
@@ -40,18 +50,18 @@ class BorrowedBookSingleUpdateSchema(SQLAlchemyAutoSchema):
                 "book",
             )
 
-        self.instance.book.qty -= data["qty"]
-        self.instance.book.save()
-
         return data
 
     class Meta:
         model = BorrowedBook
         sqla_session = db.session
         load_instance = True
+        exclude = ("version_id",)
 
 
-class BorrowedBookSingleCreationSchema(SQLAlchemyAutoSchema):
+class BorrowedBookSingleCreationSchema(
+    CompiledDumpMixin, PrefetchRelatedMixin, SQLAlchemyAutoSchema
+):
 
     error_messages = {
         "qty_exceeded": "Quantity for this book {book_id} is too much",
@@ -64,19 +74,16 @@ class BorrowedBookSingleCreationSchema(SQLAlchemyAutoSchema):
 
     @post_load
     def check_and_update_qty(self, data: dict, **kwargs: Any):
-        if data["book"].qty < data["qty"]:
+        if Book.decrement_stock(data["book"].id, data["qty"]) is None:
             raise ValidationError(
                 self.error_messages["qty_exceeded"].format(book_id=data["book"].id),
                 "book",
             )
 
-        # No problems I can go further and update qty
-        book = data["book"]
-        book.qty -= data["qty"]
-        book.save()
         return data
 
     class Meta:
         model = BorrowedBook
         sqla_session = db.session
         load_instance = True
+        exclude = ("version_id",)
@@ -0,0 +1,160 @@
+# mypy: ignore-errors
+import datetime
+import keyword
+import threading
+from typing import Any, Callable
+
+from flask import current_app, has_app_context
+from marshmallow import Schema, fields, missing
+from marshmallow_sqlalchemy.fields import RelatedList
+from sqlalchemy import inspect
+from sqlalchemy.orm import MANYTOONE
+
+from .custom_fields import FixedRelated
+
+# Dump functions by (schema class, dumped field names)
+_dumpers: dict[tuple, Callable[[Any, tuple, Callable], dict]] = {}
+_dumpers_lock = threading.Lock()
+
+
+def _many_to_one_id(obj: Any, relationship: str, foreign_key: str, key: str) -> Any:
+    """Related ``key`` of a many-to-one related object, read from the foreign key
+    when the relationship is not loaded so the related row is never fetched.
+    """
+    state = obj.__dict__
+    if relationship in state:
+        related = state[relationship]
+        return None if related is None else getattr(related, key)
+
+    return getattr(obj, foreign_key)
+
+
+def _many_to_one_foreign_key(model: Any, attr: str, related_key: str) -> Any:
+    """Attribute holding the id of a simple many-to-one relationship, if any"""
+    prop = inspect(model).relationships.get(attr)
+    if (
+        prop is None
+        or prop.direction is not MANYTOONE
+        or len(prop.local_remote_pairs) != 1
+    ):
+        return None
+
+    local, remote = prop.local_remote_pairs[0]
+    if remote.key != related_key or not remote.primary_key:
+        return None
+
+    return inspect(model).get_property_by_column(local).key
+
+
+def _fast_expression(model: Any, attr: str, field: fields.Field, index: int) -> Any:
+    """Python expression serializing ``obj.<attr>`` like ``field`` (``f[index]``) does, or None"""
+    field_type = type(field)
+
+    if field_type in (fields.String, fields.UUID):
+        return f"None if (v := obj.{attr}) is None else str(v)"
+
+    if field_type is fields.Integer and not field.as_string:
+        return f"None if (v := obj.{attr}) is None else int(v)"
+
+    if field_type is fields.Boolean:
+        # Anything but a real bool goes through the truthy/falsy sets
+        return f"v if (v := obj.{attr}) is None or v.__class__ is bool else f[{index}]._serialize(v, {attr!r}, obj)"
+
+    if field_type is fields.DateTime and (field.format or "iso") in ("iso", "iso8601"):
+        return f"None if (v := obj.{attr}) is None else v.isoformat()"
+
+    if field_type is fields.Date and (field.format or "iso") in ("iso", "iso8601"):
+        return f"None if (v := obj.{attr}) is None else date_isoformat(v)"
+
+    if field_type is FixedRelated and len(field.related_keys) == 1:
+        key = field.related_keys[0].key
+        foreign_key = _many_to_one_foreign_key(model, attr, key)
+        if foreign_key:
+            return f"many_to_one_id(obj, {attr!r}, {foreign_key!r}, {key!r})"
+        return f"None if (v := obj.{attr}) is None else getattr(v, {key!r}, None)"
+
+    if (
+        field_type is RelatedList
+        and type(field.inner) is FixedRelated
+        and len(field.inner.related_keys) == 1
+    ):
+        key = field.inner.related_keys[0].key
+        return f"None if (v := obj.{attr}) is None else [getattr(x, {key!r}, None) for x in v]"
+
+    return None
+
+
+def compile_dumper(schema: Any) -> Callable[[Any, tuple, Callable], dict]:
+    """Build a function dumping one instance of the schema model.
+
+    Plain columns and relationship ids are inlined; any other field is
+    delegated to its own ``serialize`` so the output matches marshmallow.
+    """
+    model = schema.opts.model
+    custom_accessor = type(schema).get_attribute is not Schema.get_attribute
+
+    lines = ["def dump(obj, f, get_attribute):", "    ret = dict_class()"]
+    for index, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        attr = field.attribute or attr_name
+
+        expression = None
+        plain_attr = attr.isidentifier() and not keyword.iskeyword(attr)
+        if not custom_accessor and plain_attr and hasattr(model, attr):
+            expression = _fast_expression(model, attr, field, index)
+
+        if expression is not None:
+            lines.append(f"    ret[{key!r}] = {expression}")
+        else:
+            lines.append(
+                f"    v = f[{index}].serialize({attr_name!r}, obj, accessor=get_attribute)"
+            )
+            lines.append("    if v is not missing:")
+            lines.append(f"        ret[{key!r}] = v")
+    lines.append("    return ret")
+
+    namespace = {
+        "dict_class": schema.dict_class,
+        "missing": missing,
+        "date_isoformat": datetime.date.isoformat,
+        "many_to_one_id": _many_to_one_id,
+    }
+    exec(
+        compile("\n".join(lines), f"<dump {type(schema).__name__}>", "exec"), namespace
+    )
+    return namespace["dump"]
+
+
+class CompiledDumpMixin:
+    """Serialize model instances with a dump function generated for the schema.
+
+    The function is built on first use for each schema class and set of dumped
+    fields. Pre and post dump hooks still run as usual; anything but an
+    instance of the schema model is serialized by marshmallow, and so is
+    everything when ``COMPILED_SERIALIZERS`` is off.
+    """
+
+    def _serialize(self, obj: Any, *, many: bool = False) -> Any:
+        if has_app_context() and not current_app.config["COMPILED_SERIALIZERS"]:
+            return super()._serialize(obj, many=many)
+
+        model = self.opts.model
+        if many and obj is not None:
+            obj = list(obj)
+            if not all(isinstance(item, model) for item in obj):
+                return super()._serialize(obj, many=True)
+        elif not isinstance(obj, model):
+            return super()._serialize(obj, many=many)
+
+        cache_key = (type(self), tuple(self.dump_fields))
+        dumper = _dumpers.get(cache_key)
+        if dumper is None:
+            with _dumpers_lock:
+                dumper = _dumpers.get(cache_key)
+                if dumper is None:
+                    dumper = _dumpers[cache_key] = compile_dumper(self)
+
+        dump_fields = tuple(self.dump_fields.values())
+        if many:
+            return [dumper(item, dump_fields, self.get_attribute) for item in obj]
+        return dumper(obj, dump_fields, self.get_attribute)
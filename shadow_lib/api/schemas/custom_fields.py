@@ -1,6 +1,7 @@
 # mypy: ignore-errors
 import uuid
 
+from marshmallow import fields, missing
 from marshmallow_sqlalchemy.fields import Related
 from sqlalchemy.orm.exc import NoResultFound
 
@@ -29,7 +30,10 @@ class FixedRelated(Related):  # pragma: no cover
 
         if self.related_model.id.type.__str__() == "UUID":
             try:
-                uuid.UUID(value["id"])
+                # The identity map is keyed by UUID, a str id would always miss it
+                # CBOR bodies carry them decoded already
+                if not isinstance(value["id"], uuid.UUID):
+                    value = {**value, "id": uuid.UUID(value["id"])}
             except (ValueError, AttributeError, TypeError) as error:
                 raise self.make_error("invalid_uuid") from error
 
@@ -44,10 +48,15 @@ class FixedRelated(Related):  # pragma: no cover
         return result
 
     def _serialize(self, value, attr, obj):
+        # UUIDs are left to the JSON representation
         ret = {prop.key: getattr(value, prop.key, None) for prop in self.related_keys}
+        return ret if len(ret) > 1 else list(ret.values())[0]
 
-        # Little hack to prevent errors in uuid deserialization
-        if isinstance(ret["id"], uuid.UUID):
-            ret["id"] = str(ret["id"])
 
-        return ret if len(ret) > 1 else list(ret.values())[0]
+class StockQty(fields.Integer):
+    """Stock of a book, on its shelf and in its stock slots. Loads the shelf ``qty``."""
+
+    def get_value(self, obj, attr, accessor=None, default=missing):
+        qty = super().get_value(obj, attr, accessor=accessor, default=default)
+        slots_qty = super().get_value(obj, "slots_qty", accessor=accessor, default=0)
+        return qty + slots_qty if slots_qty else qty
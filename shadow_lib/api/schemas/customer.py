@@ -2,11 +2,12 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow_sqlalchemy.fields import RelatedList
 
 from shadow_lib.models import Customer, db
+from .compiled import CompiledDumpMixin
 from .custom_fields import FixedRelated
 from marshmallow import fields
 
 
-class CustomerSchema(SQLAlchemyAutoSchema):
+class CustomerSchema(CompiledDumpMixin, SQLAlchemyAutoSchema):
     id = fields.UUID(dump_only=True)
 
     orders = RelatedList(FixedRelated(), dump_only=True)
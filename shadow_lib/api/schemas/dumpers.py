@@ -0,0 +1,35 @@
+import threading
+from typing import Any
+
+from marshmallow import Schema
+
+_dumpers: dict[tuple, Schema] = {}
+_lock = threading.Lock()
+
+
+def schema_dumper(schema_class: type[Schema], **options: Any) -> Schema:
+    """Process wide instance of ``schema_class`` to dump with, built on first use.
+
+    Dumping doesn't change a schema, so one instance per set of options is
+    shared by every request and thread; pass ``many`` to ``dump`` instead of
+    the constructor. Loads keep a schema per request, since they hold the
+    instance being updated.
+    """
+    key = (
+        schema_class,
+        tuple(
+            sorted(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in options.items()
+            )
+        ),
+    )
+
+    dumper = _dumpers.get(key)
+    if dumper is None:
+        with _lock:
+            dumper = _dumpers.get(key)
+            if dumper is None:
+                dumper = _dumpers[key] = schema_class(**options)
+
+    return dumper
@@ -0,0 +1,18 @@
+from marshmallow import fields, validate
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
+
+from shadow_lib.models import BookHold, db
+from .custom_fields import FixedRelated
+
+
+class BookHoldSchema(SQLAlchemyAutoSchema):
+    id = fields.UUID(dump_only=True)
+    book = FixedRelated(data_key="book_id", required=True)
+    qty = fields.Int(required=True, validate=validate.Range(min=1))
+    expires_at = fields.AwareDateTime(dump_only=True)
+
+    class Meta:
+        model = BookHold
+        sqla_session = db.session
+        include_fk = False
+        exclude = ["created_at", "updated_at", "created_by_id"]
@@ -1,58 +1,81 @@
+import uuid
+from datetime import date, timezone
+from collections import defaultdict
 from typing import Any
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow_sqlalchemy.fields import Nested
 from marshmallow.fields import UUID, Bool
-from marshmallow import post_load, pre_load, ValidationError, validates
+from marshmallow import (
+    Schema,
+    fields,
+    pre_load,
+    ValidationError,
+    validates,
+    validates_schema,
+)
+from marshmallow import validate
 
 # from marshmallow import
 # from marshmallow.fields import UUID
 
-from shadow_lib.models import Order, db, BorrowedBook
+from shadow_lib.models import (
+    HOLD_NOT_COVERED_ERR_MESSAGE,
+    BookHold,
+    Order,
+    db,
+    BorrowedBook,
+)
+from .compiled import CompiledDumpMixin
 from .custom_fields import FixedRelated
+from .prefetch import PrefetchRelatedMixin
 
 
-class BorrowedBookSchema(SQLAlchemyAutoSchema):
-
-    error_messages = {
-        "qty_exceeded": "Quantity for this book {book_id} is too much",
-    }
+class BorrowedBookSchema(CompiledDumpMixin, PrefetchRelatedMixin, SQLAlchemyAutoSchema):
+    # The stock is taken when the order is placed, see Order.place
 
     order = FixedRelated(dump_only=True, data_key="order_id")
     book = FixedRelated(required=True, data_key="book_id")
 
-    @post_load
-    def check_and_update_qty(self, instance: BorrowedBook, **kwargs: Any):
-        if instance["book"].qty < instance["qty"]:
-            raise ValidationError(
-                self.error_messages["qty_exceeded"].format(book_id=instance["book"].id),
-                "book",
-            )
-
-        # No problems I can go further and update qty
-        book = instance["book"]
-        book.qty -= instance["qty"]
-        book.save()
-
-        return instance
-
     class Meta:
         model = BorrowedBook
         sqla_session = db.session
         load_instance = True
+        exclude = ("version_id",)
 
 
-class OrderSchema(SQLAlchemyAutoSchema):
+class OrderSchema(CompiledDumpMixin, PrefetchRelatedMixin, SQLAlchemyAutoSchema):
     id = UUID(dump_only=True)
     borrowed_books = Nested(BorrowedBookSchema, many=True, required=True)
     customer = FixedRelated(required=True)
     created_by = FixedRelated(dump_only=True)
     has_been_returned = Bool(load_default=False)
+    # Holds the order confirms, see Order.place
+    hold_ids = fields.List(fields.UUID(), load_only=True)
 
     @validates("borrowed_books")
     def validate_groups_empty_list(self, value: list) -> None:
         if value == []:
             raise ValidationError("Borrowed book value cannot be empty.")
 
+    @validates_schema
+    def validate_hold_ids(self, data: dict, **kwargs: Any) -> None:
+        if not data.get("hold_ids"):
+            return
+
+        quantities: dict[uuid.UUID, int] = defaultdict(int)
+        for br_book in data.get("borrowed_books", []):
+            quantities[br_book.book.id] += br_book.qty
+
+        uncovered = BookHold.uncovered(data["hold_ids"], quantities)
+        if uncovered:
+            raise ValidationError(
+                [
+                    HOLD_NOT_COVERED_ERR_MESSAGE.format(hold_id=hold_id)
+                    for hold_id in uncovered
+                ],
+                "hold_ids",
+            )
+
     @pre_load
     def set_original_qty(self, data: dict, *args, **kwargs: Any):
         if self.instance:
@@ -63,3 +86,62 @@ class OrderSchema(SQLAlchemyAutoSchema):
         model = Order
         sqla_session = db.session
         load_instance = True
+        exclude = ("version_id",)
+
+
+class OrdersCloseSchema(Schema):
+    order_ids = fields.List(
+        fields.UUID(), required=True, validate=validate.Length(min=1, max=1000)
+    )
+
+
+class ExportSchema(Schema):
+    # Only rows updated from then on, times without offset are taken as UTC
+    since = fields.AwareDateTime(default_timezone=timezone.utc)
+
+
+class OverdueCursor(fields.Field):
+    """The due date and id of the last order of a page, where the next one starts"""
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            return None
+        due_date, order_id = value
+        return f"{due_date.isoformat()}_{order_id}"
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            due_date, order_id = value.split("_")
+            return date.fromisoformat(due_date), uuid.UUID(order_id)
+        except (AttributeError, ValueError) as error:
+            raise ValidationError("Not a valid cursor.") from error
+
+
+class OverdueOrdersSchema(Schema):
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+    # next_cursor of the previous page
+    cursor = OverdueCursor()
+
+
+class OverdueCustomerSchema(Schema):
+    id = fields.UUID()
+    fullname = fields.Str()
+
+
+class OverdueBorrowedBookSchema(Schema):
+    id = fields.UUID()
+    book_id = fields.UUID()
+    title = fields.Str()
+    qty = fields.Int()
+
+
+class OverdueOrderSchema(Schema):
+    id = fields.UUID()
+    due_date = fields.Date()
+    customer = fields.Nested(OverdueCustomerSchema)
+    borrowed_books = fields.List(fields.Nested(OverdueBorrowedBookSchema))
+
+
+class OverdueOrdersPageSchema(Schema):
+    orders = fields.List(fields.Nested(OverdueOrderSchema))
+    next_cursor = OverdueCursor()
@@ -0,0 +1,94 @@
+# mypy: ignore-errors
+import uuid
+from collections import defaultdict
+from typing import Any
+
+from marshmallow import pre_load
+from marshmallow.fields import Nested
+from marshmallow_sqlalchemy.fields import RelatedList
+from sqlalchemy import inspect
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import select
+
+from .custom_fields import FixedRelated
+
+
+def _related_id(field: FixedRelated, value: Any) -> Any:
+    if isinstance(value, dict):
+        value = value.get(field.related_keys[0].key)
+
+    if isinstance(value, uuid.UUID):
+        return value
+
+    # Invalid ids are left to the field, which reports them
+    try:
+        return uuid.UUID(value)
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+class PrefetchRelatedMixin:
+    """Load every object referenced by the related fields before deserializing.
+
+    The ids found in the input, nested schemas included, are fetched with one
+    ``IN`` query per related model. ``FixedRelated`` looks objects up by primary
+    key, so it then finds them in the session identity map without a query.
+    """
+
+    def _collect_related_ids(self, data: Any, ids: dict) -> None:
+        if not isinstance(data, dict):
+            return
+
+        for field_name, field in self.load_fields.items():
+            value = data.get(field.data_key or field_name)
+            if value is None:
+                continue
+
+            if isinstance(field, Nested) and isinstance(
+                field.schema, PrefetchRelatedMixin
+            ):
+                for item in value if isinstance(value, list) else [value]:
+                    field.schema._collect_related_ids(item, ids)
+                continue
+
+            if isinstance(field, FixedRelated):
+                related, values = field, [value]
+            elif isinstance(field, RelatedList) and isinstance(
+                field.inner, FixedRelated
+            ):
+                related, values = field.inner, value if isinstance(value, list) else []
+            else:
+                continue
+
+            # Lookups on other columns than the primary key don't use the identity map
+            if related.columns or related.transient or len(related.related_keys) != 1:
+                continue
+
+            ids[related.related_model].update(
+                _related_id(related, value) for value in values
+            )
+
+    @pre_load(pass_many=True)
+    def prefetch_related(self, data: Any, many: bool, **kwargs: Any) -> Any:
+        ids: dict[Any, set] = defaultdict(set)
+        for item in data if many and isinstance(data, list) else [data]:
+            self._collect_related_ids(item, ids)
+
+        # Strong references, the identity map only keeps weak ones
+        self.prefetched = []
+        identity_map = self.session.identity_map
+        for model, model_ids in ids.items():
+            # Skip what an outer schema, or the request, loaded already
+            missing_ids = []
+            for model_id in model_ids - {None}:
+                obj = identity_map.get(identity_key(model, model_id))
+                if obj is None or inspect(obj).expired:
+                    missing_ids.append(model_id)
+            if not missing_ids:
+                continue
+
+            pk = inspect(model).primary_key[0]
+            query = select(model).where(pk.in_(missing_ids))
+            self.prefetched.extend(self.session.execute(query).unique().scalars())
+
+        return data
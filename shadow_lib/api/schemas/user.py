@@ -19,11 +19,12 @@ from sqlalchemy.sql import select
 from shadow_lib.models.user import UserRoles
 from shadow_lib.models import User, db
 from shadow_lib.notify import Notify
+from .compiled import CompiledDumpMixin
 
 # from .custom_fields import FixedRelated
 
 
-class UserSchema(SQLAlchemyAutoSchema):
+class UserSchema(CompiledDumpMixin, SQLAlchemyAutoSchema):
 
     error_messages = {
         "password_not_provided": "Password must not be empty",
@@ -40,14 +41,18 @@ class UserSchema(SQLAlchemyAutoSchema):
         super().__init__(*args, **kwargs)
         self.is_creation = is_creation
 
-        self.current_user_role = g.current_user.role
-        self.is_superadmin = (
-            True if self.current_user_role == UserRoles.superadmin else False
-        )
-
         if self.instance:
             self.original_password = self.instance.password
 
+    # Read on use, so instances used to dump can outlive the request
+    @property
+    def current_user_role(self) -> UserRoles:
+        return g.current_user.role
+
+    @property
+    def is_superadmin(self) -> bool:
+        return self.current_user_role == UserRoles.superadmin
+
     id = fields.UUID(dump_only=True)
     email = fields.Str(required=True, validate=validate.Email())
     password = fields.Str(required=True, validate=validate.Length(min=1))
@@ -120,7 +125,7 @@ class UserSchema(SQLAlchemyAutoSchema):
         load_instance = True
 
 
-class UserGetMeSchema(SQLAlchemyAutoSchema):
+class UserGetMeSchema(CompiledDumpMixin, SQLAlchemyAutoSchema):
 
     role = fields.Method("get_role_value")
 
@@ -13,6 +13,24 @@ class GeneralMessageSchema(Schema):
 api_spec.components.schema("GeneralErrorSchema", schema=GeneralErrorSchema)
 api_spec.components.schema("GeneralMessageSchema", schema=GeneralMessageSchema)
 
+# Conditional writes, against the ETag of the detail GET
+IF_MATCH_PARAMETER = {
+    "name": "If-Match",
+    "in": "header",
+    "required": False,
+    "description": "Only write if the resource still has this ETag; retried on conflicts without it.",
+    "schema": {"type": "string"},
+}
+
+# Retries of creations, answered with the response of the first request
+IDEMPOTENCY_KEY_PARAMETER = {
+    "name": "Idempotency-Key",
+    "in": "header",
+    "required": False,
+    "description": "Unique per creation; retries sending it get the first response back.",
+    "schema": {"type": "string", "maxLength": 255},
+}
+
 from shadow_lib.api.swaggers_paths import auth_paths  # noqa
 from shadow_lib.api.swaggers_paths import user_paths  # noqa
 from shadow_lib.api.swaggers_paths import token_paths  # noqa
@@ -21,3 +39,4 @@ from shadow_lib.api.swaggers_paths import customer_paths  # noqa
 from shadow_lib.api.swaggers_paths import book_paths  # noqa
 from shadow_lib.api.swaggers_paths import order_paths  # noqa
 from shadow_lib.api.swaggers_paths import borrowed_book_paths  # noqa
+from shadow_lib.api.swaggers_paths import hold_paths  # noqa
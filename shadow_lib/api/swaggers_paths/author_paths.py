@@ -38,7 +38,10 @@ api_spec.path(
                 "200": {
                     "description": "A JSON array of author objects",
                     "content": {"application/json": {"schema": "AuthorSchemaMany"}},
-                }
+                },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
             },
         ),
         post=dict(
@@ -96,6 +99,9 @@ api_spec.path(
                         "application/json": {"schema": "AuthorSchemaNoMessage"}
                     },
                 },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
                 "404": {
                     "description": "author not found.",
                     "content": {"application/json": {"schema": "GeneralMessageSchema"}},
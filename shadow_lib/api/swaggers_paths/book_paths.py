@@ -5,9 +5,16 @@ from shadow_lib.api.resources import (
     BookDetailResource,
     BookListResource,
     BookSearchResource,
+    BookSuggestResource,
+    BookAvailabilityResource,
 )
 
-from shadow_lib.api.schemas import BookSchema
+from shadow_lib.api.schemas import (
+    BookAvailabilitySchema,
+    BookSchema,
+    BookSearchFacetsSchema,
+)
+from shadow_lib.api.swaggers_paths import IF_MATCH_PARAMETER
 from shadow_lib.extensions import api_spec
 
 
@@ -20,12 +27,35 @@ class BookSchemaMany(Schema):
     books = fields.Nested(BookSchema(many=True))
 
 
+class BookSearchResultSchema(Schema):
+    books = fields.Nested(BookSchema(many=True))
+    facets = fields.Nested(BookSearchFacetsSchema)
+
+
+class BookSuggestionsSchema(Schema):
+    titles = fields.List(fields.Str())
+    authors = fields.List(fields.Str())
+
+
+class BookSuggestionsSchemaRich(Schema):
+    suggestions = fields.Nested(BookSuggestionsSchema)
+
+
+class BookAvailabilitySchemaMany(Schema):
+    availability = fields.Nested(BookAvailabilitySchema(many=True))
+
+
 api_spec.components.schema("BookSchema", schema=BookSchema)
 api_spec.components.schema(
     "BookSchemaNoMessage", schema=BookSchemaRich(exclude=["message"])
 )
 api_spec.components.schema("BookSchemaRich", schema=BookSchemaRich)
 api_spec.components.schema("BookSchemaMany", schema=BookSchemaMany)
+api_spec.components.schema("BookSearchResultSchema", schema=BookSearchResultSchema)
+api_spec.components.schema("BookSuggestionsSchema", schema=BookSuggestionsSchemaRich)
+api_spec.components.schema(
+    "BookAvailabilitySchemaMany", schema=BookAvailabilitySchemaMany
+)
 
 
 api_spec.path(
@@ -42,7 +72,10 @@ api_spec.path(
                 "200": {
                     "description": "A JSON array of book objects",
                     "content": {"application/json": {"schema": "BookSchemaMany"}},
-                }
+                },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
             },
         ),
         post=dict(
@@ -98,6 +131,9 @@ api_spec.path(
                     "description": "OK",
                     "content": {"application/json": {"schema": "BookSchemaNoMessage"}},
                 },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
                 "404": {
                     "description": "book not found.",
                     "content": {"application/json": {"schema": "GeneralMessageSchema"}},
@@ -106,6 +142,7 @@ api_spec.path(
         ),
         patch=dict(
             security=[{"bearerAuth": []}],
+            parameters=[IF_MATCH_PARAMETER],
             requestBody={
                 "required": True,
                 "content": {
@@ -118,6 +155,10 @@ api_spec.path(
             description="Updates a book",
             tags=["books_detail"],
             responses={
+                "409": {
+                    "description": "Modified since the ETag sent in If-Match, or meanwhile.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "200": {
                     "description": "book updated",
                     "content": {"application/json": {"schema": "BookSchemaRich"}},
@@ -130,10 +171,15 @@ api_spec.path(
         ),
         delete=dict(
             security=[{"bearerAuth": []}],
+            parameters=[IF_MATCH_PARAMETER],
             summary="Deletes a book",
             description="Deletes a book",
             tags=["books_detail"],
             responses={
+                "409": {
+                    "description": "Modified since the ETag sent in If-Match, or meanwhile.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "200": {
                     "description": "book deleted",
                     "content": {"application/json": {"schema": "GeneralMessageSchema"}},
@@ -163,18 +209,72 @@ api_spec.path(
                 "Book.SKU, Author.first_name, Author.last_name"
             ),
             "schema": {"type": "string"},
-        }
+        },
+        {
+            "name": "release_date",
+            "in": "query",
+            "required": False,
+            "description": "Only books released on this date.",
+            "schema": {"type": "string", "format": "date"},
+        },
+        {
+            "name": "release_date_from",
+            "in": "query",
+            "required": False,
+            "description": "Only books released on or after this date.",
+            "schema": {"type": "string", "format": "date"},
+        },
+        {
+            "name": "release_date_to",
+            "in": "query",
+            "required": False,
+            "description": "Only books released on or before this date.",
+            "schema": {"type": "string", "format": "date"},
+        },
+        {
+            "name": "author",
+            "in": "query",
+            "required": False,
+            "description": "Only books written by this author id.",
+            "schema": {"type": "string", "format": "uuid"},
+        },
+        {
+            "name": "in_stock",
+            "in": "query",
+            "required": False,
+            "description": "Only books with (true) or without (false) copies left.",
+            "schema": {"type": "boolean"},
+        },
+        {
+            "name": "fuzzy",
+            "in": "query",
+            "required": False,
+            "description": "Typo tolerant match on title and author names, best matches first.",
+            "schema": {"type": "boolean", "default": False},
+        },
+        {
+            "name": "similarity",
+            "in": "query",
+            "required": False,
+            "description": "Minimum word similarity (0 to 1) for fuzzy matches.",
+            "schema": {"type": "number", "minimum": 0, "maximum": 1},
+        },
     ],
     operations=dict(
         get=dict(
             security=[{"bearerAuth": []}],
-            summary="Returns a book by ID, if it exists",
-            description="Returns a book by ID, if it exists",
+            summary="Searches books",
+            description=(
+                "Returns the matching books with their counts per author, "
+                "per release year and per availability."
+            ),
             tags=["books_search"],
             responses={
                 "200": {
-                    "description": "A JSON array of book objects",
-                    "content": {"application/json": {"schema": "BookSchemaMany"}},
+                    "description": "A JSON array of book objects and their facets",
+                    "content": {
+                        "application/json": {"schema": "BookSearchResultSchema"}
+                    },
                 },
                 "422": {
                     "description": "List of errors occured in search.",
@@ -184,3 +284,104 @@ api_spec.path(
         ),
     ),
 )
+
+
+api_spec.path(
+    resource=BookSuggestResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "prefix",
+            "in": "query",
+            "required": True,
+            "description": (
+                "Beginning of a Book.title, of an author full name or of an "
+                "author last name. Case insensitive."
+            ),
+            "schema": {"type": "string"},
+        },
+        {
+            "name": "limit",
+            "in": "query",
+            "required": False,
+            "description": "Max number of titles and of authors returned.",
+            "schema": {"type": "integer", "default": 10, "minimum": 1, "maximum": 50},
+        },
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Returns title and author completions for a prefix",
+            description="Returns title and author completions for a prefix",
+            tags=["books_search"],
+            responses={
+                "200": {
+                    "description": "Titles and author names starting with the prefix",
+                    "content": {
+                        "application/json": {"schema": "BookSuggestionsSchema"}
+                    },
+                },
+                "422": {
+                    "description": "List of errors occured in suggestion.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
+
+
+api_spec.path(
+    resource=BookAvailabilityResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "book_id",
+            "in": "query",
+            "required": False,
+            "description": "Only these books, repeat it for several.",
+            "schema": {"type": "array", "items": {"type": "string", "format": "uuid"}},
+            "style": "form",
+            "explode": True,
+        },
+        {
+            "name": "in_stock",
+            "in": "query",
+            "required": False,
+            "description": "Only books with copies available, or without when false.",
+            "schema": {"type": "boolean"},
+        },
+        {
+            "name": "min_available",
+            "in": "query",
+            "required": False,
+            "description": "Only books with at least this many copies available.",
+            "schema": {"type": "integer", "minimum": 0},
+        },
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Returns the copies, borrowed and available copies of the books",
+            description=(
+                "copies is borrowed plus available. Copies set aside by holds "
+                "count as available."
+            ),
+            tags=["books_list"],
+            responses={
+                "200": {
+                    "description": "Availability of each book, by book id",
+                    "content": {
+                        "application/json": {"schema": "BookAvailabilitySchemaMany"}
+                    },
+                },
+                "422": {
+                    "description": "Invalid filters.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
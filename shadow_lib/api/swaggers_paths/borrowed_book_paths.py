@@ -4,6 +4,7 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from shadow_lib.api.resources import (
     BorrowedBookDetailResource,
+    BorrowedBookExportResource,
     BorrowedBookListResource,
 )
 
@@ -13,6 +14,7 @@ from shadow_lib.api.schemas import (
 )
 from shadow_lib.models import BorrowedBook, db
 from shadow_lib.extensions import api_spec
+from shadow_lib.api.swaggers_paths import IDEMPOTENCY_KEY_PARAMETER
 
 
 class BorrowedBookFixedSchema(SQLAlchemyAutoSchema):
@@ -36,6 +38,19 @@ class BorrowedBookSchemaMany(Schema):
     borrowed_books = fields.Nested(BorrowedBookFixedSchema(many=True))
 
 
+class BorrowedBookExportRowSchema(Schema):
+    borrowed_book_id = fields.UUID()
+    qty = fields.Int()
+    updated_at = fields.DateTime()
+    book_id = fields.UUID()
+    book_title = fields.Str()
+    order_id = fields.UUID()
+    due_date = fields.Date()
+    has_been_returned = fields.Bool()
+    customer_id = fields.UUID()
+    customer_fullname = fields.Str()
+
+
 api_spec.components.schema("BorrowedBookFixedSchema", schema=BorrowedBookFixedSchema)
 api_spec.components.schema(
     "BorrowedBookSingleCreationSchema", schema=BorrowedBookSingleCreationSchema
@@ -48,6 +63,9 @@ api_spec.components.schema(
 )
 api_spec.components.schema("BorrowedBookSchemaRich", schema=BorrowedBookSchemaRich)
 api_spec.components.schema("BorrowedBookSchemaMany", schema=BorrowedBookSchemaMany)
+api_spec.components.schema(
+    "BorrowedBookExportRowSchema", schema=BorrowedBookExportRowSchema
+)
 
 
 api_spec.path(
@@ -66,11 +84,15 @@ api_spec.path(
                     "content": {
                         "application/json": {"schema": "BorrowedBookSchemaMany"}
                     },
-                }
+                },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
             },
         ),
         post=dict(
             security=[{"bearerAuth": []}],
+            parameters=[IDEMPOTENCY_KEY_PARAMETER],
             requestBody={
                 "required": True,
                 "content": {
@@ -89,8 +111,12 @@ api_spec.path(
                         "application/json": {"schema": "BorrowedBookSchemaRich"}
                     },
                 },
+                "409": {
+                    "description": "Idempotency key of a request applied without a stored response.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "422": {
-                    "description": "List of errors occured in creation.",
+                    "description": "List of errors occured in creation, or idempotency key reused.",
                     "content": {"application/json": {"schema": "GeneralErrorSchema"}},
                 },
             },
@@ -176,3 +202,43 @@ api_spec.path(
         ),
     ),
 )
+
+
+api_spec.path(
+    resource=BorrowedBookExportResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "since",
+            "in": "query",
+            "required": False,
+            "description": (
+                "Only rows updated at or after this time. Times without offset are UTC."
+            ),
+            "schema": {"type": "string", "format": "date-time"},
+        }
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Exports borrowed books as NDJSON",
+            description="Streams the borrowed books with their book title, order and customer.",
+            tags=["borrowed_books_list"],
+            responses={
+                "200": {
+                    "description": "One JSON row per line, oldest update first",
+                    "content": {
+                        "application/x-ndjson": {
+                            "schema": "BorrowedBookExportRowSchema"
+                        }
+                    },
+                },
+                "422": {
+                    "description": "Invalid since parameter.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
@@ -38,7 +38,10 @@ api_spec.path(
                 "200": {
                     "description": "A JSON array of customer objects",
                     "content": {"application/json": {"schema": "CustomerSchemaMany"}},
-                }
+                },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
             },
         ),
         post=dict(
@@ -0,0 +1,104 @@
+from flask import current_app
+from marshmallow import Schema, fields
+
+from shadow_lib.api.resources import BookHoldDetailResource, BookHoldListResource
+from shadow_lib.api.schemas import BookHoldSchema
+from shadow_lib.extensions import api_spec
+
+
+class BookHoldSchemaRich(Schema):
+    message = fields.Str()
+    hold = fields.Nested(BookHoldSchema)
+    available = fields.Int()
+
+
+api_spec.components.schema("BookHoldSchema", schema=BookHoldSchema)
+api_spec.components.schema("BookHoldSchemaRich", schema=BookHoldSchemaRich)
+api_spec.components.schema(
+    "BookHoldSchemaNoMessage",
+    schema=BookHoldSchemaRich(exclude=["message", "available"]),
+)
+
+
+api_spec.path(
+    resource=BookHoldListResource,
+    # api=api,
+    app=current_app,
+    operations=dict(
+        post=dict(
+            security=[{"bearerAuth": []}],
+            requestBody={
+                "required": True,
+                "content": {"application/json": {"schema": "BookHoldSchema"}},
+            },
+            summary="Holds copies of a book for a checkout",
+            description=(
+                "Sets copies aside until the hold expires, after HOLD_TTL seconds. "
+                "Pass its id in the hold_ids of the order to take the copies."
+            ),
+            tags=["holds"],
+            responses={
+                "201": {
+                    "description": "Created, with the copies still available",
+                    "content": {"application/json": {"schema": "BookHoldSchemaRich"}},
+                },
+                "422": {
+                    "description": "Invalid hold or not enough copies available.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
+
+
+api_spec.path(
+    resource=BookHoldDetailResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "id",
+            "in": "path",
+            "required": True,
+            "description": "Hold id on which perfom actions.",
+            "schema": {"type": "string", "format": "uuid"},
+        }
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Returns a hold by ID, if it exists and didn't expire",
+            description="Returns a hold by ID, if it exists and didn't expire",
+            tags=["holds"],
+            responses={
+                "200": {
+                    "description": "OK",
+                    "content": {
+                        "application/json": {"schema": "BookHoldSchemaNoMessage"}
+                    },
+                },
+                "404": {
+                    "description": "Hold not found or expired.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
+            },
+        ),
+        delete=dict(
+            security=[{"bearerAuth": []}],
+            summary="Releases a hold",
+            description="Releases a hold, its copies are available again",
+            tags=["holds"],
+            responses={
+                "200": {
+                    "description": "hold released",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
+                "404": {
+                    "description": "Hold not found or expired.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
+            },
+        ),
+    ),
+)
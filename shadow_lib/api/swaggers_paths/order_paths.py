@@ -5,9 +5,20 @@ from shadow_lib.api.resources import (
     OrderDetailResource,
     OrderListResource,
     OrderCloseResource,
+    OrderExportResource,
+    OrderOverdueResource,
+    OrdersCloseResource,
 )
 
-from shadow_lib.api.schemas import OrderSchema
+from shadow_lib.api.schemas import (
+    OrderSchema,
+    OrdersCloseSchema,
+    OverdueOrdersPageSchema,
+)
+from shadow_lib.api.swaggers_paths import (
+    IDEMPOTENCY_KEY_PARAMETER,
+    IF_MATCH_PARAMETER,
+)
 from shadow_lib.extensions import api_spec
 
 from .borrowed_book_paths import BorrowedBookFixedSchema
@@ -44,6 +55,33 @@ class OrderSchemaMany(Schema):
     orders = fields.Nested(OrderSchemaFixed(many=True))
 
 
+class OrderExportRowSchema(Schema):
+    order_id = fields.UUID()
+    due_date = fields.Date()
+    has_been_returned = fields.Bool()
+    updated_at = fields.DateTime()
+    customer_id = fields.UUID()
+    customer_fullname = fields.Str()
+    borrowed_book_id = fields.UUID(allow_none=True)
+    book_id = fields.UUID(allow_none=True)
+    book_title = fields.Str(allow_none=True)
+    qty = fields.Int(allow_none=True)
+
+
+class OrdersCloseReportSchema(Schema):
+    message = fields.Str()
+    # "closed", or "not_found" for orders missing or closed already
+    orders = fields.Dict(keys=fields.UUID(), values=fields.Str())
+
+
+class OverdueOrdersPageFixed(OverdueOrdersPageSchema):
+    next_cursor = fields.Str(allow_none=True)
+
+
+api_spec.components.schema("OrderExportRowSchema", schema=OrderExportRowSchema)
+api_spec.components.schema("OverdueOrdersPageFixed", schema=OverdueOrdersPageFixed)
+api_spec.components.schema("OrdersCloseSchema", schema=OrdersCloseSchema)
+api_spec.components.schema("OrdersCloseReportSchema", schema=OrdersCloseReportSchema)
 api_spec.components.schema("OrderSchema", schema=OrderSchema)
 api_spec.components.schema(
     "OrderSchemaNoReturned", schema=OrderSchema(exclude=["has_been_returned"])
@@ -72,11 +110,15 @@ api_spec.path(
                 "200": {
                     "description": "A JSON array of order objects",
                     "content": {"application/json": {"schema": "OrderSchemaMany"}},
-                }
+                },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
             },
         ),
         post=dict(
             security=[{"bearerAuth": []}],
+            parameters=[IDEMPOTENCY_KEY_PARAMETER],
             requestBody={
                 "required": True,
                 "content": {
@@ -93,8 +135,12 @@ api_spec.path(
                     "description": "Created",
                     "content": {"application/json": {"schema": "OrderSchemaRich"}},
                 },
+                "409": {
+                    "description": "Idempotency key of a request applied without a stored response.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "422": {
-                    "description": "List of errors occured in creation.",
+                    "description": "List of errors occured in creation, or idempotency key reused.",
                     "content": {"application/json": {"schema": "GeneralErrorSchema"}},
                 },
             },
@@ -128,6 +174,9 @@ api_spec.path(
                     "description": "OK",
                     "content": {"application/json": {"schema": "OrderSchemaNoMessage"}},
                 },
+                "304": {
+                    "description": "Not modified since the ETag sent in If-None-Match.",
+                },
                 "404": {
                     "description": "order not found.",
                     "content": {"application/json": {"schema": "GeneralMessageSchema"}},
@@ -144,10 +193,15 @@ api_spec.path(
                     }
                 },
             },
+            parameters=[IF_MATCH_PARAMETER],
             summary="Updates an Order",
             description="Updates an Order",
             tags=["orders_detail"],
             responses={
+                "409": {
+                    "description": "Modified since the ETag sent in If-Match, or meanwhile.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "200": {
                     "description": "order updated",
                     "content": {"application/json": {"schema": "OrderSchemaRich"}},
@@ -164,10 +218,15 @@ api_spec.path(
         ),
         delete=dict(
             security=[{"bearerAuth": []}],
+            parameters=[IF_MATCH_PARAMETER],
             summary="Deletes an order",
             description="Deletes an order",
             tags=["orders_detail"],
             responses={
+                "409": {
+                    "description": "Modified since the ETag sent in If-Match, or meanwhile.",
+                    "content": {"application/json": {"schema": "GeneralMessageSchema"}},
+                },
                 "200": {
                     "description": "order deleted",
                     "content": {"application/json": {"schema": "GeneralMessageSchema"}},
@@ -214,3 +273,127 @@ api_spec.path(
         ),
     ),
 )
+
+
+api_spec.path(
+    resource=OrderExportResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "since",
+            "in": "query",
+            "required": False,
+            "description": (
+                "Only rows updated at or after this time. Times without offset are UTC."
+            ),
+            "schema": {"type": "string", "format": "date-time"},
+        }
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Exports orders as NDJSON",
+            description=(
+                "Streams the orders, one row per borrowed book with the customer and book title. "
+                "Orders without books have empty book columns."
+            ),
+            tags=["orders_list"],
+            responses={
+                "200": {
+                    "description": "One JSON row per line, oldest update first",
+                    "content": {
+                        "application/x-ndjson": {"schema": "OrderExportRowSchema"}
+                    },
+                },
+                "422": {
+                    "description": "Invalid since parameter.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
+
+
+api_spec.path(
+    resource=OrderOverdueResource,
+    # api=api,
+    app=current_app,
+    parameters=[
+        {
+            "name": "limit",
+            "in": "query",
+            "required": False,
+            "description": "Orders per page, 50 by default.",
+            "schema": {"type": "integer", "minimum": 1, "maximum": 200},
+        },
+        {
+            "name": "cursor",
+            "in": "query",
+            "required": False,
+            "description": "The next_cursor of the previous page.",
+            "schema": {"type": "string"},
+        },
+    ],
+    operations=dict(
+        get=dict(
+            security=[{"bearerAuth": []}],
+            summary="Lists the overdue orders",
+            description=(
+                "Open orders due before today with their customer and borrowed book titles, "
+                "oldest due first. next_cursor is null on the last page."
+            ),
+            tags=["orders_list"],
+            responses={
+                "200": {
+                    "description": "A page of overdue orders",
+                    "content": {
+                        "application/json": {"schema": "OverdueOrdersPageFixed"}
+                    },
+                },
+                "422": {
+                    "description": "Invalid limit or cursor.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
+
+
+api_spec.path(
+    resource=OrdersCloseResource,
+    # api=api,
+    app=current_app,
+    operations=dict(
+        patch=dict(
+            security=[{"bearerAuth": []}],
+            requestBody={
+                "required": True,
+                "content": {"application/json": {"schema": "OrdersCloseSchema"}},
+            },
+            summary="Closes many orders",
+            description=(
+                "Closes the open orders among order_ids and gives back their copies, "
+                "in one transaction. Up to 1000 ids."
+            ),
+            tags=["orders_list"],
+            responses={
+                "200": {
+                    "description": (
+                        "closed or not_found for each id, not_found for orders "
+                        "missing or closed already"
+                    ),
+                    "content": {
+                        "application/json": {"schema": "OrdersCloseReportSchema"}
+                    },
+                },
+                "422": {
+                    "description": "Invalid list of ids.",
+                    "content": {"application/json": {"schema": "GeneralErrorSchema"}},
+                },
+            },
+        ),
+    ),
+)
@@ -4,11 +4,22 @@ from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
 
-from .api import api_blueprint
+from .api import api_blueprint, compression, openapi
+from .api.response_cache import response_cache
 from .models import db
+from .models.book import book_search_cache
 
 # Example for commands imports
-from .commands import create_superadmin, create_superadmin_token, populate_db
+from .commands import (
+    build_openapi,
+    create_superadmin,
+    create_superadmin_token,
+    expire_idempotency_keys,
+    populate_db,
+    reap_holds,
+    rebuild_availability,
+    shard_stock,
+)
 
 
 load_dotenv()
@@ -28,10 +39,21 @@ def create_app(testing: bool = False) -> Flask:
     # Init db extension
     db.init_app(app)
 
+    book_search_cache.resize(app.config["BOOK_SEARCH_CACHE_SIZE"])
+    book_search_cache.ttl = app.config["BOOK_SEARCH_CACHE_TTL"]
+    response_cache.init_app(app)
+    compression.init_app(app)
+    openapi.init_app(app)
+
     app.register_blueprint(api_blueprint)
 
     # Register general commands
     app.cli.add_command(create_superadmin)
     app.cli.add_command(create_superadmin_token)
     app.cli.add_command(populate_db)
+    app.cli.add_command(build_openapi)
+    app.cli.add_command(reap_holds)
+    app.cli.add_command(shard_stock)
+    app.cli.add_command(rebuild_availability)
+    app.cli.add_command(expire_idempotency_keys)
     return app
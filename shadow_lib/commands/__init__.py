@@ -1,8 +1,17 @@
 from .superadmin import create_superadmin, create_superadmin_token
 from .populate import populate_db
+from .openapi import build_openapi
+from .holds import reap_holds
+from .stock import rebuild_availability, shard_stock
+from .idempotency import expire_idempotency_keys
 
 __all__ = [
     "create_superadmin",
     "create_superadmin_token",
     "populate_db",
+    "build_openapi",
+    "reap_holds",
+    "shard_stock",
+    "rebuild_availability",
+    "expire_idempotency_keys",
 ]
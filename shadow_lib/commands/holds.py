@@ -0,0 +1,13 @@
+import click
+from flask.cli import with_appcontext
+
+from shadow_lib.models import BookHold, db
+
+
+@click.command("reap-holds")
+@with_appcontext
+def reap_holds() -> None:
+    """Delete the expired holds, run it periodically to keep their table small"""
+    reaped = BookHold.reap()
+    db.session.commit()
+    click.echo(f"Deleted {reaped} expired holds")
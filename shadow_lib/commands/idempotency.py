@@ -0,0 +1,15 @@
+import click
+from flask.cli import with_appcontext
+
+from shadow_lib.models import IdempotencyKey
+
+
+@click.command("expire-idempotency-keys")
+@click.option(
+    "--batch-size", default=1000, show_default=True, help="Keys deleted per transaction"
+)
+@with_appcontext
+def expire_idempotency_keys(batch_size: int) -> None:
+    """Delete the expired idempotency keys, run it periodically to keep their table small"""
+    expired = IdempotencyKey.expire(batch_size)
+    click.echo(f"Deleted {expired} expired idempotency keys")
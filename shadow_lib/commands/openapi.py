@@ -0,0 +1,22 @@
+from typing import Optional
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from shadow_lib.api.openapi import build_document
+
+
+@click.command("build-openapi")
+@click.option("--output", "output", type=click.Path(dir_okay=False))
+@with_appcontext
+def build_openapi(output: Optional[str]) -> None:
+    """Write the OpenAPI document, served as it is when OPENAPI_PATH points to it"""
+    path = output or current_app.config["OPENAPI_PATH"]
+    if not path:
+        raise click.UsageError("Pass --output or set OPENAPI_PATH.")
+
+    with open(path, "wb") as file:
+        file.write(build_document())
+
+    click.echo(f"Wrote the OpenAPI document to {path}")
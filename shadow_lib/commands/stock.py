@@ -0,0 +1,29 @@
+import uuid
+
+import click
+from flask.cli import with_appcontext
+
+from shadow_lib.models import Book, BookAvailability, db
+
+
+@click.command("shard-stock")
+@click.argument("book_id", type=click.UUID)
+@click.argument("slots", type=click.IntRange(min=0))
+@with_appcontext
+def shard_stock(book_id: uuid.UUID, slots: int) -> None:
+    """Spread the stock of a hot book over SLOTS stock slots, 0 gathers it back"""
+    stock = Book.shard_stock(book_id, slots)
+    if stock is None:
+        raise click.ClickException(f"Book {book_id} not found")
+
+    db.session.commit()
+    click.echo(f"Spread {stock} copies of book {book_id} over {slots} slots")
+
+
+@click.command("rebuild-availability")
+@with_appcontext
+def rebuild_availability() -> None:
+    """Count the availability of every book again, after loading books behind the API"""
+    BookAvailability.rebuild()
+    db.session.commit()
+    click.echo("Rebuilt the availability of the books")
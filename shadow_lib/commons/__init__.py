@@ -1,3 +1,5 @@
 from .restful_plugin import RestFulResourcePlugin
+from .lru_cache import LRUCache
+from .coalescer import RequestCoalescer
 
-__all__ = ["RestFulResourcePlugin"]
+__all__ = ["RestFulResourcePlugin", "LRUCache", "RequestCoalescer"]
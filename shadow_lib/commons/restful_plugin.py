@@ -11,6 +11,7 @@ from apispec import BasePlugin, yaml_utils
 from apispec.exceptions import APISpecError
 from flask import Flask
 from flask_restful import Resource
+from werkzeug.routing import Rule
 
 # from flask-restplus
 RE_URL = re.compile(r"<(?:[^:<>]+:)?([^<>]+)>")
@@ -67,14 +68,28 @@ class RestFulResourcePlugin(BasePlugin):
         if not getattr(resource, "endpoint", None):
             raise APISpecError("Flask-RESTful resource needed")
 
-        for rule in app.url_map.iter_rules():  # type: ignore
-            if rule.endpoint.endswith("." + resource.endpoint):  # type: ignore
-                break
-        else:
+        rule = self.blueprint_rules(app).get(resource.endpoint)  # type: ignore
+        if rule is None:
             raise APISpecError(f"Cannot find blueprint resource {resource.endpoint}")  # type: ignore
 
         return self.flaskpath2openapi(rule.rule)
 
+    def blueprint_rules(self, app: Flask) -> dict[str, Rule]:
+        """First rule of each blueprint endpoint, by endpoint name without the blueprint.
+
+        Built once per url map instead of scanning it for every resource.
+        """
+        url_map = app.url_map  # type: ignore
+        if getattr(self, "_indexed_map", None) is not url_map:
+            self._rules_by_endpoint: dict[str, Rule] = {}
+            for rule in url_map.iter_rules():
+                blueprint, _, endpoint = rule.endpoint.rpartition(".")
+                if blueprint:
+                    self._rules_by_endpoint.setdefault(endpoint, rule)
+            self._indexed_map = url_map
+
+        return self._rules_by_endpoint
+
     def operation_helper(
         self,
         path: str = None,
@@ -14,6 +14,50 @@ class BaseConfig:
     ACCESS_TOKEN_DELTA: int = int(os.getenv("ACCESS_TOKEN_DELTA", 5))
     REFRESH_TOKEN_DELTA: int = int(os.getenv("REFRESH_TOKEN_DELTA", 2))
 
+    # Max number of distinct searches kept in the book search cache, and seconds
+    # they are kept for: the staleness bound for writes made by other workers
+    # when the response cache is not shared through redis
+    BOOK_SEARCH_CACHE_SIZE: int = int(os.getenv("BOOK_SEARCH_CACHE_SIZE", 1024))
+    BOOK_SEARCH_CACHE_TTL: int = int(os.getenv("BOOK_SEARCH_CACHE_TTL", 60))
+    # Fuzzy search: min word similarity (0 to 1) and max candidates per field
+    BOOK_SEARCH_FUZZY_THRESHOLD: float = float(
+        os.getenv("BOOK_SEARCH_FUZZY_THRESHOLD", 0.5)
+    )
+    BOOK_SEARCH_FUZZY_CANDIDATES: int = int(
+        os.getenv("BOOK_SEARCH_FUZZY_CANDIDATES", 200)
+    )
+
+    # Dump model schemas with generated functions instead of walking the fields
+    COMPILED_SERIALIZERS: bool = os.getenv("COMPILED_SERIALIZERS", "true") == "true"
+
+    # Cache of list responses: in-process LRU size, or a redis url to share the
+    # cache between workers. Entries expire after the ttl in seconds either way
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+    RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+
+    # Responses from this size in bytes are compressed, with gzip (level 1 to 9)
+    # or brotli (quality 0 to 11) when installed
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+    # OpenAPI document written by ``flask build-openapi``, served instead of
+    # building it on the first docs request
+    OPENAPI_PATH = os.getenv("OPENAPI_PATH")
+
+    # Seconds a hold keeps copies aside for a checkout
+    HOLD_TTL: int = int(os.getenv("HOLD_TTL", 600))
+
+    # Attempts at an update that concurrent updates keep making stale
+    CONFLICT_RETRIES: int = int(os.getenv("CONFLICT_RETRIES", 3))
+
+    # Seconds the response of a creation is replayed to retries with its
+    # Idempotency-Key, and how long a retry waits for the response of a
+    # concurrent one
+    IDEMPOTENCY_KEY_TTL: int = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))
+    IDEMPOTENCY_KEY_WAIT: float = float(os.getenv("IDEMPOTENCY_KEY_WAIT", 2))
+
 
 class ProductionConfig(BaseConfig):
     DEBUG = False
@@ -1,5 +1,9 @@
 from typing import Any, Dict, List, Tuple
 
 ErrorResponseType = Tuple[List[str] | List[Any] | Dict[str, Any], int]
-SuccessResponseType = Dict[str, Any] | Tuple[Dict[str, Any], int]
+SuccessResponseType = (
+    Dict[str, Any]
+    | Tuple[Dict[str, Any], int]
+    | Tuple[Dict[str, Any], int, Dict[str, str]]
+)
 TokenDictType = dict[str, object]
@@ -2,9 +2,12 @@ from .db import db
 from .user import User
 from .token import Token
 from .author import Author, BookAuthor
-from .book import Book
+from .availability import BookAvailability
+from .book import Book, BookStockSlot
 from .customer import Customer
 from .order import Order, BorrowedBook
+from .hold import BookHold
+from .idempotency import IdempotencyKey
 
 
 from .model_errors import (
@@ -17,6 +20,12 @@ from .model_errors import (
     CUSTOMER_NOT_FOUND_ERR_MESSAGE,
     ORDER_NOT_FOUND_ERR_MESSAGE,
     BORROWED_BOOK_NOT_FOUND_ERR_MESSAGE,
+    BOOK_QTY_EXCEEDED_ERR_MESSAGE,
+    HOLD_NOT_FOUND_ERR_MESSAGE,
+    HOLD_NOT_COVERED_ERR_MESSAGE,
+    CONFLICT_ERR_MESSAGE,
+    IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE,
+    IDEMPOTENCY_KEY_LOST_ERR_MESSAGE,
 )
 
 __all__ = [
@@ -29,13 +38,23 @@ __all__ = [
     "CUSTOMER_NOT_FOUND_ERR_MESSAGE",
     "ORDER_NOT_FOUND_ERR_MESSAGE",
     "BORROWED_BOOK_NOT_FOUND_ERR_MESSAGE",
+    "BOOK_QTY_EXCEEDED_ERR_MESSAGE",
+    "HOLD_NOT_FOUND_ERR_MESSAGE",
+    "HOLD_NOT_COVERED_ERR_MESSAGE",
+    "CONFLICT_ERR_MESSAGE",
+    "IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE",
+    "IDEMPOTENCY_KEY_LOST_ERR_MESSAGE",
     "db",
     "User",
     "Token",
     "Book",
+    "BookStockSlot",
+    "BookAvailability",
     "Customer",
     "Order",
     "BorrowedBook",
+    "BookHold",
+    "IdempotencyKey",
     "Author",
     "BookAuthor",
 ]
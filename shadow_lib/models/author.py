@@ -3,11 +3,11 @@ import uuid
 from typing import Any
 from flask import abort
 
-from sqlalchemy import Column, Date, String, ForeignKey
+from sqlalchemy import Column, Date, Index, String, ForeignKey, or_
 from sqlalchemy.dialects.postgresql import UUID
 
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import select
+from sqlalchemy.sql import func, select
 from .model_errors import AUTHOR_NOT_FOUND_ERR_MESSAGE
 
 from .db import db
@@ -46,6 +46,28 @@ class Author(db.Model):  # type: ignore
         lazy="select",
     )
 
+    __table_args__ = (
+        # Serve LIKE 'prefix%' lookups of the suggestion endpoint, on the full
+        # name and on the last name alone
+        Index(
+            "ix_authors_full_name_prefix",
+            func.lower(first_name + " " + last_name).label("full_name_lower"),
+            postgresql_ops={"full_name_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_authors_last_name_prefix",
+            func.lower(last_name).label("last_name_lower"),
+            postgresql_ops={"last_name_lower": "text_pattern_ops"},
+        ),
+        # Serves the fuzzy search on author names
+        Index(
+            "ix_authors_full_name_trgm",
+            (first_name + " " + last_name).label("full_name"),
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+    )
+
     @staticmethod
     def get_author(author_id: uuid.UUID, current_user: Any) -> "Author":
         author_query = select(Author).where(Author.id == author_id)
@@ -56,8 +78,41 @@ class Author(db.Model):  # type: ignore
 
         return author
 
+    @staticmethod
+    def get_author_version(author_id: uuid.UUID, current_user: Any) -> tuple:
+        version_query = select(Author.updated_at).where(Author.id == author_id)
+        version = db.session.execute(version_query).one_or_none()
+
+        if not version:
+            return abort(404, AUTHOR_NOT_FOUND_ERR_MESSAGE)
+
+        return tuple(version)
+
+    @staticmethod
+    def get_authors_version(current_user: Any) -> tuple:
+        return db.Model.collection_version(Author)
+
     @staticmethod
     def get_authors(current_user: Any) -> list["Author"]:
         author_query = select(Author)
         authors = db.session.execute(author_query).unique().scalars().all()
         return authors
+
+    @staticmethod
+    def suggest_names(prefix: str, limit: int) -> list[str]:
+        prefix = prefix.lower()
+        full_name = Author.first_name + " " + Author.last_name
+
+        name_query = (
+            select(full_name)
+            .where(
+                or_(
+                    func.lower(full_name).startswith(prefix, autoescape=True),
+                    func.lower(Author.last_name).startswith(prefix, autoescape=True),
+                )
+            )
+            .group_by(full_name)
+            .order_by(func.lower(full_name))
+            .limit(limit)
+        )
+        return db.session.execute(name_query).scalars().all()
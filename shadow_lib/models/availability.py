@@ -0,0 +1,130 @@
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.sql import delete, func, literal, select
+from sqlalchemy.sql.expression import false
+
+from .db import db
+
+
+class BookAvailability(db.Model):  # type: ignore
+    """Copies of a book on loan and on the shelves, kept by the stock changes.
+
+    Every statement changing the stock of a book adds its difference here in
+    the same transaction, the borrowings and returns to ``borrowed`` too, so
+    the availability is read without summing the borrowed books. A book has
+    a row per stock slot its copies are taken from, plus the row 0, so
+    concurrent borrowings of a sharded book don't queue on one row either:
+    the counts of a book are the sums of its rows.
+    """
+
+    __tablename__ = "book_availability"
+
+    book_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    shard = Column(Integer, primary_key=True, default=0)
+    borrowed = Column(Integer, nullable=False, default=0)
+    available = Column(Integer, nullable=False, default=0)
+
+    @staticmethod
+    def move(changes: dict[uuid.UUID, int], lent: bool = True, shard: int = 0) -> None:
+        """Add the stock changes of ``changes`` to the available copies.
+
+        When ``lent`` the copies went to borrowers, or came back from them
+        when positive, so ``borrowed`` moves the other way.
+        """
+        if changes:
+            db.session.execute(BookAvailability.move_query(changes, lent, shard))
+
+    @staticmethod
+    def move_query(changes: dict[uuid.UUID, int], lent: bool, shard: int) -> Any:
+        """The upsert of ``move``, the rows of a book are created on first change"""
+        rows = [
+            dict(
+                book_id=book_id,
+                shard=shard,
+                borrowed=-qty if lent else 0,
+                available=qty,
+            )
+            for book_id, qty in sorted(changes.items())
+        ]
+        move_query = insert(BookAvailability).values(rows)
+        move_query = move_query.on_conflict_do_update(
+            index_elements=[BookAvailability.book_id, BookAvailability.shard],
+            set_=dict(
+                borrowed=BookAvailability.borrowed + move_query.excluded.borrowed,
+                available=BookAvailability.available + move_query.excluded.available,
+                updated_at=func.clock_timestamp(),
+            ),
+        )
+        return move_query
+
+    @staticmethod
+    def get_availability(
+        current_user: Any,
+        book_ids: Optional[list[uuid.UUID]] = None,
+        in_stock: Optional[bool] = None,
+        min_available: Optional[int] = None,
+    ) -> list[dict]:
+        """Copies, borrowed and available copies of the books, by book id"""
+        borrowed = func.sum(BookAvailability.borrowed)
+        available = func.sum(BookAvailability.available)
+        availability_query = (
+            select(
+                BookAvailability.book_id,
+                (available + borrowed).label("copies"),
+                borrowed.label("borrowed"),
+                available.label("available"),
+            )
+            .group_by(BookAvailability.book_id)
+            .order_by(BookAvailability.book_id)
+        )
+        if book_ids:
+            availability_query = availability_query.where(
+                BookAvailability.book_id.in_(book_ids)
+            )
+        if in_stock is not None:
+            availability_query = availability_query.having(
+                (available > 0) if in_stock else (available <= 0)
+            )
+        if min_available is not None:
+            availability_query = availability_query.having(available >= min_available)
+
+        return [dict(row) for row in db.session.execute(availability_query).mappings()]
+
+    @staticmethod
+    def rebuild() -> None:
+        """Count the availability of every book again from the stock and the open orders.
+
+        For books written behind the models' back, like bulk loads. Not
+        committed.
+        """
+        # book imports this module
+        from .book import Book, BookStockSlot
+        from .order import BorrowedBook, Order
+
+        slots = (
+            select(func.coalesce(func.sum(BookStockSlot.qty), 0))
+            .where(BookStockSlot.book_id == Book.id)
+            .scalar_subquery()
+        )
+        borrowed = (
+            select(func.coalesce(func.sum(BorrowedBook.qty), 0))
+            .join(Order, Order.id == BorrowedBook.order_id)
+            .where(BorrowedBook.book_id == Book.id, Order.has_been_returned == false())
+            .scalar_subquery()
+        )
+        db.session.execute(
+            delete(BookAvailability).execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            insert(BookAvailability).from_select(
+                ["book_id", "shard", "borrowed", "available"],
+                select(Book.id, literal(0), borrowed, Book.qty + slots),
+            )
+        )
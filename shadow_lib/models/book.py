@@ -1,19 +1,68 @@
 import uuid
 
-from typing import Any
-from flask import abort
+from typing import Any, Iterable, Optional, Union
+from flask import abort, current_app
 
-from sqlalchemy import Column, Date, Integer, String, ForeignKey
+from sqlalchemy import Column, Date, DateTime, Index, Integer, String, ForeignKey
+from sqlalchemy import (
+    DDL,
+    CheckConstraint,
+    case,
+    cast,
+    column,
+    distinct,
+    event,
+    extract,
+    literal,
+    literal_column,
+    values,
+)
 from sqlalchemy.dialects.postgresql import UUID
 
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import select
+from sqlalchemy.orm import column_property, relationship, selectinload
+from sqlalchemy.orm.attributes import get_history, set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import Select, delete, func, insert, select, union_all, update
 
+from shadow_lib.commons import LRUCache
 from shadow_lib.models import Author, BookAuthor
+from .availability import BookAvailability
 from .model_errors import BOOK_NOT_FOUND_ERR_MESSAGE
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
 
 from .db import db
+from .versions import table_versions
+
+# Matching book ids and facets per catalogue version and normalized search
+book_search_cache = LRUCache()
+
+# GROUPING() bitmasks of the search grouping sets: a bit is set for each of
+# (book, author, release year, availability) the row is not grouped by
+GROUPED_BY_BOOK = 0b0111
+GROUPED_BY_AUTHOR = 0b1011
+GROUPED_BY_RELEASE_YEAR = 0b1101
+GROUPED_BY_AVAILABILITY = 0b1110
+
+
+class BookStockSlot(db.Model):  # type: ignore
+    """A share of the stock of a sharded book.
+
+    Borrowings of a sharded book take their copies from a random slot, so
+    concurrent ones mostly update different rows instead of queueing on the
+    book row.
+    """
+
+    __tablename__ = "book_stock_slots"
+
+    book_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    slot = Column(Integer, primary_key=True)
+    qty = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (CheckConstraint("qty >= 0", name="ck_book_stock_slots_qty"),)
 
 
 class Book(db.Model):  # type: ignore
@@ -29,7 +78,18 @@ class Book(db.Model):  # type: ignore
 
     release_date = Column(Date, nullable=False)
 
-    qty = Column(Integer, nullable=False, default=0)
+    # Copies on the shelf: the whole stock, unless the book is sharded. The
+    # previous value is kept on changes, for the availability
+    qty = column_property(
+        Column(Integer, nullable=False, default=0), active_history=True
+    )
+    # Stock slots the other copies of a hot book are spread over
+    stock_slots = Column(Integer, nullable=False, default=0, server_default="0")
+    # Moved by every update, an update of a stale book raises StaleDataError
+    version_id = Column(Integer, nullable=False, server_default="1")
+    # Holds of the book may be active until then, after it the stock is taken
+    # without checking them
+    held_until = Column(DateTime(timezone=True))
     created_by_id = Column(
         UUID(as_uuid=True), ForeignKey("backoffice_users.id", ondelete="SET NULL")
     )
@@ -48,6 +108,37 @@ class Book(db.Model):  # type: ignore
         lazy="joined",
     )
 
+    # Copies in the stock slots, the stock is qty + slots_qty
+    slots_qty = column_property(
+        case(
+            (
+                stock_slots > 0,
+                select(func.coalesce(func.sum(BookStockSlot.qty), 0))
+                .where(BookStockSlot.book_id == id)
+                .scalar_subquery(),
+            ),
+            else_=0,
+        )
+    )
+
+    __table_args__ = (
+        # Serves LIKE 'prefix%' lookups of the suggestion endpoint
+        Index(
+            "ix_books_title_prefix",
+            func.lower(title).label("title_lower"),
+            postgresql_ops={"title_lower": "text_pattern_ops"},
+        ),
+        # Serves the fuzzy search
+        Index(
+            "ix_books_title_trgm",
+            title,
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
+    __mapper_args__ = {"version_id_col": version_id}
+
     @staticmethod
     def get_book(book_id: uuid.UUID, current_user: Any) -> "Book":
         book_query = select(Book).where(Book.id == book_id)
@@ -58,6 +149,37 @@ class Book(db.Model):  # type: ignore
 
         return book
 
+    @staticmethod
+    def get_book_version(book_id: uuid.UUID, current_user: Any) -> tuple:
+        """What the book payload depends on: its row, author links and stock slots"""
+        slots_updated_at = (
+            select(func.max(BookStockSlot.updated_at))
+            .where(BookStockSlot.book_id == book_id)
+            .scalar_subquery()
+        )
+        version_query = (
+            select(
+                Book.updated_at,
+                Book.version_id,
+                func.count(BookAuthor.author_id),
+                func.max(BookAuthor.updated_at),
+                slots_updated_at,
+            )
+            .outerjoin(BookAuthor, BookAuthor.book_id == Book.id)
+            .where(Book.id == book_id)
+            .group_by(Book.id)
+        )
+        version = db.session.execute(version_query).one_or_none()
+
+        if not version:
+            return abort(404, BOOK_NOT_FOUND_ERR_MESSAGE)
+
+        return tuple(version)
+
+    @staticmethod
+    def get_books_version(current_user: Any) -> tuple:
+        return db.Model.collection_version(Book, BookAuthor, BookStockSlot)
+
     @staticmethod
     def get_books(current_user: Any) -> list["Book"]:
         book_query = select(Book)
@@ -65,24 +187,686 @@ class Book(db.Model):  # type: ignore
         return books
 
     @staticmethod
-    def search_books(current_user: Any, valid_filters: dict = None) -> list["Book"]:
-        book_query = select(Book).join(BookAuthor).join(Author)
-        book_query = book_query.where(
-            or_(
-                Book.title.ilike("%" + valid_filters["q"] + "%"),
-                Author.first_name.ilike("%" + valid_filters["q"] + "%"),
-                Author.last_name.ilike("%" + valid_filters["q"] + "%"),
-                Book.EAN.ilike("%" + valid_filters["q"] + "%"),
-                Book.SKU.ilike("%" + valid_filters["q"] + "%"),
+    def lock_stock(book_ids: Union[list[uuid.UUID], Select]) -> None:
+        """Lock the rows of ``book_ids``, or of a SELECT of them, in id order until
+        the transaction ends.
+
+        Statements moving copies between the shelf and the slots of a book
+        go through this lock first, and concurrent writers sharing books can't
+        deadlock. The row is always locked before the hold lock of the book.
+        NO KEY UPDATE leaves inserting rows that refer to the books free.
+        """
+        lock_query = (
+            select(Book.id)
+            .where(Book.id.in_(book_ids))
+            .order_by(Book.id)
+            .with_for_update(key_share=True)
+        )
+        db.session.execute(lock_query)
+
+    @staticmethod
+    def decrement_stock(book_id: uuid.UUID, qty: int) -> Optional[int]:
+        """Take ``qty`` copies with a conditional UPDATE.
+
+        The copies held by others can't be taken, and the check and the write
+        happen in the same statement, so concurrent borrowings can't both take
+        the last copies. Returns the stock left, or None when there aren't
+        enough copies.
+        """
+        if Book.sharded_ids([book_id]):
+            return Book.take_from_slots(book_id, qty)
+
+        return Book.decrement_shelf_stocks({book_id: qty}).get(book_id)
+
+    @staticmethod
+    def increment_stock(book_id: uuid.UUID, qty: int) -> Optional[int]:
+        """Give back ``qty`` borrowed copies to the shelf, returns the copies on it"""
+        stock_query = (
+            update(Book)
+            .where(Book.id == book_id)
+            .values(qty=Book.qty + qty, version_id=Book.version_id + 1)
+            .returning(Book.qty, Book.version_id)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.session.execute(stock_query).one_or_none()
+
+        if row is None:
+            return None
+        Book.sync_stock(book_id, *row)
+        BookAvailability.move({book_id: qty})
+        return row.qty
+
+    @staticmethod
+    def decrement_stocks(quantities: dict[uuid.UUID, int]) -> dict[uuid.UUID, int]:
+        """Take the copies of several books.
+
+        Returns the stock left of the books that had enough copies, the
+        caller rolls back when some are missing. Sharded books are taken from
+        their slots one by one, after the others, so the locks are always
+        taken in the same order.
+        """
+        sharded = Book.sharded_ids(quantities)
+        shelved = {
+            book_id: qty
+            for book_id, qty in quantities.items()
+            if book_id not in sharded
+        }
+
+        left = Book.decrement_shelf_stocks(shelved) if shelved else {}
+        for book_id in sorted(sharded):
+            slot_left = Book.take_from_slots(book_id, quantities[book_id])
+            if slot_left is not None:
+                left[book_id] = slot_left
+        return left
+
+    @staticmethod
+    def holds_expired() -> Any:
+        """Whether no hold of the book can be active at the transaction start"""
+        return or_(Book.held_until.is_(None), Book.held_until <= func.now())
+
+    @staticmethod
+    def held_ids(book_ids: list[uuid.UUID]) -> set[uuid.UUID]:
+        """Which of ``book_ids`` may have active holds"""
+        if not book_ids:
+            return set()
+
+        held_query = select(Book.id).where(Book.id.in_(book_ids), ~Book.holds_expired())
+        return set(db.session.execute(held_query).scalars())
+
+    @staticmethod
+    def decrement_shelf_stocks(
+        quantities: dict[uuid.UUID, int]
+    ) -> dict[uuid.UUID, int]:
+        """Take the copies of unsharded books in a single UPDATE over a VALUES list.
+
+        Books are locked in id order, so concurrent orders sharing books can't
+        deadlock. The books without active holds are taken by that statement
+        alone: a hold committed meanwhile moves ``held_until``, which the
+        UPDATE checks again on the row it waited for. The books it left that
+        have active holds are taken again under the shared hold lock, against
+        the copies not held.
+        """
+        # hold imports this module
+        from .hold import BookHold
+
+        left = Book.take_shelf_stocks(quantities, held=False)
+
+        held = Book.held_ids([book_id for book_id in quantities if book_id not in left])
+        if held:
+            # The rows are locked already, the hold lock comes after them
+            BookHold.lock(held, shared=True)
+            left.update(
+                Book.take_shelf_stocks(
+                    {book_id: quantities[book_id] for book_id in held}, held=True
+                )
             )
+
+        BookAvailability.move({book_id: -quantities[book_id] for book_id in left})
+        return left
+
+    @staticmethod
+    def take_shelf_stocks(
+        quantities: dict[uuid.UUID, int], held: bool
+    ) -> dict[uuid.UUID, int]:
+        """The UPDATE of ``decrement_shelf_stocks``.
+
+        When ``held`` the copies held by others are left, otherwise only the
+        books without active holds are taken. All the books of ``quantities``
+        are locked, those updated or not.
+        """
+        # hold imports this module
+        from .hold import BookHold
+
+        lines = values(
+            column("book_id", UUID(as_uuid=True)),
+            column("qty", Integer),
+            name="lines",
+        ).data(sorted(quantities.items()))
+        locked = (
+            select(Book.id, lines.c.qty)
+            .join(lines, lines.c.book_id == Book.id)
+            .order_by(Book.id)
+            .with_for_update(of=Book, key_share=True)
+            .subquery()
         )
+        if held:
+            enough = Book.qty - BookHold.held_qty(Book.id) >= locked.c.qty
+        else:
+            enough = and_(Book.qty >= locked.c.qty, Book.holds_expired())
 
-        # if valid_filters.get("release_date"):
-        #     book_query = book_query.where(
-        #         Book.release_date == valid_filters["release_date"]
-        #     )
+        stock_query = (
+            update(Book)
+            .where(Book.id == locked.c.id, enough)
+            .values(qty=Book.qty - locked.c.qty, version_id=Book.version_id + 1)
+            .returning(Book.id, Book.qty, Book.version_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        left = {}
+        for book_id, qty, version_id in db.session.execute(stock_query):
+            Book.sync_stock(book_id, qty, version_id)
+            left[book_id] = qty
+        return left
+
+    @staticmethod
+    def sync_stock(book_id: uuid.UUID, qty: int, version_id: int) -> None:
+        # Keep an already loaded book in step with the row, without a flush
+        book = db.session.identity_map.get(identity_key(Book, book_id))
+        if book is not None:
+            set_committed_value(book, "qty", qty)
+            set_committed_value(book, "version_id", version_id)
+
+    @staticmethod
+    def sync_slots(book_id: uuid.UUID) -> None:
+        # The copies in the slots of a loaded book are read again on next access
+        book = db.session.identity_map.get(identity_key(Book, book_id))
+        if book is not None:
+            db.session.expire(book, ["slots_qty"])
+
+    @staticmethod
+    def sharded_ids(book_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        """Which of ``book_ids`` have their stock spread over slots.
+
+        Books already loaded answer from the identity map, the others from a
+        query.
+        """
+        sharded, unknown = set(), []
+        for book_id in book_ids:
+            book = db.session.identity_map.get(identity_key(Book, book_id))
+            if book is None or "stock_slots" not in book.__dict__:
+                unknown.append(book_id)
+            elif book.stock_slots:
+                sharded.add(book_id)
+
+        if unknown:
+            sharded_query = select(Book.id).where(
+                Book.id.in_(unknown), Book.stock_slots > 0
+            )
+            sharded.update(db.session.execute(sharded_query).scalars())
+        return sharded
+
+    @staticmethod
+    def take_from_slots(book_id: uuid.UUID, qty: int) -> Optional[int]:
+        """Take ``qty`` copies of a sharded book from a random slot.
+
+        Slots locked by other borrowings are skipped, so concurrent ones
+        seldom wait on each other; when all those with enough copies are
+        locked, it waits for one. When no slot has enough copies they are
+        swept from all the slots and the shelf instead. Returns the copies
+        left where they were taken, or None when there aren't enough.
+        """
+        left = None
+        for skip_locked in (True, False):
+            slot = (
+                select(BookStockSlot.slot)
+                .where(BookStockSlot.book_id == book_id, BookStockSlot.qty >= qty)
+                .order_by(func.random())
+                .limit(1)
+                .with_for_update(skip_locked=skip_locked, key_share=True)
+                .scalar_subquery()
+            )
+            slot_query = (
+                update(BookStockSlot)
+                .where(
+                    BookStockSlot.book_id == book_id,
+                    BookStockSlot.slot == slot,
+                    BookStockSlot.qty >= qty,
+                )
+                .values(qty=BookStockSlot.qty - qty)
+                .returning(BookStockSlot.slot, BookStockSlot.qty)
+                .execution_options(synchronize_session=False)
+            )
+            row = db.session.execute(slot_query).one_or_none()
+            if row is not None:
+                # On the row of the slot, which the slot lock keeps to us
+                BookAvailability.move({book_id: -qty}, shard=row.slot + 1)
+                left = row.qty
+                break
+
+        if left is None:
+            left = Book.sweep_stock(book_id, qty)
+        if left is not None:
+            Book.sync_slots(book_id)
+        return left
+
+    @staticmethod
+    def sweep_stock(book_id: uuid.UUID, qty: int) -> Optional[int]:
+        """Take ``qty`` copies of a sharded book across its slots, then its shelf.
+
+        Locks the book row and every slot, so it's only the fallback of
+        ``take_from_slots``. The held copies of the shelf can't be taken.
+        Returns the stock left, or None when there aren't enough copies.
+        """
+        # hold imports this module
+        from .hold import BookHold
+
+        Book.lock_stock([book_id])
+        BookHold.lock([book_id], shared=True)
+        slots_query = (
+            select(BookStockSlot.slot, BookStockSlot.qty)
+            .where(BookStockSlot.book_id == book_id)
+            .order_by(BookStockSlot.slot)
+            .with_for_update(key_share=True)
+        )
+        slots = db.session.execute(slots_query).all()
+        shelf_query = select(Book.qty - BookHold.held_qty(Book.id)).where(
+            Book.id == book_id
+        )
+        shelf = max(db.session.execute(shelf_query).scalar_one(), 0)
+
+        stock = shelf + sum(slot_qty for _, slot_qty in slots)
+        if stock < qty:
+            return None
+
+        taken, wanted = {}, qty
+        for slot, slot_qty in slots:
+            if wanted and slot_qty:
+                taken[slot] = min(slot_qty, wanted)
+                wanted -= taken[slot]
+
+        if taken:
+            lines = values(
+                column("slot", Integer), column("qty", Integer), name="lines"
+            ).data(sorted(taken.items()))
+            db.session.execute(
+                update(BookStockSlot)
+                .where(
+                    BookStockSlot.book_id == book_id,
+                    BookStockSlot.slot == lines.c.slot,
+                )
+                .values(qty=BookStockSlot.qty - lines.c.qty)
+                .execution_options(synchronize_session=False)
+            )
+            BookAvailability.move({book_id: -sum(taken.values())})
+        if wanted:
+            Book.increment_stock(book_id, -wanted)
+
+        return stock - qty
+
+    @staticmethod
+    def refill_shelf(book_id: uuid.UUID, qty: int) -> None:
+        """Move copies of a sharded book from its slots to its shelf, until ``qty``
+        of the copies there aren't held.
+
+        Holds are kept on the shelf, which only keeps the held copies once the
+        book is sharded. Locks the book row and every slot like
+        ``sweep_stock``, so holds of a sharded book queue on its row: its
+        borrowings take the slots, not the row. Nothing moves when the whole
+        stock is short.
+        """
+        # hold imports this module
+        from .hold import BookHold
+
+        Book.lock_stock([book_id])
+        shelf_query = select(Book.qty - BookHold.held_qty(Book.id)).where(
+            Book.id == book_id
+        )
+        missing = qty - db.session.execute(shelf_query).scalar_one()
+        if missing <= 0:
+            return
+
+        slots_query = (
+            select(BookStockSlot.slot, BookStockSlot.qty)
+            .where(BookStockSlot.book_id == book_id)
+            .order_by(BookStockSlot.slot)
+            .with_for_update(key_share=True)
+        )
+        slots = db.session.execute(slots_query).all()
+        if sum(slot_qty for _, slot_qty in slots) < missing:
+            return
+
+        taken = {}
+        for slot, slot_qty in slots:
+            if missing and slot_qty:
+                taken[slot] = min(slot_qty, missing)
+                missing -= taken[slot]
+
+        # The stock doesn't change, neither does the availability
+        lines = values(
+            column("slot", Integer), column("qty", Integer), name="lines"
+        ).data(sorted(taken.items()))
+        db.session.execute(
+            update(BookStockSlot)
+            .where(
+                BookStockSlot.book_id == book_id,
+                BookStockSlot.slot == lines.c.slot,
+            )
+            .values(qty=BookStockSlot.qty - lines.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id)
+            .values(qty=Book.qty + sum(taken.values()), version_id=Book.version_id + 1)
+            .returning(Book.qty, Book.version_id)
+            .execution_options(synchronize_session=False)
+        ).one()
+        Book.sync_stock(book_id, *row)
+        Book.sync_slots(book_id)
+
+    @staticmethod
+    def shard_stock(
+        book_id: uuid.UUID, slots: int, qty: Optional[int] = None
+    ) -> Optional[int]:
+        """Spread the stock of a book over ``slots`` stock slots, 0 gathers it back.
+
+        ``qty`` replaces the stock, which is kept otherwise. The held copies
+        stay on the shelf. Not committed, returns the stock or None when
+        there's no such book.
+        """
+        # hold imports this module
+        from .hold import BookHold
+
+        Book.lock_stock([book_id])
+        BookHold.lock([book_id])
+        stock_query = select(Book.qty, BookHold.held_qty(Book.id)).where(
+            Book.id == book_id
+        )
+        row = db.session.execute(stock_query).one_or_none()
+        if row is None:
+            return None
+        shelf, held = row
+
+        gathered = db.session.execute(
+            delete(BookStockSlot)
+            .where(BookStockSlot.book_id == book_id)
+            .returning(BookStockSlot.qty)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+        gathered_qty = sum(gathered)
+        stock = shelf + gathered_qty if qty is None else qty
+        BookAvailability.move({book_id: stock - shelf - gathered_qty}, lent=False)
+
+        shelf = min(stock, held) if slots else stock
+        if slots:
+            per_slot, extra = divmod(stock - shelf, slots)
+            db.session.execute(
+                insert(BookStockSlot),
+                [
+                    dict(book_id=book_id, slot=slot, qty=per_slot + (slot < extra))
+                    for slot in range(slots)
+                ],
+            )
+
+        version_id = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id)
+            .values(qty=shelf, stock_slots=slots, version_id=Book.version_id + 1)
+            .returning(Book.version_id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+
+        Book.sync_stock(book_id, shelf, version_id)
+        book = db.session.identity_map.get(identity_key(Book, book_id))
+        if book is not None:
+            set_committed_value(book, "stock_slots", slots)
+        Book.sync_slots(book_id)
+        return stock
+
+    @staticmethod
+    def get_books_by_ids(book_ids: list[uuid.UUID]) -> list["Book"]:
+        """Load books keeping the order of the given ids"""
+        if not book_ids:
+            return []
+
+        book_query = (
+            select(Book)
+            .where(Book.id.in_(book_ids))
+            .options(selectinload(Book.authors))
+        )
+        books = db.session.execute(book_query).scalars().all()
+
+        position = {book_id: index for index, book_id in enumerate(book_ids)}
+        return sorted(books, key=lambda book: position[book.id])
+
+    @staticmethod
+    def suggest_titles(prefix: str, limit: int) -> list[str]:
+        title_lower = func.lower(Book.title)
+        title_query = (
+            select(func.min(Book.title))
+            .where(title_lower.startswith(prefix.lower(), autoescape=True))
+            .group_by(title_lower)
+            .order_by(title_lower)
+            .limit(limit)
+        )
+        return db.session.execute(title_query).scalars().all()
+
+    @staticmethod
+    def catalogue_version() -> tuple[int, ...]:
+        # Shared counters, when configured, carry writes made by other workers
+        return table_versions.get(
+            Book.__tablename__,
+            Author.__tablename__,
+            BookAuthor.__tablename__,
+            BookStockSlot.__tablename__,
+            shared=True,
+        )
+
+    @staticmethod
+    def search_cache_key(valid_filters: dict) -> tuple:
+        # ILIKE matching is case insensitive, so is the key. Any catalogue write
+        # moves the version, leaving older entries to age out of the LRU, or to
+        # expire after BOOK_SEARCH_CACHE_TTL
+        normalized = tuple(
+            sorted(
+                (key, value.lower() if isinstance(value, str) else value)
+                for key, value in valid_filters.items()
+            )
+        )
+        return Book.catalogue_version(), normalized
+
+    @staticmethod
+    def search_books(
+        current_user: Any, valid_filters: dict = None
+    ) -> tuple[list["Book"], dict]:
+        cache_key = Book.search_cache_key(valid_filters)
+
+        cached = book_search_cache.get(cache_key)
+        if cached is None:
+            cached = Book.search_book_ids(valid_filters)
+            book_search_cache.set(cache_key, cached)
+
+        book_ids, facets = cached
+        return Book.get_books_by_ids(book_ids), facets
+
+    @staticmethod
+    def text_match_condition(valid_filters: dict) -> Any:
+        pattern = "%" + valid_filters["q"] + "%"
+
+        # A semi-join keeps one row per book however many authors match
+        author_matches = (
+            select(BookAuthor.book_id)
+            .join(Author, Author.id == BookAuthor.author_id)
+            .where(
+                BookAuthor.book_id == Book.id,
+                or_(Author.first_name.ilike(pattern), Author.last_name.ilike(pattern)),
+            )
+            .exists()
+        )
+
+        return or_(
+            Book.title.ilike(pattern),
+            Book.EAN.ilike(pattern),
+            Book.SKU.ilike(pattern),
+            author_matches,
+        )
+
+    @staticmethod
+    def fuzzy_candidates(valid_filters: dict) -> Any:
+        """Books whose title or an author's full name resemble ``q``, with their score.
+
+        The ``<%`` word similarity operator is answered by the trigram GIN
+        indexes, and each side keeps only its best scored candidates so the
+        cost stays bounded however loose the query is.
+        """
+        q = valid_filters["q"]
+        threshold = valid_filters.get(
+            "similarity", current_app.config["BOOK_SEARCH_FUZZY_THRESHOLD"]
+        )
+        max_candidates = current_app.config["BOOK_SEARCH_FUZZY_CANDIDATES"]
+
+        # The operator reads its threshold from the setting, for this transaction only
+        db.session.execute(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold", str(threshold), True
+                )
+            )
+        )
+
+        title_score = func.word_similarity(q, Book.title)
+        title_candidates = (
+            select(Book.id.label("book_id"), title_score.label("score"))
+            .where(literal(q).op("<%", is_comparison=True)(Book.title))
+            .order_by(title_score.desc())
+            .limit(max_candidates)
+        )
+
+        full_name = (Author.first_name + " " + Author.last_name).self_group()
+        author_score = func.word_similarity(q, full_name)
+        author_candidates = (
+            select(BookAuthor.book_id, author_score.label("score"))
+            .join(Author, Author.id == BookAuthor.author_id)
+            .where(literal(q).op("<%", is_comparison=True)(full_name))
+            .order_by(author_score.desc())
+            .limit(max_candidates)
+        )
+
+        scores = union_all(title_candidates, author_candidates).subquery()
+        return (
+            select(scores.c.book_id, func.max(scores.c.score).label("score"))
+            .group_by(scores.c.book_id)
+            .cte("fuzzy_candidates")
+        )
+
+    @staticmethod
+    def filter_conditions(valid_filters: dict) -> list[Any]:
+        conditions = []
+
+        if valid_filters.get("release_date"):
+            conditions.append(Book.release_date == valid_filters["release_date"])
+
+        if valid_filters.get("release_date_from"):
+            conditions.append(Book.release_date >= valid_filters["release_date_from"])
+
+        if valid_filters.get("release_date_to"):
+            conditions.append(Book.release_date <= valid_filters["release_date_to"])
+
+        if valid_filters.get("author"):
+            conditions.append(
+                select(BookAuthor.book_id)
+                .where(
+                    BookAuthor.book_id == Book.id,
+                    BookAuthor.author_id == valid_filters["author"],
+                )
+                .exists()
+            )
+
+        if valid_filters.get("in_stock") is not None:
+            in_stock = Book.qty + Book.slots_qty > 0
+            conditions.append(in_stock if valid_filters["in_stock"] else ~in_stock)
+
+        return conditions
+
+    @staticmethod
+    def search_book_ids(valid_filters: dict) -> tuple[list[uuid.UUID], dict]:
+        """Matching book ids and facet counts, computed by one grouping sets query.
+
+        One grouping set returns a row per matching book, the others count the
+        matching books per author, per release year and per availability.
+        """
+        matched = select(
+            Book.id,
+            Book.title,
+            Book.release_date,
+            (Book.qty + Book.slots_qty).label("qty"),
+        )
+
+        if valid_filters.get("fuzzy"):
+            candidates = Book.fuzzy_candidates(valid_filters)
+            matched = matched.add_columns(candidates.c.score).join(
+                candidates, candidates.c.book_id == Book.id
+            )
+        else:
+            matched = matched.add_columns(literal_column("1.0").label("score")).where(
+                Book.text_match_condition(valid_filters)
+            )
+
+        matched = matched.where(*Book.filter_conditions(valid_filters)).cte(
+            "matched_books"
+        )
+
+        release_year = cast(extract("year", matched.c.release_date), Integer)
+        in_stock = matched.c.qty > literal_column("0")
+        grouped_columns = (matched.c.id, BookAuthor.author_id, release_year, in_stock)
+
+        facet_query = (
+            select(
+                func.grouping(*grouped_columns).label("grouping"),
+                matched.c.id,
+                BookAuthor.author_id,
+                release_year.label("release_year"),
+                in_stock.label("in_stock"),
+                func.min(matched.c.title).label("title"),
+                func.max(matched.c.score).label("score"),
+                func.min(Author.first_name + " " + Author.last_name).label("name"),
+                func.count(distinct(matched.c.id)).label("count"),
+            )
+            .select_from(matched)
+            .outerjoin(BookAuthor, BookAuthor.book_id == matched.c.id)
+            .outerjoin(Author, Author.id == BookAuthor.author_id)
+            .group_by(func.grouping_sets(*grouped_columns))
+        )
+
+        books = []
+        facets: dict = {
+            "authors": [],
+            "release_years": [],
+            "availability": {"in_stock": 0, "out_of_stock": 0},
+        }
+
+        for row in db.session.execute(facet_query):
+            if row.grouping == GROUPED_BY_BOOK:
+                books.append((-row.score, row.title, row.id))
+            elif row.grouping == GROUPED_BY_AUTHOR and row.author_id is not None:
+                facets["authors"].append(
+                    {"id": row.author_id, "name": row.name, "count": row.count}
+                )
+            elif row.grouping == GROUPED_BY_RELEASE_YEAR:
+                facets["release_years"].append(
+                    {"year": row.release_year, "count": row.count}
+                )
+            elif row.grouping == GROUPED_BY_AVAILABILITY:
+                availability = "in_stock" if row.in_stock else "out_of_stock"
+                facets["availability"][availability] = row.count
+
+        facets["authors"].sort(key=lambda author: (-author["count"], author["name"]))
+        facets["release_years"].sort(key=lambda year: year["year"])
+
+        # Best scored first, then by title
+        return [book[-1] for book in sorted(books)], facets
+
+
+@event.listens_for(Book, "after_insert")
+def _count_new_book(mapper: Any, connection: Any, book: Book) -> None:
+    availability_query = BookAvailability.move_query(
+        {book.id: book.qty or 0}, lent=False, shard=0
+    )
+    connection.execute(availability_query)
+
+
+@event.listens_for(Book, "after_update")
+def _count_restocked_book(mapper: Any, connection: Any, book: Book) -> None:
+    # Stock statements keep qty without history, this is a change of the book
+    added, _, deleted = get_history(book, "qty")
+    if added and deleted and added[0] != deleted[0]:
+        availability_query = BookAvailability.move_query(
+            {book.id: added[0] - deleted[0]}, lent=False, shard=0
+        )
+        connection.execute(availability_query)
 
-        books = db.session.execute(book_query).unique().scalars().all()
-        return books
 
-        # courses = courses.filter(models.Course.name.like('%' + searchForm.courseName.data + '%'))
+# The trigram indexes of the fuzzy search need the extension
+event.listen(
+    db.Model.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
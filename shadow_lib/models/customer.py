@@ -12,6 +12,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.sql import select
 
 from .db import db
+from .order import Order
 
 from .model_errors import CUSTOMER_NOT_FOUND_ERR_MESSAGE
 
@@ -57,6 +58,10 @@ class Customer(db.Model):  # type: ignore
 
         return customer
 
+    @staticmethod
+    def get_customers_version(current_user: Any) -> tuple:
+        return db.Model.collection_version(Customer, Order)
+
     @staticmethod
     def get_customers(current_user: Any) -> list["Customer"]:
         customer_query = select(Customer)
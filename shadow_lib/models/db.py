@@ -1,13 +1,18 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
 
 import click
-from flask import Flask, current_app
+from flask import Flask, abort, current_app
 from flask.cli import with_appcontext
 from sqlalchemy import Column, DateTime, create_engine, engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.orm.session import Session
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, select
+
+from .model_errors import CONFLICT_ERR_MESSAGE
+
+T = TypeVar("T")
 
 
 @click.command("init-db")
@@ -29,10 +34,12 @@ class Model:
     query = None
 
     created_at = Column(DateTime(timezone=True), default=func.current_timestamp())
+    # Time of the write itself, not of the transaction start: a transaction
+    # started earlier but writing later must still move max(updated_at)
     updated_at = Column(
         DateTime(timezone=True),
-        default=func.current_timestamp(),
-        onupdate=func.current_timestamp(),
+        default=func.clock_timestamp(),
+        onupdate=func.clock_timestamp(),
     )
 
     @classmethod
@@ -43,6 +50,50 @@ class Model:
     def count(cls):  # type: ignore
         return db.session.execute(func.count(cls.id)).scalar()
 
+    @staticmethod
+    def collection_version(*models: Any) -> tuple:
+        """Row count and last update of each table, in one query.
+
+        Any insert or update moves a max(updated_at) and any delete a count,
+        which is enough to tell whether a listing of these tables changed.
+        Update times are taken when the row is written, so only a write
+        committed after a later one, within the gap between its statement and
+        its commit, goes unnoticed.
+        """
+        versions = []
+        for model in models:
+            versions.append(select(func.count()).select_from(model).scalar_subquery())
+            versions.append(select(func.max(model.updated_at)).scalar_subquery())
+
+        return tuple(db.session.execute(select(*versions)).one())
+
+    @staticmethod
+    def stream_rows(query: Any, batch_size: int = 1000) -> Iterator[list[dict]]:
+        """Rows of ``query`` as dicts, ``batch_size`` at a time.
+
+        Rows are read through a server side cursor, so memory use doesn't
+        grow with the size of the result.
+        """
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+    @staticmethod
+    def retry_on_conflict(write: Callable[[], T], attempts: int) -> T:
+        """Run the read-modify-write ``write`` again while a concurrent update beats it.
+
+        Versioned rows are only updated at the version they were read, so a
+        lost race raises StaleDataError; the next attempt reads them again.
+        After ``attempts`` the request fails with a 409.
+        """
+        for _ in range(attempts):
+            try:
+                return write()
+            except StaleDataError:
+                db.session.rollback()
+
+        return abort(409, CONFLICT_ERR_MESSAGE)
+
     def save(self) -> None:
         if not self.id:  # type: ignore
             db.session.add(self)
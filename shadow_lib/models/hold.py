@@ -0,0 +1,208 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Iterable, Optional
+
+from flask import abort
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import delete, func, insert, literal, or_, select, update
+
+from .book import Book
+from .db import db
+from .model_errors import HOLD_NOT_FOUND_ERR_MESSAGE
+
+
+class BookHold(db.Model):  # type: ignore
+    """Copies of a book set aside for a checkout, until ``expires_at``.
+
+    Holds don't touch the stock: the copies available are the stock less the
+    holds not expired yet, and placing the order that confirms a hold takes
+    the copies for real.
+    """
+
+    __tablename__ = "book_holds"
+
+    id = Column(
+        UUID(as_uuid=True), default=uuid.uuid4, nullable=False, primary_key=True
+    )
+
+    book_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    qty = Column(Integer, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    created_by_id = Column(
+        UUID(as_uuid=True), ForeignKey("backoffice_users.id", ondelete="SET NULL")
+    )
+
+    book = relationship("Book", lazy="select")
+
+    __table_args__ = (
+        # Sums the active holds of a book from the index alone
+        Index(
+            "ix_book_holds_book_id_expires_at",
+            "book_id",
+            "expires_at",
+            postgresql_include=["qty"],
+        ),
+    )
+
+    @staticmethod
+    def held_qty(book_id: Any) -> Any:
+        """Copies of ``book_id`` held by holds not expired yet"""
+        return (
+            select(func.coalesce(func.sum(BookHold.qty), 0))
+            .where(BookHold.book_id == book_id, BookHold.expires_at > func.now())
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def available_qty(book_id: uuid.UUID) -> Optional[int]:
+        available_query = select(
+            Book.qty + Book.slots_qty - BookHold.held_qty(Book.id)
+        ).where(Book.id == book_id)
+        return db.session.execute(available_query).scalar_one_or_none()
+
+    @staticmethod
+    def get_hold(hold_id: uuid.UUID, current_user: Any) -> "BookHold":
+        hold_query = select(BookHold).where(
+            BookHold.id == hold_id, BookHold.expires_at > func.now()
+        )
+        hold = db.session.execute(hold_query).scalar_one_or_none()
+
+        if not hold:
+            return abort(404, HOLD_NOT_FOUND_ERR_MESSAGE)
+
+        return hold
+
+    @staticmethod
+    def lock(book_ids: Iterable[uuid.UUID], shared: bool = False) -> None:
+        """Serialize the holds of ``book_ids`` until the transaction ends.
+
+        An advisory lock keyed on the book id, so the book rows stay free.
+        Placing a hold takes it alone, the stock changes that check the holds
+        take it shared and don't queue on each other. Either way, the
+        statements that follow see every hold or stock change committed by
+        the other side. Book rows locked too are locked before it.
+        """
+        keys = sorted({BookHold.lock_key(book_id) for book_id in book_ids})
+        if not keys:
+            return
+
+        lock = (
+            func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+        )
+        db.session.execute(select(*[lock(key) for key in keys]))
+
+    @staticmethod
+    def lock_key(book_id: uuid.UUID) -> int:
+        # A bigint from the random bits of the id, a clash only serializes more
+        return int.from_bytes(book_id.bytes[:8], "big", signed=True)
+
+    @staticmethod
+    def place(
+        book_id: uuid.UUID, qty: int, ttl: int, current_user: Any
+    ) -> Optional["BookHold"]:
+        """Hold ``qty`` copies for ``ttl`` seconds when that many are available.
+
+        A sharded book first locks its row and slots to move copies to its
+        shelf; then ``held_until`` is pushed, writing the book row at most
+        once a TTL, and the hold lock of the book is taken last, before the
+        conditional INSERT ... SELECT of the hold. Not committed, returns None
+        when there aren't enough copies.
+        """
+        if Book.sharded_ids([book_id]):
+            Book.refill_shelf(book_id, qty)
+
+        # Until held_until the stock changes check the holds, so it must cover
+        # this one. It's pushed a TTL further, so the book row is written once
+        # a TTL at most however many holds follow. Neither the version nor the
+        # update time of the book move, its payload is the same
+        expires_at = func.now() + timedelta(seconds=ttl)
+        db.session.execute(
+            update(Book)
+            .where(
+                Book.id == book_id,
+                or_(Book.held_until.is_(None), Book.held_until < expires_at),
+            )
+            .values(
+                held_until=expires_at + timedelta(seconds=ttl),
+                updated_at=Book.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        BookHold.lock([book_id])
+
+        hold_query = insert(BookHold).from_select(
+            ["id", "book_id", "qty", "expires_at", "created_by_id"],
+            select(
+                literal(uuid.uuid4(), UUID(as_uuid=True)),
+                Book.id,
+                literal(qty),
+                expires_at,
+                literal(current_user.id, UUID(as_uuid=True)),
+            ).where(
+                Book.id == book_id,
+                Book.qty - BookHold.held_qty(Book.id) >= qty,
+            ),
+        )
+        hold_id = db.session.execute(
+            hold_query.returning(BookHold.id)
+        ).scalar_one_or_none()
+
+        if hold_id is None:
+            return None
+        return db.session.get(BookHold, hold_id)
+
+    @staticmethod
+    def uncovered(
+        hold_ids: list[uuid.UUID], quantities: dict[uuid.UUID, int]
+    ) -> list[uuid.UUID]:
+        """Holds of ``hold_ids`` an order borrowing ``quantities`` copies can't confirm.
+
+        Those unknown or expired, on books the order doesn't borrow, or
+        holding more copies of a book than it borrows.
+        """
+        holds_query = select(BookHold.id, BookHold.book_id, BookHold.qty).where(
+            BookHold.id.in_(hold_ids), BookHold.expires_at > func.now()
+        )
+        holds = db.session.execute(holds_query).all()
+
+        held: dict[uuid.UUID, int] = defaultdict(int)
+        for _, book_id, qty in holds:
+            held[book_id] += qty
+
+        covered = {
+            hold_id
+            for hold_id, book_id, _ in holds
+            if held[book_id] <= quantities.get(book_id, 0)
+        }
+        return sorted(set(hold_ids) - covered)
+
+    @staticmethod
+    def release(hold_ids: list[uuid.UUID], book_ids: Iterable[uuid.UUID]) -> None:
+        """Drop the holds of ``book_ids``, not committed so an order can confirm them.
+
+        Holds on other books keep their copies, whatever ids are passed.
+        """
+        db.session.execute(
+            delete(BookHold)
+            .where(BookHold.id.in_(hold_ids), BookHold.book_id.in_(list(book_ids)))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def reap() -> int:
+        """Delete the expired holds, not committed, returns how many there were"""
+        reap_query = (
+            delete(BookHold)
+            .where(BookHold.expires_at <= func.now())
+            .execution_options(synchronize_session=False)
+        )
+        return db.session.execute(reap_query).rowcount
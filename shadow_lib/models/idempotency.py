@@ -0,0 +1,137 @@
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert
+from sqlalchemy.sql import delete, func, select, update
+
+from .db import db
+
+
+class IdempotencyKey(db.Model):  # type: ignore
+    """The response of a creation, replayed to retries sending the same key.
+
+    The row is inserted in the transaction of the creation, so it's only
+    ever committed along with what the creation wrote.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("backoffice_users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    key = Column(String(255), primary_key=True)
+
+    # Tells a retry from another request reusing the key
+    request_hash = Column(String(64), nullable=False)
+    status = Column(Integer)
+    body = Column(JSONB)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Serves the batched expiry
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    @staticmethod
+    def claim(
+        user_id: Any, key: str, request_hash: str, ttl: int
+    ) -> Optional["IdempotencyKey"]:
+        """Take the key for this request, or wait for the request holding it.
+
+        The insert waits on the unique key while a concurrent request with
+        the same key is running, then finds its row once it commits, or takes
+        the key if it rolled back. An expired row is taken over. Returns None
+        when the key is ours, else the row of the request that had it.
+        """
+        values = dict(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            status=None,
+            body=None,
+            expires_at=func.now() + timedelta(seconds=ttl),
+        )
+        claim_query = insert(IdempotencyKey).values(**values)
+        claim_query = claim_query.on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_=values,
+            where=IdempotencyKey.expires_at <= func.now(),
+        ).returning(IdempotencyKey.key)
+
+        if db.session.execute(claim_query).scalar_one_or_none() is not None:
+            return None
+
+        record_query = select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        )
+        record = db.session.execute(record_query).scalar_one_or_none()
+        if record is None:
+            # Expired and deleted in between
+            return IdempotencyKey.claim(user_id, key, request_hash, ttl)
+        return record
+
+    @staticmethod
+    def wait_for_response(
+        record: "IdempotencyKey", timeout: float, interval: float = 0.05
+    ) -> "IdempotencyKey":
+        """Read the row again until the request that claimed it stored its response.
+
+        It stores it right after committing, once the waiting claim went
+        through. A row still without response after ``timeout`` seconds is
+        the one of a request that died in between.
+        """
+        # The claim keeps the row locked, which would block the store
+        db.session.commit()
+
+        deadline = time.monotonic() + timeout
+        while record.status is None and time.monotonic() < deadline:
+            time.sleep(interval)
+            db.session.refresh(record)
+        return record
+
+    @staticmethod
+    def store(user_id: Any, key: str, status: int, body: Any) -> None:
+        """Keep the response of the request that claimed the key"""
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(status=status, body=body)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def release(user_id: Any, key: str) -> None:
+        """Drop the key of a request that failed, so that its retry runs again"""
+        db.session.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def expire(batch_size: int) -> int:
+        """Delete the expired keys, ``batch_size`` per transaction. Returns how many"""
+        expired = 0
+        while True:
+            batch = (
+                select(IdempotencyKey.user_id, IdempotencyKey.key)
+                .where(IdempotencyKey.expires_at <= func.now())
+                .limit(batch_size)
+            )
+            deleted = db.session.execute(
+                delete(IdempotencyKey)
+                .where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(batch))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+
+            expired += deleted
+            if deleted < batch_size:
+                return expired
@@ -7,3 +7,13 @@ BOOK_NOT_FOUND_ERR_MESSAGE = "Book not found"
 CUSTOMER_NOT_FOUND_ERR_MESSAGE = "Customer not found"
 ORDER_NOT_FOUND_ERR_MESSAGE = "Order not found or alredy closed"
 BORROWED_BOOK_NOT_FOUND_ERR_MESSAGE = "Borrowed book not found"
+BOOK_QTY_EXCEEDED_ERR_MESSAGE = "Quantity for this book {book_id} is too much"
+HOLD_NOT_FOUND_ERR_MESSAGE = "Hold not found or expired"
+HOLD_NOT_COVERED_ERR_MESSAGE = (
+    "Hold {hold_id} not found, expired or not covered by the order"
+)
+CONFLICT_ERR_MESSAGE = "Modified meanwhile, fetch it again before retrying"
+IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE = "Idempotency key already used for another request"
+IDEMPOTENCY_KEY_LOST_ERR_MESSAGE = (
+    "The request with this idempotency key was applied but its response was lost"
+)
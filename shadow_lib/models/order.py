@@ -1,16 +1,20 @@
 import uuid
 
-from typing import Any
+from collections import defaultdict
+from datetime import date, datetime
+from itertools import groupby
+from typing import Any, Iterator, Optional
 
 from flask import abort
 
-from sqlalchemy import Column, Date, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, Date, Index, Integer, ForeignKey, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql.expression import false
 
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import select
+from sqlalchemy.sql import func, or_, select, tuple_, update
 
+from .availability import BookAvailability
 from .db import db
 from .model_errors import (
     ORDER_NOT_FOUND_ERR_MESSAGE,
@@ -41,6 +45,15 @@ class BorrowedBook(db.Model):  # type: ignore
     book = relationship("Book", back_populates="borrowed_books")
 
     qty = Column(Integer, nullable=False, default=0)
+    # Moved by every update, see Book.version_id
+    version_id = Column(Integer, nullable=False, server_default="1")
+
+    __table_args__ = (
+        # Serves the incremental exports
+        Index("ix_borrowed_books_updated_at", "updated_at"),
+    )
+
+    __mapper_args__ = {"version_id_col": version_id}
 
     @staticmethod
     def get_borrowed_book(borrowed_book_id: uuid.UUID, current_user: Any) -> "Order":
@@ -52,12 +65,49 @@ class BorrowedBook(db.Model):  # type: ignore
 
         return br_book
 
+    @staticmethod
+    def get_borrowed_books_version(current_user: Any) -> tuple:
+        return db.Model.collection_version(BorrowedBook)
+
     @staticmethod
     def get_borrowed_books(current_user: Any) -> list["Order"]:
         br_book_query = select(BorrowedBook)
         br_books = db.session.execute(br_book_query).unique().scalars().all()
         return br_books
 
+    @staticmethod
+    def export_rows(
+        current_user: Any, since: Optional[datetime] = None
+    ) -> Iterator[list[dict]]:
+        """Borrowed books updated since ``since`` with their order, customer and
+        book title, oldest update first"""
+        # customer imports this module
+        from .book import Book
+        from .customer import Customer
+
+        export_query = (
+            select(
+                BorrowedBook.id.label("borrowed_book_id"),
+                BorrowedBook.qty,
+                BorrowedBook.updated_at,
+                Book.id.label("book_id"),
+                Book.title.label("book_title"),
+                Order.id.label("order_id"),
+                Order.due_date,
+                Order.has_been_returned,
+                Customer.id.label("customer_id"),
+                Customer.fullname.label("customer_fullname"),
+            )
+            .join(Book, Book.id == BorrowedBook.book_id)
+            .join(Order, Order.id == BorrowedBook.order_id)
+            .join(Customer, Customer.id == Order.customer_id)
+            .order_by(BorrowedBook.updated_at, BorrowedBook.id)
+        )
+        if since is not None:
+            export_query = export_query.where(BorrowedBook.updated_at >= since)
+
+        return db.Model.stream_rows(export_query)
+
 
 class Order(db.Model):  # type: ignore
     __tablename__ = "orders"
@@ -74,6 +124,8 @@ class Order(db.Model):  # type: ignore
 
     has_been_returned = Column(Boolean, nullable=False, default=False)
     due_date = Column(Date, nullable=False)
+    # Moved by every update, see Book.version_id
+    version_id = Column(Integer, nullable=False, server_default="1")
 
     created_by_id = Column(
         UUID(as_uuid=True), ForeignKey("backoffice_users.id", ondelete="SET NULL")
@@ -86,6 +138,24 @@ class Order(db.Model):  # type: ignore
         cascade="all, delete-orphan",
     )
 
+    __table_args__ = (
+        # Serves the incremental exports
+        Index("ix_orders_updated_at", "updated_at"),
+        # Pages the overdue orders from the index alone, returned ones left out
+        Index(
+            "ix_orders_overdue",
+            "due_date",
+            "id",
+            postgresql_include=["customer_id"],
+            postgresql_where=has_been_returned == false(),
+        ),
+    )
+
+    __mapper_args__ = {"version_id_col": version_id}
+
+    # Holds confirmed when the order is placed, not stored
+    hold_ids: tuple = ()
+
     @staticmethod
     def get_order(order_id: uuid.UUID, current_user: Any) -> "Order":
         order_query = select(Order).where(
@@ -98,8 +168,261 @@ class Order(db.Model):  # type: ignore
 
         return order
 
+    @staticmethod
+    def place(order: "Order") -> list[uuid.UUID]:
+        """Take the stock of all the order lines and insert the order.
+
+        The stock is taken in one statement, then the order and its borrowed
+        books are inserted with one commit. The holds in ``hold_ids`` are
+        confirmed by the order, their copies are taken with the rest: those
+        are checked beforehand with ``BookHold.uncovered``.
+        Returns the ids of the books without enough copies, in which case
+        nothing is written.
+        """
+        from .book import Book
+        from .hold import BookHold
+
+        quantities: dict[uuid.UUID, int] = defaultdict(int)
+        for br_book in order.borrowed_books:
+            quantities[br_book.book.id] += br_book.qty
+
+        # The order is inserted only once the stock is taken
+        with db.session.no_autoflush:
+            if order.hold_ids:
+                # The copies held for this order are free for it again
+                BookHold.release(order.hold_ids, quantities)
+            left = Book.decrement_stocks(quantities)
+
+        missing = [book_id for book_id in quantities if book_id not in left]
+        if missing:
+            db.session.rollback()
+            return missing
+
+        db.session.add(order)
+        db.session.commit()
+        return []
+
+    @staticmethod
+    def restore_stock(order_id: uuid.UUID) -> None:
+        """Give back the copies of all the order lines in a single UPDATE.
+
+        Nothing is committed, so the stock moves with the change of the
+        order that returns them.
+        """
+        Order.restore_stocks([order_id])
+
+    @staticmethod
+    def restore_stocks(order_ids: list[uuid.UUID]) -> None:
+        """Give back the copies of the lines of several orders in a single UPDATE"""
+        from .book import Book
+
+        returned = (
+            select(BorrowedBook.book_id, func.sum(BorrowedBook.qty).label("qty"))
+            .where(BorrowedBook.order_id.in_(order_ids))
+            .group_by(BorrowedBook.book_id)
+            .subquery()
+        )
+        # Same lock order as Order.place
+        locked = (
+            select(Book.id, returned.c.qty)
+            .join(returned, returned.c.book_id == Book.id)
+            .order_by(Book.id)
+            .with_for_update(of=Book, key_share=True)
+            .subquery()
+        )
+        stock_query = (
+            update(Book)
+            .where(Book.id == locked.c.id)
+            .values(qty=Book.qty + locked.c.qty, version_id=Book.version_id + 1)
+            .returning(Book.id, Book.qty, Book.version_id, locked.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+
+        restored = {}
+        for book_id, qty, version_id, returned_qty in db.session.execute(stock_query):
+            Book.sync_stock(book_id, qty, version_id)
+            restored[book_id] = returned_qty
+        BookAvailability.move(restored)
+
+    @staticmethod
+    def close_orders(order_ids: list[uuid.UUID], current_user: Any) -> list[uuid.UUID]:
+        """Close the open orders among ``order_ids`` and give back their copies.
+
+        The orders are closed with one UPDATE and their stock restored with
+        another, then committed at once. The books are locked before the
+        orders, like a single close does, so the two can't deadlock. Returns
+        the ids of the orders closed, the others were missing or closed
+        already.
+        """
+        from .book import Book
+
+        open_orders = Order.has_been_returned == false()
+        lines_books = (
+            select(BorrowedBook.book_id)
+            .join(Order, Order.id == BorrowedBook.order_id)
+            .where(BorrowedBook.order_id.in_(order_ids), open_orders)
+        )
+        Book.lock_stock(lines_books)
+
+        close_query = (
+            update(Order)
+            .where(Order.id.in_(order_ids), open_orders)
+            .values(has_been_returned=True, version_id=Order.version_id + 1)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        closed = db.session.execute(close_query).scalars().all()
+        if closed:
+            Order.restore_stocks(closed)
+
+        db.session.commit()
+        return closed
+
+    @staticmethod
+    def get_order_version(order_id: uuid.UUID, current_user: Any) -> tuple:
+        """What the order payload depends on: its row and its borrowed books"""
+        version_query = (
+            select(
+                Order.updated_at,
+                Order.version_id,
+                func.count(BorrowedBook.id),
+                func.max(BorrowedBook.updated_at),
+            )
+            .outerjoin(BorrowedBook, BorrowedBook.order_id == Order.id)
+            .where(Order.id == order_id, Order.has_been_returned == false())
+            .group_by(Order.id)
+        )
+        version = db.session.execute(version_query).one_or_none()
+
+        if not version:
+            return abort(404, ORDER_NOT_FOUND_ERR_MESSAGE)
+
+        return tuple(version)
+
+    @staticmethod
+    def get_orders_version(current_user: Any) -> tuple:
+        return db.Model.collection_version(Order, BorrowedBook)
+
     @staticmethod
     def get_orders(current_user: Any) -> list["Order"]:
         order_query = select(Order)
         orders = db.session.execute(order_query).unique().scalars().all()
         return orders
+
+    @staticmethod
+    def export_rows(
+        current_user: Any, since: Optional[datetime] = None
+    ) -> Iterator[list[dict]]:
+        """Orders updated since ``since``, one row per borrowed book with the
+        customer and book title, oldest update first"""
+        # customer imports this module
+        from .book import Book
+        from .customer import Customer
+
+        export_query = (
+            select(
+                Order.id.label("order_id"),
+                Order.due_date,
+                Order.has_been_returned,
+                Order.updated_at,
+                Customer.id.label("customer_id"),
+                Customer.fullname.label("customer_fullname"),
+                BorrowedBook.id.label("borrowed_book_id"),
+                Book.id.label("book_id"),
+                Book.title.label("book_title"),
+                BorrowedBook.qty,
+            )
+            .join(Customer, Customer.id == Order.customer_id)
+            # Orders without books are exported too, with empty book columns
+            .outerjoin(BorrowedBook, BorrowedBook.order_id == Order.id)
+            .outerjoin(Book, Book.id == BorrowedBook.book_id)
+            .order_by(Order.updated_at, Order.id, BorrowedBook.id)
+        )
+        if since is not None:
+            # An order changes with its borrowed books, whose rows all go again
+            updated_lines = select(BorrowedBook.order_id).where(
+                BorrowedBook.updated_at >= since
+            )
+            export_query = export_query.where(
+                or_(Order.updated_at >= since, Order.id.in_(updated_lines))
+            )
+
+        return db.Model.stream_rows(export_query)
+
+    @staticmethod
+    def overdue_page_query(
+        limit: int, after: Optional[tuple[date, uuid.UUID]] = None
+    ) -> Any:
+        """Open orders due before today, by due date then id, from ``after`` on"""
+        page_query = (
+            select(Order.id, Order.due_date, Order.customer_id)
+            .where(
+                Order.has_been_returned == false(),
+                Order.due_date < func.current_date(),
+            )
+            .order_by(Order.due_date, Order.id)
+            .limit(limit)
+        )
+        if after is not None:
+            page_query = page_query.where(
+                tuple_(Order.due_date, Order.id) > tuple_(*after)
+            )
+        return page_query
+
+    @staticmethod
+    def get_overdue(
+        current_user: Any, limit: int, after: Optional[tuple[date, uuid.UUID]] = None
+    ) -> list[dict]:
+        """A page of overdue orders with their customer and borrowed book titles.
+
+        The page is taken from the overdue index, keyset paginated from the
+        (due date, id) of the last order of the previous page, and joined to
+        the rest in the same query.
+        """
+        # customer imports this module
+        from .book import Book
+        from .customer import Customer
+
+        page = Order.overdue_page_query(limit, after).subquery()
+        overdue_query = (
+            select(
+                page.c.id,
+                page.c.due_date,
+                Customer.id.label("customer_id"),
+                Customer.fullname.label("customer_fullname"),
+                BorrowedBook.id.label("borrowed_book_id"),
+                Book.id.label("book_id"),
+                Book.title.label("book_title"),
+                BorrowedBook.qty,
+            )
+            .join(Customer, Customer.id == page.c.customer_id)
+            .outerjoin(BorrowedBook, BorrowedBook.order_id == page.c.id)
+            .outerjoin(Book, Book.id == BorrowedBook.book_id)
+            .order_by(page.c.due_date, page.c.id, BorrowedBook.id)
+        )
+        rows = db.session.execute(overdue_query).mappings()
+
+        orders = []
+        for _, lines in groupby(rows, key=lambda row: row["id"]):
+            lines = list(lines)
+            first = lines[0]
+            orders.append(
+                dict(
+                    id=first["id"],
+                    due_date=first["due_date"],
+                    customer=dict(
+                        id=first["customer_id"], fullname=first["customer_fullname"]
+                    ),
+                    borrowed_books=[
+                        dict(
+                            id=line["borrowed_book_id"],
+                            book_id=line["book_id"],
+                            title=line["book_title"],
+                            qty=line["qty"],
+                        )
+                        for line in lines
+                        if line["borrowed_book_id"] is not None
+                    ],
+                )
+            )
+        return orders
@@ -0,0 +1,108 @@
+import threading
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session
+
+WRITTEN_TABLES_KEY = "written_tables"
+
+
+class TableVersions:
+    """In-process write counters, one per table.
+
+    Every flush touching a table bumps its counter, so anything derived from
+    that table can be cached against the counter values and dropped as soon
+    as they move. Listeners are told about the bumps of committed writes,
+    to forward them to counters shared with other processes, which ``get``
+    reads along with the local ones when asked to.
+    """
+
+    def __init__(self) -> None:
+        self._versions: defaultdict = defaultdict(int)
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[list[str]], None]] = []
+        self._shared: Optional[Callable[[list[str]], tuple]] = None
+
+    def bump(self, tables: Iterable[str], committed: bool = False) -> None:
+        tables = sorted(tables)
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+        if committed:
+            for listener in self._listeners:
+                listener(tables)
+
+    def listen(self, listener: Callable[[list[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def share(self, reader: Optional[Callable[[list[str]], tuple]]) -> None:
+        self._shared = reader
+
+    def get(self, *tables: str, shared: bool = False) -> tuple[int, ...]:
+        with self._lock:
+            versions = tuple(self._versions[table] for table in tables)
+
+        # Local counters still count: they move on flush, before other
+        # processes can see the write
+        if shared and self._shared is not None:
+            versions += self._shared(list(tables))
+        return versions
+
+
+table_versions = TableVersions()
+
+
+def written_tables(session: Session) -> set[str]:
+    """Collect the tables the pending flush writes to, association tables included"""
+    tables: set[str] = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        mapper = inspect(obj).mapper
+        tables.update(table.name for table in mapper.tables)
+
+        for relationship in mapper.relationships:
+            if relationship.secondary is not None:
+                tables.add(relationship.secondary.name)
+
+    return tables
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session: Session, flush_context: Any) -> None:
+    tables = written_tables(session)
+    if not tables:
+        return
+
+    table_versions.bump(tables)
+    session.info.setdefault(WRITTEN_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_executed_tables(orm_execute_state: ORMExecuteState) -> None:
+    # INSERT, UPDATE and DELETE statements run through the session skip the
+    # flush, their table is bumped the same way
+    state = orm_execute_state
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+
+    tables = {state.statement.table.name}
+    table_versions.bump(tables)
+    state.session.info.setdefault(WRITTEN_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session: Session) -> None:
+    # Bump again once the rows are visible to other transactions, so nothing
+    # read between the flush and the commit survives as current. Only this
+    # bump reaches the listeners: other processes can't see the rows before
+    tables = session.info.pop(WRITTEN_TABLES_KEY, None)
+    if tables:
+        table_versions.bump(tables, committed=True)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_written_tables(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(WRITTEN_TABLES_KEY, None)
@@ -8,10 +8,12 @@ import pytest
 from flask import Flask, g
 from flask.testing import FlaskClient
 
+from shadow_lib.api.response_cache import response_cache
 from shadow_lib.jwt import JwtTokenManager
 from shadow_lib.app import create_app
 from shadow_lib.models import Token, User, Author, Book, Customer, Order, BorrowedBook
 from shadow_lib.models import db as rawdb
+from shadow_lib.models.book import book_search_cache
 from shadow_lib.models.db import DBConfig
 
 RESOURCES = Path(__file__).parent / "resources"
@@ -43,6 +45,8 @@ def db(app: Flask) -> Generator[DBConfig, None, None]:
 
         rawdb.session.close()
         rawdb.drop_db()
+        book_search_cache.clear()
+        response_cache.clear()
 
 
 @pytest.fixture
@@ -173,6 +177,27 @@ def simple_book_3(db: DBConfig, regular_user: User, simple_author_2: Author) ->
     return book
 
 
+@pytest.fixture
+def multi_author_book(
+    db: DBConfig, regular_user: User, simple_author: Author, simple_author_2: Author
+) -> Book:
+
+    book = Book(
+        title="Written together",
+        EAN="Written together",
+        SKU="Written together",
+        created_by_id=regular_user.id,
+        release_date="2021-05-10",
+        qty=5,
+    )
+
+    book.authors.append(simple_author)
+    book.authors.append(simple_author_2)
+
+    book.save()
+    return book
+
+
 @pytest.fixture
 def simple_order(db: DBConfig, simple_book: Book, simple_customer: Customer):
 
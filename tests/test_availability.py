@@ -0,0 +1,159 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Mapping
+
+from click.testing import CliRunner
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import func, select
+
+from shadow_lib.commands import rebuild_availability
+from shadow_lib.models import Book, BookAvailability, Customer, Order
+from shadow_lib.models.db import DBConfig
+
+
+def availability(client: FlaskClient, headers: Mapping[str, str], **filters: Any) -> list[dict]:
+    res = client.get("/api/v1/books/availability", query_string=filters, headers=headers)
+    assert res.status_code == 200
+    return res.json["availability"]
+
+
+def counts(client: FlaskClient, headers: Mapping[str, str], book: Book) -> tuple[int, int, int]:
+    (row,) = availability(client, headers, book_id=str(book.id))
+    return row["copies"], row["borrowed"], row["available"]
+
+
+class TestBookAvailability:
+    def test_follows_the_borrowings(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        assert counts(client, regular_user_headers, simple_book) == (20, 0, 20)
+
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            borrowed_books=[dict(book_id=str(simple_book.id), qty=4)],
+        )
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+        order = res.json["order"]
+        assert counts(client, regular_user_headers, simple_book) == (20, 4, 16)
+
+        br_book_url = f"/api/v1/borrowed-books/{order['borrowed_books'][0]['id']}"
+        res = client.patch(br_book_url, json=dict(order_id=order["id"], qty=6), headers=regular_user_headers)
+        assert res.status_code == 200
+        assert counts(client, regular_user_headers, simple_book) == (20, 6, 14)
+
+        data = dict(order_id=order["id"], book_id=str(simple_book.id), qty=2)
+        res = client.post("/api/v1/borrowed-books", json=data, headers=regular_user_headers)
+        assert counts(client, regular_user_headers, simple_book) == (20, 8, 12)
+
+        client.delete(f"/api/v1/borrowed-books/{res.json['borrowed_book']['id']}", headers=regular_user_headers)
+        assert counts(client, regular_user_headers, simple_book) == (20, 6, 14)
+
+        res = client.patch(f"/api/v1/orders/{order['id']}/close", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert counts(client, regular_user_headers, simple_book) == (20, 0, 20)
+
+    def test_follows_the_stock_changes(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = dict(order_id=str(simple_order.id), book_id=str(simple_book.id), qty=5)
+        client.post("/api/v1/borrowed-books", json=data, headers=regular_user_headers)
+
+        res = client.patch(f"/api/v1/books/{simple_book.id}", json=dict(qty=30), headers=regular_user_headers)
+        assert res.status_code == 200
+        assert counts(client, regular_user_headers, simple_book) == (35, 5, 30)
+
+        Book.shard_stock(simple_book.id, 3)
+        db.session.commit()
+        assert counts(client, regular_user_headers, simple_book) == (35, 5, 30)
+
+        res = client.patch(f"/api/v1/books/{simple_book.id}", json=dict(qty=12), headers=regular_user_headers)
+        assert res.status_code == 200
+        assert counts(client, regular_user_headers, simple_book) == (17, 5, 12)
+
+        client.delete(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers)
+        assert availability(client, regular_user_headers) == []
+
+    def test_sharded_book_counts_on_its_slot_rows(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        Book.shard_stock(simple_book.id, 4)
+        db.session.commit()
+        start = threading.Event()
+
+        def borrow(_: int) -> int:
+            data = dict(order_id=str(simple_order.id), book_id=str(simple_book.id), qty=1)
+            start.wait()
+            return app.test_client().post("/api/v1/borrowed-books", json=data, headers=regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(borrow, i) for i in range(16)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses == [201] * 16
+        assert counts(client, regular_user_headers, simple_book) == (20, 16, 4)
+        rows = db.session.execute(
+            select(func.count()).where(BookAvailability.book_id == simple_book.id)
+        ).scalar_one()
+        assert rows > 1
+
+    def test_filters(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        Book.decrement_stock(simple_book.id, 5)
+        Book.decrement_stock(simple_book_3.id, 20)
+        db.session.commit()
+
+        def book_ids(**filters: Any) -> set[str]:
+            return {row["book_id"] for row in availability(client, regular_user_headers, **filters)}
+
+        assert book_ids() == {str(book.id) for book in (simple_book, simple_book_2, simple_book_3)}
+        assert book_ids(book_id=[str(simple_book.id), str(simple_book_3.id)]) == {str(simple_book.id), str(simple_book_3.id)}
+        assert book_ids(in_stock=False) == {str(simple_book_3.id)}
+        assert str(simple_book_3.id) not in book_ids(in_stock=True)
+        assert book_ids(min_available=16) == {str(simple_book_2.id)}
+        assert book_ids(min_available=15) == {str(simple_book.id), str(simple_book_2.id)}
+
+        for filters in [{"book_id": "nope"}, {"min_available": -1}]:
+            res = client.get("/api/v1/books/availability", query_string=filters, headers=regular_user_headers)
+            assert res.status_code == 422
+
+    def test_rebuild(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        # The order fixture is inserted without taking the stock
+        assert counts(client, regular_user_headers, simple_book) == (20, 0, 20)
+
+        result = CliRunner().invoke(rebuild_availability)
+
+        assert result.exit_code == 0, result.output
+        assert counts(client, regular_user_headers, simple_book) == (24, 4, 20)
@@ -1,9 +1,12 @@
 # import uuid
 from typing import Mapping
 
+import pytest
 from flask.testing import FlaskClient
+from sqlalchemy import event
 
 from shadow_lib.models import Book, Author
+from shadow_lib.models.book import book_search_cache
 from shadow_lib.models.db import DBConfig
 
 
@@ -106,3 +109,285 @@ class TestBookDetailRetrieve:
         assert res.status_code == 422
         assert res.json
         assert res.json["q"][0] == 'Shorter than minimum length 1.'
+
+
+class TestBookSearchCache:
+    def test_repeated_search_is_served_from_cache(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert book_search_cache.stats()["misses"] == 1
+
+        cached_res = client.get("/api/v1/books/search?q=TEST", headers=regular_user_headers)
+        assert cached_res.status_code == 200
+        assert book_search_cache.stats()["hits"] == 1
+        assert cached_res.json["books"] == res.json["books"]
+
+    def test_entries_expire(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+
+        # Writes made by other workers are only seen once entries expire
+        monkeypatch.setattr(book_search_cache, "ttl", -1)
+        client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+
+        assert book_search_cache.stats()["hits"] == 0
+        assert book_search_cache.stats()["misses"] == 2
+
+    def test_book_creation_invalidates_cache(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        assert len(res.json["books"]) == 1
+
+        data = {
+            "title": "another test",
+            "EAN": "EAN",
+            "SKU": "SKU",
+            "release_date": "2022-10-10",
+            "qty": 1,
+            "authors": [str(simple_author.id)],
+        }
+        res = client.post("/api/v1/books", json=data, headers=regular_user_headers)
+        assert res.status_code == 201
+
+        res = client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        assert len(res.json["books"]) == 2
+        assert book_search_cache.stats()["hits"] == 0
+
+    def test_author_update_invalidates_cache(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book_3: Book,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=renamed", headers=regular_user_headers)
+        assert res.json["books"] == []
+
+        res = client.patch(
+            f"/api/v1/authors/{simple_author_2.id}",
+            json={"last_name": "Renamed"},
+            headers=regular_user_headers,
+        )
+        assert res.status_code == 200
+
+        res = client.get("/api/v1/books/search?q=renamed", headers=regular_user_headers)
+        assert len(res.json["books"]) == 1
+
+
+class TestBookSearchRowCount:
+    def test_multi_author_book_fetched_once(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        multi_author_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        fetched_rows = []
+
+        def count_rows(conn, cursor, statement, parameters, context, executemany):  # type: ignore
+            fetched_rows.append(cursor.rowcount)
+
+        # Both authors and the title match, the book must still come back as one row
+        event.listen(db.get_engine(), "after_cursor_execute", count_rows)
+        try:
+            book_ids, facets = Book.search_book_ids({"q": "t"})
+            books = Book.get_books_by_ids(book_ids)
+        finally:
+            event.remove(db.get_engine(), "after_cursor_execute", count_rows)
+
+        assert [book.id for book in books] == [multi_author_book.id]
+        assert len(books[0].authors) == 2
+
+        # The search returns one row for the book plus one per facet value (2 authors,
+        # 1 year, 1 availability), then the book and its authors are loaded separately
+        assert fetched_rows == [5, 1, 2]
+
+    def test_multi_author_book_returned_once(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        multi_author_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=o", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert len(res.json["books"]) == 1
+        assert len(res.json["books"][0]["authors"]) == 2
+
+
+class TestBookSearchFiltersAndFacets:
+    def test_facets(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        multi_author_book: Book,
+        simple_author: Author,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=e", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json
+        assert len(res.json["books"]) == 4
+        assert res.json["facets"] == {
+            "authors": [
+                {"id": str(simple_author.id), "name": "test test", "count": 3},
+                {"id": str(simple_author_2.id), "name": "Proviamo Ariproviamo", "count": 2},
+            ],
+            "release_years": [{"year": 2021, "count": 1}, {"year": 2022, "count": 3}],
+            "availability": {"in_stock": 4, "out_of_stock": 0},
+        }
+
+    def test_filter_release_date_range(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(
+            "/api/v1/books/search?q=e&release_date_from=2022-10-15&release_date_to=2022-10-25",
+            headers=regular_user_headers,
+        )
+
+        assert res.status_code == 200
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book_2.id)]
+        assert res.json["facets"]["release_years"] == [{"year": 2022, "count": 1}]
+
+        res = client.get("/api/v1/books/search?q=e&release_date=2022-10-10", headers=regular_user_headers)
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book.id)]
+
+    def test_filter_release_date_range_invalid(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(
+            "/api/v1/books/search?q=e&release_date_from=2022-10-25&release_date_to=2022-10-15",
+            headers=regular_user_headers,
+        )
+
+        assert res.status_code == 422
+        assert res.json["release_date_from"][0] == "release_date_from must not be after release_date_to."
+
+    def test_filter_author(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_3: Book,
+        multi_author_book: Book,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/books/search?q=e&author={simple_author_2.id}", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert {book["id"] for book in res.json["books"]} == {str(simple_book_3.id), str(multi_author_book.id)}
+        assert len(res.json["facets"]["authors"]) == 2
+
+    def test_filter_availability(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        simple_book.qty = 0
+        simple_book.save()
+
+        res = client.get("/api/v1/books/search?q=e&in_stock=false", headers=regular_user_headers)
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book.id)]
+        assert res.json["facets"]["availability"] == {"in_stock": 0, "out_of_stock": 1}
+
+        res = client.get("/api/v1/books/search?q=e&in_stock=true", headers=regular_user_headers)
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book_3.id)]
+        assert res.json["facets"]["availability"] == {"in_stock": 1, "out_of_stock": 0}
+
+
+class TestBookFuzzySearch:
+    def test_misspelled_author_found_only_in_fuzzy_mode(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=Aripoviamo", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.json["books"] == []
+
+        res = client.get("/api/v1/books/search?q=Aripoviamo&fuzzy=true", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book_3.id)]
+
+    def test_best_match_first(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_3: Book,
+        multi_author_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=Writen togeter&fuzzy=true&similarity=0.3", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json["books"][0]["id"] == str(multi_author_book.id)
+
+    def test_similarity_threshold(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/search?q=Hyprr&fuzzy=true&similarity=0.95", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.json["books"] == []
+
+        res = client.get("/api/v1/books/search?q=Hyprr&fuzzy=true&similarity=1.5", headers=regular_user_headers)
+        assert res.status_code == 422
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Mapping
+
+from flask.testing import FlaskClient
+
+from shadow_lib.commons import RequestCoalescer
+from shadow_lib.models import Book, Author
+from shadow_lib.models.db import DBConfig
+
+
+class TestBookSuggest:
+    def test_suggest_titles_case_insensitive(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/suggest?prefix=HYP", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json
+        assert res.json["suggestions"]["titles"] == ["Hyper random"]
+        assert res.json["suggestions"]["authors"] == []
+
+    def test_suggest_titles_deduplicated(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/suggest?prefix=te", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json
+        assert res.json["suggestions"]["titles"] == ["test"]
+        assert res.json["suggestions"]["authors"] == ["test test"]
+
+    def test_suggest_authors_by_first_or_last_name(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        by_first_name = client.get("/api/v1/books/suggest?prefix=prov", headers=regular_user_headers)
+        by_last_name = client.get("/api/v1/books/suggest?prefix=aripro", headers=regular_user_headers)
+
+        assert by_first_name.json["suggestions"]["authors"] == ["Proviamo Ariproviamo"]
+        assert by_last_name.json["suggestions"]["authors"] == ["Proviamo Ariproviamo"]
+
+    def test_suggest_limit(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        multi_author_book: Book,
+        simple_book_3: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/suggest?prefix=&limit=1", headers=regular_user_headers)
+        assert res.status_code == 422
+
+        res = client.get("/api/v1/books/suggest?prefix=t&limit=1", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.json["suggestions"]["titles"] == ["test"]
+
+    def test_suggest_like_wildcards_are_escaped(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/suggest?prefix=%25", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json["suggestions"] == {"titles": [], "authors": []}
+
+    def test_suggest_no_prefix(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books/suggest", headers=regular_user_headers)
+
+        assert res.status_code == 422
+        assert res.json
+        assert res.json["prefix"][0] == "Missing data for required field."
+
+
+class TestRequestCoalescer:
+    def test_concurrent_identical_calls_run_once(self) -> None:
+        coalescer = RequestCoalescer()
+        calls = []
+        results = []
+        started = threading.Event()
+
+        def slow_lookup() -> str:
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "done"
+
+        def request() -> None:
+            results.append(coalescer.do("prefix", slow_lookup))
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait()
+
+        followers = [threading.Thread(target=request) for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ["done"] * 6
+        assert coalescer.coalesced == 5
+
+    def test_errors_are_shared_and_not_cached(self) -> None:
+        coalescer = RequestCoalescer()
+
+        def failing_lookup() -> None:
+            raise ValueError("boom")
+
+        for _ in range(2):
+            try:
+                coalescer.do("prefix", failing_lookup)
+            except ValueError as error:
+                assert str(error) == "boom"
+
+        assert coalescer.do("prefix", lambda: "ok") == "ok"
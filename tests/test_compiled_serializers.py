@@ -0,0 +1,104 @@
+from typing import Any, Callable
+
+from flask import Flask
+from sqlalchemy import event
+
+from shadow_lib.api.representations import dumps
+from shadow_lib.api.schemas import AuthorSchema, BookSchema, CustomerSchema, OrderSchema, UserSchema
+from shadow_lib.api.schemas.compiled import _many_to_one_id
+from shadow_lib.models import Author, Book, Customer, Order, User
+from shadow_lib.models.db import DBConfig
+
+
+def dump(app: Flask, schema: Any, obj: Any, compiled: bool, many: bool = False) -> bytes:
+    app.config["COMPILED_SERIALIZERS"] = compiled
+    try:
+        return dumps(schema.dump(obj, many=many))
+    finally:
+        app.config["COMPILED_SERIALIZERS"] = True
+
+
+class TestCompiledSerializers:
+    def test_same_output_as_marshmallow(
+        self,
+        db: DBConfig,
+        app: Flask,
+        regular_user: User,
+        simple_author: Author,
+        simple_book: Book,
+        multi_author_book: Book,
+        simple_customer: Customer,
+        simple_order_2_books: Order,
+        set_current_user: Callable[[User], User],
+    ) -> None:
+
+        with app.test_request_context():
+            set_current_user(regular_user)
+            cases = [
+                (BookSchema(), [simple_book, multi_author_book]),
+                (AuthorSchema(), [simple_author]),
+                (CustomerSchema(), [simple_customer]),
+                (OrderSchema(), [simple_order_2_books]),
+                (UserSchema(exclude=["password"]), [regular_user]),
+                (BookSchema(only=["id", "authors"]), [simple_book]),
+            ]
+
+            for schema, objs in cases:
+                assert dump(app, schema, objs, True, many=True) == dump(app, schema, objs, False, many=True)
+                assert dump(app, schema, objs[0], True) == dump(app, schema, objs[0], False)
+
+    def test_hooks_still_run(
+        self,
+        db: DBConfig,
+        app: Flask,
+        regular_user: User,
+        set_current_user: Callable[[User], User],
+    ) -> None:
+
+        with app.test_request_context():
+            set_current_user(regular_user)
+            dumped = UserSchema(is_creation=True).dump(regular_user)
+
+        assert "password" not in dumped
+        assert dumped["role"] == regular_user.role.value
+
+    def test_non_model_objects_use_marshmallow(self, db: DBConfig) -> None:
+        book = {"title": "A dict", "qty": 3}
+
+        assert BookSchema(only=["title", "qty"]).dump(book) == {"title": "A dict", "qty": 3}
+
+    def test_many_to_one_read_from_foreign_key(
+        self,
+        db: DBConfig,
+        simple_book: Book,
+    ) -> None:
+        statements = []
+
+        def count(*args: Any) -> None:
+            statements.append(args[2])
+
+        book = db.session.get(Book, simple_book.id)
+        db.session.expire(book, ["created_by"])
+        book.title  # load the columns
+
+        event.listen(db.get_engine(), "before_cursor_execute", count)
+        try:
+            dumped = BookSchema(only=["created_by"]).dump(book)
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", count)
+
+        assert dumped == {"created_by": simple_book.created_by_id}
+        assert statements == []
+
+    def test_many_to_one_loaded_uses_related_key(self) -> None:
+        class Related:
+            id = 1
+            username = "reader"
+
+        class Obj:
+            def __init__(self) -> None:
+                self.created_by = Related()
+                self.created_by_id = 1
+
+        assert _many_to_one_id(Obj(), "created_by", "created_by_id", "username") == "reader"
+        assert _many_to_one_id(Obj(), "created_by", "created_by_id", "id") == 1
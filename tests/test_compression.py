@@ -0,0 +1,117 @@
+import gzip
+import json
+import zlib
+from typing import Iterator, Mapping
+
+import pytest
+from flask import Flask, Response
+from flask.testing import FlaskClient
+
+from shadow_lib.models import Book
+from shadow_lib.models.db import DBConfig
+
+
+def with_encoding(headers: Mapping[str, str], accept_encoding: str) -> dict[str, str]:
+    return {**headers, "Accept-Encoding": accept_encoding}
+
+
+class TestCompression:
+    def test_gzip_above_min_size(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        app.config["COMPRESSION_MIN_SIZE"] = 10
+        identity = client.get("/api/v1/books", headers=regular_user_headers)
+
+        res = client.get("/api/v1/books", headers=with_encoding(regular_user_headers, "gzip, deflate"))
+
+        assert res.status_code == 200
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in res.headers["Vary"]
+        assert int(res.headers["Content-Length"]) == len(res.data)
+        assert json.loads(gzip.decompress(res.data)) == identity.json
+
+        # Compressed bodies get a weak ETag, still matched by If-None-Match
+        assert res.headers["ETag"] == "W/" + identity.headers["ETag"]
+        res = client.get(
+            "/api/v1/books",
+            headers={**with_encoding(regular_user_headers, "gzip"), "If-None-Match": res.headers["ETag"]},
+        )
+        assert res.status_code == 304
+
+    def test_small_or_not_accepted_left_as_is(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books", headers=with_encoding(regular_user_headers, "gzip"))
+        assert "Content-Encoding" not in res.headers
+        assert res.json["books"]
+
+        app.config["COMPRESSION_MIN_SIZE"] = 10
+        for accept_encoding in ["identity", "gzip;q=0, identity"]:
+            res = client.get("/api/v1/books", headers=with_encoding(regular_user_headers, accept_encoding))
+            assert "Content-Encoding" not in res.headers
+            assert res.json["books"]
+
+    def test_streamed_body_compressed_by_chunk(self, app: Flask, client: FlaskClient) -> None:
+        def rows() -> Iterator[str]:
+            for index in range(1000):
+                yield json.dumps({"index": index}) + "\n"
+
+        app.add_url_rule("/stream", "stream", lambda: Response(rows(), mimetype="application/x-ndjson"))
+
+        res = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in res.headers
+        assert gzip.decompress(res.data) == "".join(rows()).encode()
+
+    @pytest.mark.parametrize("encoding", ["gzip", "br"])
+    def test_streamed_chunks_sent_as_produced(self, app: Flask, client: FlaskClient, encoding: str) -> None:
+        if encoding == "br":
+            decompress = pytest.importorskip("brotli").Decompressor().process
+        else:
+            decompress = zlib.decompressobj(31).decompress
+        produced = []
+
+        def rows() -> Iterator[str]:
+            for index in range(1000):
+                produced.append(index)
+                yield json.dumps({"index": index}) + "\n"
+
+        app.add_url_rule("/stream", "stream", lambda: Response(rows(), mimetype="application/x-ndjson"))
+
+        res = client.get("/stream", headers={"Accept-Encoding": encoding}, buffered=False)
+        first = next(iter(res.response))
+
+        # The first row is readable before the next ones are even produced
+        assert len(produced) == 1
+        assert decompress(first) == b'{"index": 0}\n'
+        res.close()
+
+    def test_brotli_preferred(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        brotli = pytest.importorskip("brotli")
+        app.config["COMPRESSION_MIN_SIZE"] = 10
+
+        res = client.get("/api/v1/books", headers=with_encoding(regular_user_headers, "gzip, br"))
+
+        assert res.headers["Content-Encoding"] == "br"
+        assert json.loads(brotli.decompress(res.data))["books"]
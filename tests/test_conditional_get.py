@@ -0,0 +1,183 @@
+from typing import Any, Mapping
+
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+
+from shadow_lib.models import Author, Book, Order
+from shadow_lib.models.db import DBConfig
+
+
+def with_headers(headers: Mapping[str, str], **extra: str) -> dict[str, str]:
+    return {**headers, **{key.replace("_", "-"): value for key, value in extra.items()}}
+
+
+class TestConditionalGet:
+    def test_book_not_modified_skips_loading(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.headers["ETag"].startswith('"')
+        assert res.headers["Last-Modified"]
+
+        statements = []
+
+        def record(*args: Any) -> None:
+            statements.append(args[2])
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            res = client.get(
+                f"/api/v1/books/{simple_book.id}",
+                headers=with_headers(regular_user_headers, If_None_Match=res.headers["ETag"]),
+            )
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+
+        assert res.status_code == 304
+        assert res.data == b""
+        assert [statement for statement in statements if "books.title" in statement] == []
+
+    def test_etag_depends_on_representation(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        pytest.importorskip("msgpack")
+        url = f"/api/v1/books/{simple_book.id}"
+
+        etag = client.get(url, headers=regular_user_headers).headers["ETag"]
+        msgpack_headers = with_headers(regular_user_headers, Accept="application/msgpack")
+        res = client.get(url, headers=with_headers(msgpack_headers, If_None_Match=etag))
+        assert res.status_code == 200
+        assert res.mimetype == "application/msgpack"
+        assert res.headers["ETag"] != etag
+
+        res = client.get(url, headers=with_headers(msgpack_headers, If_None_Match=res.headers["ETag"]))
+        assert res.status_code == 304
+        assert "Accept" in res.vary
+
+    def test_book_etag_changes_with_authors(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        etag = client.get(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers).headers["ETag"]
+
+        data = {"authors": [str(simple_author_2.id)]}
+        res = client.patch(f"/api/v1/books/{simple_book.id}", json=data, headers=regular_user_headers)
+        assert res.status_code == 200
+
+        res = client.get(
+            f"/api/v1/books/{simple_book.id}",
+            headers=with_headers(regular_user_headers, If_None_Match=etag),
+        )
+        assert res.status_code == 200
+        assert res.headers["ETag"] != etag
+        assert res.json["book"]["authors"] == [str(simple_author_2.id)]
+
+    def test_order_etag_changes_with_borrowed_books(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        etag = client.get(f"/api/v1/orders/{simple_order.id}", headers=regular_user_headers).headers["ETag"]
+
+        res = client.patch(
+            f"/api/v1/borrowed-books/{simple_order.borrowed_books[0].id}",
+            json={"qty": 1},
+            headers=regular_user_headers,
+        )
+        assert res.status_code == 200
+
+        res = client.get(
+            f"/api/v1/orders/{simple_order.id}",
+            headers=with_headers(regular_user_headers, If_None_Match=etag),
+        )
+        assert res.status_code == 200
+        assert res.json["order"]["borrowed_books"][0]["qty"] == 1
+
+    def test_author_if_modified_since(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/authors/{simple_author.id}", headers=regular_user_headers)
+
+        res = client.get(
+            f"/api/v1/authors/{simple_author.id}",
+            headers=with_headers(regular_user_headers, If_Modified_Since=res.headers["Last-Modified"]),
+        )
+        assert res.status_code == 304
+
+    def test_not_found(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        random_uuid: str,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/books/{random_uuid}", headers=regular_user_headers)
+        assert res.status_code == 404
+
+    def test_list_etag_changes_on_delete(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/books", headers=regular_user_headers)
+        etag, last_modified = res.headers["ETag"], res.headers["Last-Modified"]
+
+        res = client.get("/api/v1/books", headers=with_headers(regular_user_headers, If_None_Match=etag))
+        assert res.status_code == 304
+
+        client.delete(f"/api/v1/books/{simple_book_2.id}", headers=regular_user_headers)
+
+        res = client.get("/api/v1/books", headers=with_headers(regular_user_headers, If_None_Match=etag))
+        assert res.status_code == 200
+        assert len(res.json["books"]) == 1
+
+        # A delete doesn't move the last update, so lists ignore If-Modified-Since
+        res = client.get("/api/v1/books", headers=with_headers(regular_user_headers, If_Modified_Since=last_modified))
+        assert res.status_code == 200
+
+    def test_update_time_is_write_time(
+        self,
+        db: DBConfig,
+        simple_author: Author,
+    ) -> None:
+
+        # Writes later in a transaction move the version: the transaction
+        # start time would date them all the same
+        simple_author.first_name = "first"
+        db.session.flush()
+        before = Author.collection_version(Author)
+
+        simple_author.first_name = "second"
+        db.session.flush()
+        after = Author.collection_version(Author)
+
+        assert after[1] > before[1]
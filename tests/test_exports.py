@@ -0,0 +1,169 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Mapping
+
+from flask.testing import FlaskClient
+from sqlalchemy import event, update
+
+from shadow_lib.models import BorrowedBook, Customer, Order
+from shadow_lib.models import db as rawdb
+from shadow_lib.models.db import DBConfig
+
+
+def ndjson(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+def set_updated_at(model: Any, ids: list, when: datetime) -> None:
+    rawdb.session.execute(
+        update(model).where(model.id.in_(ids)).values(updated_at=when).execution_options(synchronize_session=False)
+    )
+    rawdb.session.commit()
+
+
+class TestOrderExport:
+    def test_rows(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order_2_books: Order,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        empty_order = Order(customer_id=simple_customer.id, due_date="2022-11-10")
+        empty_order.save()
+
+        res = client.get("/api/v1/orders/export", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.mimetype == "application/x-ndjson"
+        assert res.is_streamed
+
+        rows = ndjson(res.data)
+        assert len(rows) == 3
+
+        lines = [row for row in rows if row["order_id"] == str(simple_order_2_books.id)]
+        assert {row["qty"] for row in lines} == {4, 10}
+        assert all(row["customer_fullname"] == "customer test" for row in lines)
+        assert all(row["book_title"] == "test" for row in lines)
+
+        [empty] = [row for row in rows if row["order_id"] == str(empty_order.id)]
+        assert empty["borrowed_book_id"] is None
+        assert empty["book_title"] is None
+
+    def test_since(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_order_2_books: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        old = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        set_updated_at(Order, [simple_order.id, simple_order_2_books.id], old)
+        set_updated_at(BorrowedBook, [bb.id for bb in simple_order_2_books.borrowed_books], old)
+        set_updated_at(BorrowedBook, [bb.id for bb in simple_order.borrowed_books], old)
+
+        since = (old + timedelta(days=1)).isoformat()
+        res = client.get("/api/v1/orders/export", query_string={"since": since}, headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.data == b""
+
+        # A changed borrowed book exports its whole order again
+        changed = simple_order_2_books.borrowed_books[0]
+        set_updated_at(BorrowedBook, [changed.id], old + timedelta(days=2))
+
+        res = client.get("/api/v1/orders/export", query_string={"since": since}, headers=regular_user_headers)
+        rows = ndjson(res.data)
+        assert {row["order_id"] for row in rows} == {str(simple_order_2_books.id)}
+        assert len(rows) == 2
+
+        # Times without an offset are UTC
+        res = client.get(
+            "/api/v1/orders/export",
+            query_string={"since": "2022-01-01T00:00:00"},
+            headers=regular_user_headers,
+        )
+        assert len(ndjson(res.data)) == 3
+
+    def test_invalid_since(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/orders/export", query_string={"since": "yesterday"}, headers=regular_user_headers)
+
+        assert res.status_code == 422
+        assert "since" in res.json
+
+    def test_requires_authentication(self, db: DBConfig, client: FlaskClient) -> None:
+        res = client.get("/api/v1/orders/export")
+
+        assert res.status_code == 403
+
+
+class TestBorrowedBookExport:
+    def test_rows(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order_2_books: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/borrowed-books/export", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.mimetype == "application/x-ndjson"
+
+        rows = ndjson(res.data)
+        assert {row["borrowed_book_id"] for row in rows} == {str(bb.id) for bb in simple_order_2_books.borrowed_books}
+        assert all(row["order_id"] == str(simple_order_2_books.id) for row in rows)
+        assert all(row["customer_fullname"] == "customer test" for row in rows)
+
+    def test_since(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order_2_books: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        old = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        first, second = simple_order_2_books.borrowed_books
+        set_updated_at(BorrowedBook, [first.id], old)
+
+        res = client.get(
+            "/api/v1/borrowed-books/export",
+            query_string={"since": (old + timedelta(seconds=1)).isoformat()},
+            headers=regular_user_headers,
+        )
+
+        assert [row["borrowed_book_id"] for row in ndjson(res.data)] == [str(second.id)]
+
+    def test_server_side_cursor(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order_2_books: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        cursors = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            if "FROM borrowed_books" in statement:
+                cursors.append(cursor.name)
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            res = client.get("/api/v1/borrowed-books/export", headers=regular_user_headers)
+            assert len(ndjson(res.data)) == 2
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+
+        # Rows are fetched in batches by a named cursor, not all at once
+        assert cursors and all(name for name in cursors)
@@ -0,0 +1,285 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Mapping
+
+from click.testing import CliRunner
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event, update
+
+from shadow_lib.commands import reap_holds
+from shadow_lib.models import HOLD_NOT_COVERED_ERR_MESSAGE, HOLD_NOT_FOUND_ERR_MESSAGE, Book, BookHold, Customer, Order
+from shadow_lib.models.db import DBConfig
+
+
+def hold(client: FlaskClient, book: Book, qty: int, headers: Mapping[str, str]):  # type: ignore
+    return client.post("/api/v1/holds", json=dict(book_id=str(book.id), qty=qty), headers=headers)
+
+
+class TestBookHolds:
+    def test_create_get_and_release(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = hold(client, simple_book, 5, regular_user_headers)
+
+        assert res.status_code == 201
+        assert res.json["hold"]["book_id"] == str(simple_book.id)
+        assert res.json["hold"]["qty"] == 5
+        assert res.json["available"] == 15
+        hold_id = res.json["hold"]["id"]
+
+        res = client.get(f"/api/v1/holds/{hold_id}", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.json["hold"]["expires_at"]
+
+        res = client.delete(f"/api/v1/holds/{hold_id}", headers=regular_user_headers)
+        assert res.status_code == 200
+        assert BookHold.available_qty(simple_book.id) == 20
+
+        res = client.get(f"/api/v1/holds/{hold_id}", headers=regular_user_headers)
+        assert res.status_code == 404
+        assert res.json["message"] == HOLD_NOT_FOUND_ERR_MESSAGE
+
+    def test_invalid_holds(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        random_uuid: uuid.UUID,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = hold(client, simple_book, 21, regular_user_headers)
+        assert res.status_code == 422
+        assert res.json["book"] == [f"Quantity for this book {simple_book.id} is too much"]
+
+        res = hold(client, simple_book, 0, regular_user_headers)
+        assert res.status_code == 422
+        assert "qty" in res.json
+
+        res = client.post("/api/v1/holds", json=dict(book_id=str(random_uuid), qty=1), headers=regular_user_headers)
+        assert res.status_code == 422
+        assert "book_id" in res.json
+
+    def test_held_copies_cant_be_borrowed(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        assert hold(client, simple_book, 18, regular_user_headers).status_code == 201
+
+        data = dict(book_id=str(simple_book.id), order_id=str(simple_order.id), qty=3)
+        res = client.post("/api/v1/borrowed-books", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 422
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 20
+
+    def test_order_confirms_holds(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        hold_id = hold(client, simple_book, 18, regular_user_headers).json["hold"]["id"]
+        # Someone else's hold keeps its copies
+        hold(client, simple_book_2, 15, regular_user_headers)
+
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            hold_ids=[hold_id],
+            borrowed_books=[dict(book_id=str(simple_book.id), qty=18), dict(book_id=str(simple_book_2.id), qty=5)],
+        )
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 201
+        assert "hold_ids" not in res.json["order"]
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 2
+        assert Book.get(simple_book_2.id).qty == 15
+        assert BookHold.count() == 1
+
+        data["borrowed_books"] = [dict(book_id=str(simple_book_2.id), qty=1)]
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+        assert res.status_code == 422
+
+    def test_order_rejects_holds_it_doesnt_cover(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        other_hold_id = hold(client, simple_book_2, 15, regular_user_headers).json["hold"]["id"]
+        hold_id = hold(client, simple_book, 5, regular_user_headers).json["hold"]["id"]
+
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            hold_ids=[other_hold_id],
+            borrowed_books=[dict(book_id=str(simple_book.id), qty=1)],
+        )
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+        assert res.status_code == 422
+        assert res.json["hold_ids"] == [HOLD_NOT_COVERED_ERR_MESSAGE.format(hold_id=other_hold_id)]
+
+        # Holding more copies than borrowed
+        data["hold_ids"] = [hold_id]
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+        assert res.status_code == 422
+        assert res.json["hold_ids"] == [HOLD_NOT_COVERED_ERR_MESSAGE.format(hold_id=hold_id)]
+
+        assert BookHold.count() == 2
+        assert BookHold.available_qty(simple_book_2.id) == 5
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 20
+
+        # Placing the order directly leaves the holds on other books alone
+        BookHold.release([other_hold_id], [simple_book.id])
+        db.session.commit()
+        assert BookHold.count() == 2
+
+    def test_hold_sharded_book(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        Book.shard_stock(simple_book.id, 4)
+        db.session.commit()
+
+        res = hold(client, simple_book, 6, regular_user_headers)
+        assert res.status_code == 201
+        assert res.json["available"] == 14
+
+        # The held copies are moved to the shelf, the stock stays the same
+        db.session.expire_all()
+        book = Book.get(simple_book.id)
+        assert book.qty == 6
+        assert book.qty + book.slots_qty == 20
+
+        assert hold(client, simple_book, 14, regular_user_headers).status_code == 201
+        assert hold(client, simple_book, 1, regular_user_headers).status_code == 422
+        assert BookHold.available_qty(simple_book.id) == 0
+
+    def test_expired_holds_are_ignored_and_reaped(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        assert hold(client, simple_book, 20, regular_user_headers).status_code == 201
+        assert BookHold.available_qty(simple_book.id) == 0
+
+        db.session.execute(update(BookHold).values(expires_at=datetime(2022, 1, 1, tzinfo=timezone.utc)))
+        db.session.commit()
+
+        assert BookHold.available_qty(simple_book.id) == 20
+        assert hold(client, simple_book, 20, regular_user_headers).status_code == 201
+
+        result = CliRunner().invoke(reap_holds)
+        assert result.exit_code == 0
+        assert "Deleted 1 expired holds" in result.output
+        assert BookHold.count() == 1
+
+    def test_concurrent_holds_never_overbook(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        attempts = 32
+        start = threading.Event()
+
+        def place() -> int:
+            start.wait()
+            return hold(app.test_client(), simple_book, 1, regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(place) for _ in range(attempts)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses.count(201) == 20
+        assert statuses.count(422) == attempts - 20
+        assert BookHold.available_qty(simple_book.id) == 0
+
+    def test_placing_a_hold_leaves_the_book_row_unlocked(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        # The first hold moves held_until, for two TTLs
+        assert hold(client, simple_book, 5, regular_user_headers).status_code == 201
+        statements = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append((statement, cursor.rowcount))
+
+        event.listen(db.get_engine(), "after_cursor_execute", record)
+        try:
+            res = hold(client, simple_book, 5, regular_user_headers)
+        finally:
+            event.remove(db.get_engine(), "after_cursor_execute", record)
+
+        assert res.status_code == 201
+        assert any("pg_advisory_xact_lock" in statement for statement, _ in statements)
+        assert not any(" FOR " in statement for statement, _ in statements)
+        assert not any(statement.startswith("UPDATE books ") and rowcount for statement, rowcount in statements)
+
+    def test_concurrent_holds_and_borrowings_never_oversell(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        attempts = 40
+        start = threading.Event()
+
+        def place(index: int) -> int:
+            start.wait()
+            if index % 2:
+                return hold(app.test_client(), simple_book, 1, regular_user_headers).status_code
+
+            data = dict(book_id=str(simple_book.id), order_id=str(simple_order.id), qty=1)
+            return app.test_client().post("/api/v1/borrowed-books", json=data, headers=regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(place, index) for index in range(attempts)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses.count(201) == 20
+        assert BookHold.available_qty(simple_book.id) == 0
+        db.session.expire_all()
+        # The copies not borrowed are all held
+        assert Book.get(simple_book.id).qty == BookHold.count()
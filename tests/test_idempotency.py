@@ -0,0 +1,163 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Mapping
+
+from click.testing import CliRunner
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import func, select
+
+from shadow_lib.commands import expire_idempotency_keys
+from shadow_lib.models import (
+    IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE,
+    Book,
+    BorrowedBook,
+    Customer,
+    IdempotencyKey,
+    Order,
+    User,
+)
+from shadow_lib.models.db import DBConfig
+
+
+def with_key(headers: Mapping[str, str], key: str) -> dict[str, str]:
+    return {**headers, "Idempotency-Key": key}
+
+
+def order_data(customer: Customer, book: Book, qty: int) -> dict[str, Any]:
+    return dict(
+        customer=str(customer.id),
+        due_date="2022-10-10",
+        borrowed_books=[dict(book_id=str(book.id), qty=qty)],
+    )
+
+
+def count(db: DBConfig, model: Any) -> int:
+    return db.session.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+class TestIdempotencyKey:
+    def test_retry_gets_the_first_response(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = order_data(simple_customer, simple_book, 4)
+        headers = with_key(regular_user_headers, "order-1")
+
+        first = client.post("/api/v1/orders", json=data, headers=headers)
+        retry = client.post("/api/v1/orders", json=data, headers=headers)
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json == first.json
+        assert "Idempotent-Replayed" not in first.headers
+        assert retry.headers["Idempotent-Replayed"] == "true"
+
+        db.session.expire_all()
+        assert count(db, Order) == 1
+        assert Book.get(simple_book.id).qty == 16
+
+    def test_key_reused_for_another_request(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        headers = with_key(regular_user_headers, "borrow-1")
+        data = dict(order_id=str(simple_order.id), book_id=str(simple_book.id), qty=1)
+        res = client.post("/api/v1/borrowed-books", json=data, headers=headers)
+        assert res.status_code == 201
+
+        res = client.post("/api/v1/borrowed-books", json={**data, "qty": 2}, headers=headers)
+
+        assert res.status_code == 422
+        assert res.json["message"] == IDEMPOTENCY_KEY_REUSED_ERR_MESSAGE
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 19
+
+    def test_failed_request_runs_again(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = order_data(simple_customer, simple_book, 25)
+        headers = with_key(regular_user_headers, "order-1")
+
+        res = client.post("/api/v1/orders", json=data, headers=headers)
+        assert res.status_code == 422
+        assert count(db, IdempotencyKey) == 0
+
+        Book.increment_stock(simple_book.id, 5)
+        db.session.commit()
+
+        res = client.post("/api/v1/orders", json=data, headers=headers)
+        assert res.status_code == 201
+        assert "Idempotent-Replayed" not in res.headers
+
+    def test_key_too_long(
+        self,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = order_data(simple_customer, simple_book, 1)
+        res = client.post("/api/v1/orders", json=data, headers=with_key(regular_user_headers, "k" * 256))
+        assert res.status_code == 422
+
+    def test_concurrent_duplicates_create_once(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = order_data(simple_customer, simple_book, 2)
+        headers = with_key(regular_user_headers, "order-1")
+        start = threading.Event()
+
+        def create(_: int) -> Any:
+            start.wait()
+            res = app.test_client().post("/api/v1/orders", json=data, headers=headers)
+            return res.status_code, res.json["order"]["id"]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(create, i) for i in range(8)]
+            start.set()
+            results = [future.result() for future in futures]
+
+        assert {status for status, _ in results} == {201}
+        assert len({order_id for _, order_id in results}) == 1
+
+        db.session.expire_all()
+        assert count(db, Order) == 1
+        assert count(db, BorrowedBook) == 1
+        assert Book.get(simple_book.id).qty == 18
+
+    def test_expired_keys_are_deleted_in_batches(
+        self,
+        db: DBConfig,
+        regular_user: User,
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        for i in range(5):
+            expires_at = now + timedelta(hours=-1 if i < 3 else 1)
+            db.session.add(IdempotencyKey(user_id=regular_user.id, key=str(i), request_hash="", expires_at=expires_at))
+        db.session.commit()
+
+        result = CliRunner().invoke(expire_idempotency_keys, ["--batch-size", "2"])
+
+        assert result.exit_code == 0, result.output
+        assert "Deleted 3 expired idempotency keys" in result.output
+        keys = db.session.execute(select(IdempotencyKey.key)).scalars().all()
+        assert sorted(keys) == ["3", "4"]
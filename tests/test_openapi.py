@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from flask import Flask
+from flask.testing import FlaskClient
+
+from shadow_lib.api import openapi
+from shadow_lib.app import create_app
+from shadow_lib.commands import build_openapi
+
+
+class TestOpenAPIDocument:
+    def test_built_once(self, client: FlaskClient, monkeypatch: pytest.MonkeyPatch) -> None:
+        res = client.get("/api/v1/docs/json")
+
+        assert res.status_code == 200
+        assert res.mimetype == "application/json"
+        assert "/api/v1/books/{id}" in res.json["paths"]
+        assert "/api/v1/books" in res.json["paths"]
+
+        def fail() -> bytes:
+            raise AssertionError("document built again")
+
+        monkeypatch.setattr(openapi, "build_document", fail)
+
+        again = client.get("/api/v1/docs/json")
+        assert again.data == res.data
+        assert again.headers["ETag"] == res.headers["ETag"]
+
+        res = client.get("/api/v1/docs/json", headers={"If-None-Match": res.headers["ETag"]})
+        assert res.status_code == 304
+
+    def test_build_command_and_prebuilt_document(self, app: Flask, tmp_path: Path) -> None:
+        output = tmp_path / "openapi.json"
+
+        with app.app_context():
+            result = CliRunner().invoke(build_openapi, ["--output", str(output)])
+
+        assert result.exit_code == 0
+        assert "/api/v1/authors" in json.loads(output.read_bytes())["paths"]
+
+        # Served as written, without building it
+        output.write_bytes(b'{"openapi": "prebuilt"}\n')
+        prebuilt_app = create_app(testing=True)
+        prebuilt_app.config["OPENAPI_PATH"] = str(output)
+        openapi.init_app(prebuilt_app)
+
+        res = prebuilt_app.test_client().get("/api/v1/docs/json")
+        assert res.json == {"openapi": "prebuilt"}
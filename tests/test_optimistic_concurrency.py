@@ -0,0 +1,232 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, Mapping
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event, text
+
+from shadow_lib.models import CONFLICT_ERR_MESSAGE, Book, BorrowedBook, Order
+from shadow_lib.models.db import DBConfig, DynamicBindSession
+
+
+def with_if_match(headers: Mapping[str, str], etag: str) -> dict[str, str]:
+    return {**headers, "If-Match": etag}
+
+
+@pytest.fixture
+def concurrent_rename(db: DBConfig, simple_book: Book) -> Iterator[None]:
+    """Renames the book from another connection right before it's first flushed"""
+    renamed = []
+
+    def rename(session: Any, *args: Any) -> None:
+        if renamed or simple_book not in session.dirty:
+            return
+        renamed.append(True)
+        with db.get_engine().begin() as conn:
+            conn.execute(
+                text("UPDATE books SET title = 'renamed', version_id = version_id + 1 WHERE id = :id"),
+                {"id": simple_book.id},
+            )
+
+    event.listen(DynamicBindSession, "before_flush", rename)
+    yield
+    event.remove(DynamicBindSession, "before_flush", rename)
+
+
+class TestIfMatch:
+    def test_book_patch_and_delete(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        url = f"/api/v1/books/{simple_book.id}"
+        etag = client.get(url, headers=regular_user_headers).headers["ETag"]
+
+        res = client.patch(url, json=dict(title="first"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 200
+
+        # The copy the first update started from is stale now
+        res = client.patch(url, json=dict(title="second"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 409
+        assert res.json["message"] == CONFLICT_ERR_MESSAGE
+
+        res = client.delete(url, headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 409
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).title == "first"
+
+        res = client.delete(url, headers=with_if_match(regular_user_headers, "*"))
+        assert res.status_code == 200
+
+    def test_etag_read_in_another_representation(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        pytest.importorskip("msgpack")
+        url = f"/api/v1/books/{simple_book.id}"
+        etag = client.get(url, headers={**regular_user_headers, "Accept": "application/msgpack"}).headers["ETag"]
+        assert etag != client.get(url, headers=regular_user_headers).headers["ETag"]
+
+        # Written back as JSON, the copy is still the current version
+        res = client.patch(url, json=dict(title="first"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 200
+
+        res = client.patch(url, json=dict(title="second"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 409
+
+    def test_stock_changes_move_the_version(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        url = f"/api/v1/books/{simple_book.id}"
+        etag = client.get(url, headers=regular_user_headers).headers["ETag"]
+        version_id = simple_book.version_id
+
+        Book.decrement_stock(simple_book.id, 5)
+        db.session.commit()
+        assert simple_book.version_id == version_id + 1
+
+        # Setting the stock from a copy read before the borrowing would lose it
+        res = client.patch(url, json=dict(qty=30), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 409
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 15
+
+    def test_order_patch(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        url = f"/api/v1/orders/{simple_order.id}"
+        etag = client.get(url, headers=regular_user_headers).headers["ETag"]
+
+        res = client.patch(url, json=dict(due_date="2030-01-01"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 200
+        res = client.patch(url, json=dict(due_date="2031-01-01"), headers=with_if_match(regular_user_headers, etag))
+        assert res.status_code == 409
+
+    def test_order_patch_with_compressed_etag(
+        self,
+        app: Flask,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        url = f"/api/v1/orders/{simple_order.id}"
+        headers = {**regular_user_headers, "Accept-Encoding": "gzip"}
+        # The order detail is above the compression threshold
+        app.config["COMPRESSION_MIN_SIZE"] = 10
+
+        res = client.get(url, headers=headers)
+        assert res.headers["Content-Encoding"] == "gzip"
+        etag = res.headers["ETag"]
+        assert etag.startswith("W/")
+
+        res = client.patch(url, json=dict(due_date="2030-01-01"), headers=with_if_match(headers, etag))
+        assert res.status_code == 200
+        res = client.patch(url, json=dict(due_date="2031-01-01"), headers=with_if_match(headers, etag))
+        assert res.status_code == 409
+
+    def test_race_after_the_check_is_a_conflict(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        concurrent_rename: None,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        url = f"/api/v1/books/{simple_book.id}"
+        etag = client.get(url, headers=regular_user_headers).headers["ETag"]
+
+        res = client.patch(url, json=dict(qty=3), headers=with_if_match(regular_user_headers, etag))
+
+        assert res.status_code == 409
+        db.session.expire_all()
+        book = Book.get(simple_book.id)
+        assert (book.title, book.qty) == ("renamed", 20)
+
+
+class TestRetryOnConflict:
+    def test_patch_without_if_match_is_retried(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        concurrent_rename: None,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        res = client.patch(f"/api/v1/books/{simple_book.id}", json=dict(qty=3), headers=regular_user_headers)
+
+        assert res.status_code == 200
+        # Applied over the concurrent change instead of overwriting it
+        assert res.json["book"]["title"] == "renamed"
+        assert res.json["book"]["qty"] == 3
+
+    def test_concurrent_quantity_changes_keep_the_stock(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        br_book = simple_order.borrowed_books[0]
+        copies = simple_book.qty + br_book.qty
+        start = threading.Event()
+
+        def change(qty: int) -> int:
+            data = dict(order_id=str(simple_order.id), qty=qty)
+            start.wait()
+            return app.test_client().patch(
+                f"/api/v1/borrowed-books/{br_book.id}", json=data, headers=regular_user_headers
+            ).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(change, qty) for qty in range(1, 17)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert set(statuses) <= {200, 409}
+        assert 200 in statuses
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty + BorrowedBook.get(br_book.id).qty == copies
+
+    def test_concurrent_closes_restore_the_stock_once(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        start = threading.Event()
+
+        def close() -> int:
+            start.wait()
+            return app.test_client().patch(f"/api/v1/orders/{simple_order.id}/close", headers=regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(close) for _ in range(8)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses.count(200) == 1
+        assert statuses.count(404) == 7
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 24
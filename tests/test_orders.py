@@ -1,10 +1,13 @@
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Mapping
 
+from flask import Flask
 from flask.testing import FlaskClient
 
 from shadow_lib.models import ORDER_NOT_FOUND_ERR_MESSAGE, Customer, User, Book
-from shadow_lib.models import Order
+from shadow_lib.models import BorrowedBook, Order
 from shadow_lib.models.db import DBConfig
 
 
@@ -314,3 +317,109 @@ class TestOrderClose:
 
         assert res.status_code == 404
         assert res.json["message"] == "Order not found or alredy closed"
+
+
+class TestOrdersBulkClose:
+
+    def test_close_orders_success(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_order_2_books: Order,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        missing_id = uuid.uuid4()
+        order_ids = [str(simple_order.id), str(missing_id), str(simple_order_2_books.id), str(simple_order.id)]
+
+        res = client.patch("/api/v1/orders/close", json=dict(order_ids=order_ids), headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json["message"] == "2 orders closed"
+        assert res.json["orders"] == {
+            str(simple_order.id): "closed",
+            str(missing_id): "not_found",
+            str(simple_order_2_books.id): "closed",
+        }
+
+        db.session.expire_all()
+        assert Order.get(simple_order.id).has_been_returned is True
+        assert Order.get(simple_order_2_books.id).has_been_returned is True
+        # simple_order lends 4 copies of simple_book, simple_order_2_books 4 more and 10 of simple_book_2
+        assert Book.get(simple_book.id).qty == 28
+        assert Book.get(simple_book_2.id).qty == 30
+
+    def test_closed_orders_are_not_closed_again(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        data = dict(order_ids=[str(simple_order.id)])
+        client.patch("/api/v1/orders/close", json=data, headers=regular_user_headers)
+        res = client.patch("/api/v1/orders/close", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json["orders"] == {str(simple_order.id): "not_found"}
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 24
+
+    def test_concurrent_bulk_and_single_closes(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_customer: Customer,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        orders = []
+        for i in range(6):
+            order = Order(customer_id=simple_customer.id, due_date="2022-10-10")
+            # Books locked in both orders, to catch a lock order mismatch
+            books = [simple_book, simple_book_2] if i % 2 else [simple_book_2, simple_book]
+            order.borrowed_books = [BorrowedBook(book_id=book.id, qty=1) for book in books]
+            order.save()
+            orders.append(str(order.id))
+        start = threading.Event()
+
+        def close_all() -> int:
+            start.wait()
+            res = app.test_client().patch(
+                "/api/v1/orders/close", json=dict(order_ids=orders[::-1]), headers=regular_user_headers
+            )
+            return list(res.json["orders"].values()).count("closed")
+
+        def close_one(order_id: str) -> int:
+            start.wait()
+            res = app.test_client().patch(f"/api/v1/orders/{order_id}/close", headers=regular_user_headers)
+            return int(res.status_code == 200)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(close_all) for _ in range(2)]
+            futures += [executor.submit(close_one, order_id) for order_id in orders]
+            start.set()
+            closed = sum(future.result() for future in futures)
+
+        assert closed == 6
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 26
+        assert Book.get(simple_book_2.id).qty == 26
+
+    def test_close_orders_error_invalid_ids(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        for data in [dict(order_ids=[]), dict(order_ids=["nope"]), dict()]:
+            res = client.patch("/api/v1/orders/close", json=data, headers=regular_user_headers)
+            assert res.status_code == 422
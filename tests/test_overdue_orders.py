@@ -0,0 +1,135 @@
+import json
+import uuid
+from datetime import date, timedelta
+from typing import Any, Mapping
+
+from flask.testing import FlaskClient
+from sqlalchemy import event, insert, text
+
+from shadow_lib.models import Book, Customer, Order
+from shadow_lib.models.db import DBConfig
+
+
+def add_orders(customer: Customer, *due_dates: date, returned: bool = False) -> list[Order]:
+    orders = [Order(customer_id=customer.id, due_date=due_date, has_been_returned=returned) for due_date in due_dates]
+    for order in orders:
+        order.save()
+    return orders
+
+
+def plan_nodes(plan: dict) -> list[dict]:
+    return [plan] + [node for child in plan.get("Plans", []) for node in plan_nodes(child)]
+
+
+class TestOverdueOrders:
+    def test_lists_open_orders_past_due(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        add_orders(simple_customer, date(2022, 1, 1), returned=True)
+        add_orders(simple_customer, date.today(), date.today() + timedelta(days=1))
+
+        res = client.get("/api/v1/orders/overdue", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.json["next_cursor"] is None
+        assert res.json["orders"] == [
+            {
+                "id": str(simple_order.id),
+                "due_date": "2022-10-10",
+                "customer": {"id": str(simple_customer.id), "fullname": "customer test"},
+                "borrowed_books": [
+                    {
+                        "id": str(simple_order.borrowed_books[0].id),
+                        "book_id": str(simple_book.id),
+                        "title": simple_book.title,
+                        "qty": 4,
+                    }
+                ],
+            }
+        ]
+
+    def test_keyset_pages(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        # Two orders on the same day, the page boundary falls between them
+        due_dates = [date(2022, 1, day) for day in (5, 1, 2, 2, 4)]
+        orders = add_orders(simple_customer, *due_dates)
+        expected = [str(order.id) for order in sorted(orders, key=lambda order: (order.due_date, order.id))]
+
+        pages: list[list[str]] = []
+        cursor = None
+        while True:
+            query = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            res = client.get("/api/v1/orders/overdue", query_string=query, headers=regular_user_headers)
+            assert res.status_code == 200
+            pages.append([order["id"] for order in res.json["orders"]])
+            cursor = res.json["next_cursor"]
+            if cursor is None:
+                break
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sum(pages, []) == expected
+
+    def test_invalid_parameters(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        for query in [{"cursor": "yesterday"}, {"cursor": "2022-01-01_nope"}, {"limit": 0}]:
+            res = client.get("/api/v1/orders/overdue", query_string=query, headers=regular_user_headers)
+            assert res.status_code == 422, query
+
+    def test_pages_from_the_index_alone(
+        self,
+        db: DBConfig,
+        simple_customer: Customer,
+        regular_user: Any,
+    ) -> None:
+        rows = [
+            dict(
+                id=uuid.uuid4(),
+                customer_id=simple_customer.id,
+                due_date=date(2022, 1, 1) + timedelta(days=i % 1500),
+                has_been_returned=i % 3 == 0,
+            )
+            for i in range(6000)
+        ]
+        db.session.execute(insert(Order), rows)
+        db.session.commit()
+        with db.get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE orders"))
+
+        statements: list[tuple[str, Any]] = []
+
+        def record(conn: Any, cursor: Any, statement: str, parameters: Any, *args: Any) -> None:
+            statements.append((statement, parameters))
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            last = Order.get_overdue(regular_user, 50)[-1]
+            Order.get_overdue(regular_user, 50, (last["due_date"], last["id"]))
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+
+        assert len(statements) == 2
+        for statement, parameters in statements:
+            with db.get_engine().connect() as conn:
+                raw = conn.connection.cursor()
+                raw.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                plan = raw.fetchone()[0]
+            plan = plan if isinstance(plan, list) else json.loads(plan)
+            scans = [node for node in plan_nodes(plan[0]["Plan"]) if node.get("Relation Name") == "orders"]
+            assert [(node["Node Type"], node["Index Name"]) for node in scans] == [
+                ("Index Only Scan", "ix_orders_overdue")
+            ]
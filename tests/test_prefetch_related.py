@@ -0,0 +1,125 @@
+import re
+from contextlib import contextmanager
+from typing import Generator, Mapping
+
+from flask.testing import FlaskClient
+from sqlalchemy import event
+
+from shadow_lib.models import Author, Book, Customer
+from shadow_lib.models.db import DBConfig
+
+
+@contextmanager
+def statements_until_commit(db: DBConfig) -> Generator[list[str], None, None]:
+    """Statements sent until the first commit, when the schema is done loading"""
+    statements: list[str] = []
+    committed = []
+
+    def record(conn, cursor, statement, *args):  # type: ignore
+        if not committed:
+            statements.append(statement)
+
+    def commit(conn):  # type: ignore
+        committed.append(True)
+
+    event.listen(db.get_engine(), "before_cursor_execute", record)
+    event.listen(db.get_engine(), "commit", commit)
+    try:
+        yield statements
+    finally:
+        event.remove(db.get_engine(), "before_cursor_execute", record)
+        event.remove(db.get_engine(), "commit", commit)
+
+
+def lookups(statements: list[str], table: str) -> list[str]:
+    # Only lookups, placing an order also locks and updates its books
+    return [
+        statement for statement in statements
+        if statement.startswith("SELECT") and not re.search(r"\bFOR (NO KEY )?UPDATE\b", statement)
+        and re.search(rf"\bFROM {table}\b", statement)
+    ]
+
+
+class TestPrefetchRelated:
+    def test_create_book_fetches_authors_once(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        simple_author_2: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        data = dict(
+            title="Two authors",
+            EAN="EAN",
+            SKU="SKU",
+            release_date="2022-10-10",
+            qty=1,
+            authors=[str(simple_author.id), str(simple_author_2.id)],
+        )
+
+        # As in a new request, nothing is loaded yet
+        db.session.expire_all()
+
+        with statements_until_commit(db) as statements:
+            res = client.post("/api/v1/books", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 201
+        assert sorted(res.json["book"]["authors"]) == sorted([str(simple_author.id), str(simple_author_2.id)])
+        assert len(lookups(statements, "authors")) == 1
+
+    def test_create_order_fetches_books_and_customer_once(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_customer: Customer,
+        simple_book: Book,
+        simple_book_2: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            borrowed_books=[
+                dict(book_id=str(simple_book.id), qty=1),
+                dict(book_id=str(simple_book_2.id), qty=1),
+            ],
+        )
+
+        # As in a new request, nothing is loaded yet
+        db.session.expire_all()
+
+        with statements_until_commit(db) as statements:
+            res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 201
+        assert len(lookups(statements, "books")) == 1
+        assert len(lookups(statements, "customers")) == 1
+
+    def test_unknown_and_invalid_ids_still_reported(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        random_uuid: str,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        data = dict(
+            title="Unknown author",
+            EAN="EAN",
+            SKU="SKU",
+            release_date="2022-10-10",
+            qty=1,
+            authors=[str(simple_author.id), str(random_uuid), "not-a-uuid"],
+        )
+
+        res = client.post("/api/v1/books", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 422
+        assert res.json["authors"] == {
+            "1": ["Related Object doesn't exist in DB"],
+            "2": ["Not a valid UUID."],
+        }
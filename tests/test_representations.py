@@ -0,0 +1,175 @@
+import json
+import uuid
+from datetime import date, datetime
+from typing import Mapping
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+
+from shadow_lib.api import representations
+from shadow_lib.models import Author, Book
+from shadow_lib.models.db import DBConfig
+
+DATA = {
+    "id": uuid.UUID("8c1b4f1e-4d3b-4a8e-9a55-3f7f0b8f6a10"),
+    "release_date": date(2022, 10, 10),
+    "created_at": datetime(2022, 10, 10, 8, 30, 15, 123456),
+    "ids": [uuid.UUID("00000000-0000-0000-0000-000000000001")],
+    "title": "Città invisibili",
+}
+
+EXPECTED = {
+    "id": "8c1b4f1e-4d3b-4a8e-9a55-3f7f0b8f6a10",
+    "release_date": "2022-10-10",
+    "created_at": "2022-10-10T08:30:15.123456",
+    "ids": ["00000000-0000-0000-0000-000000000001"],
+    "title": "Città invisibili",
+}
+
+
+class TestJsonRepresentation:
+    @pytest.mark.parametrize("native", [True, False])
+    def test_encodes_uuid_and_dates(self, app: Flask, monkeypatch: pytest.MonkeyPatch, native: bool) -> None:
+        if not native:
+            monkeypatch.setattr(representations, "orjson", None)
+
+        with app.app_context():
+            dumped = representations.dumps(DATA)
+
+        assert dumped.endswith(b"\n")
+        assert json.loads(dumped) == EXPECTED
+
+    def test_unknown_type(self, app: Flask, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(representations, "orjson", None)
+
+        with app.app_context(), pytest.raises(TypeError):
+            representations.dumps({"value": object()})
+
+    def test_api_response(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        assert res.content_type == "application/json"
+        assert res.json["book"]["created_by"] == str(simple_book.created_by_id)
+        assert res.json["book"]["authors"] == [str(author.id) for author in simple_book.authors]
+
+
+class TestBinaryRepresentations:
+    @pytest.mark.parametrize("accept", ["application/msgpack", "application/x-msgpack", "application/cbor"])
+    def test_same_output_as_json(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+        accept: str,
+    ) -> None:
+
+        loads = pytest.importorskip("cbor2" if accept.endswith("cbor") else "msgpack")
+        expected = client.get("/api/v1/books", headers=regular_user_headers).json
+
+        # Twice, as the second response comes from the response cache
+        for _ in range(2):
+            res = client.get("/api/v1/books", headers={**regular_user_headers, "Accept": accept})
+            assert res.status_code == 200
+            assert res.mimetype == accept
+            assert "Accept" in res.headers["Vary"]
+
+            # UUIDs and dates are strings in every representation
+            decoded = loads.loads(res.data) if accept.endswith("cbor") else loads.unpackb(res.data)
+            assert decoded == expected
+
+    def test_unknown_accept_falls_back_to_json(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get(f"/api/v1/books/{simple_book.id}", headers={**regular_user_headers, "Accept": "text/csv"})
+
+        assert res.mimetype == "application/json"
+        assert res.json["book"]["id"] == str(simple_book.id)
+
+    def test_msgpack_request_body(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        msgpack = pytest.importorskip("msgpack")
+        data = dict(
+            title="Packed",
+            EAN="EAN",
+            SKU="SKU",
+            release_date="2022-10-10",
+            qty=1,
+            authors=[str(simple_author.id)],
+        )
+
+        res = client.post(
+            "/api/v1/books",
+            data=msgpack.packb(data),
+            content_type="application/msgpack",
+            headers={**regular_user_headers, "Accept": "application/msgpack"},
+        )
+
+        assert res.status_code == 201
+        assert msgpack.unpackb(res.data)["book"]["authors"] == [str(simple_author.id)]
+
+    def test_cbor_request_body_with_uuid_tags(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        cbor2 = pytest.importorskip("cbor2")
+        data = dict(
+            title="Tagged",
+            EAN="EAN",
+            SKU="SKU",
+            release_date="2022-10-10",
+            qty=1,
+            authors=[simple_author.id],
+        )
+
+        res = client.post(
+            "/api/v1/books",
+            data=cbor2.dumps(data),
+            content_type="application/cbor",
+            headers=regular_user_headers,
+        )
+
+        assert res.status_code == 201
+        assert res.json["book"]["authors"] == [str(simple_author.id)]
+
+    def test_undecodable_body(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        pytest.importorskip("msgpack")
+
+        res = client.post(
+            "/api/v1/authors",
+            data=b"\xc1\xc1",
+            content_type="application/msgpack",
+            headers=regular_user_headers,
+        )
+
+        assert res.status_code == 400
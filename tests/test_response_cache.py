@@ -0,0 +1,237 @@
+import re
+from typing import Any, Generator, Mapping, Optional
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event
+
+from shadow_lib.api.response_cache import LocalCacheBackend, SharedCacheBackend, response_cache
+from shadow_lib.models import Author, Book
+from shadow_lib.models.book import book_search_cache
+from shadow_lib.models.db import DBConfig
+
+
+class LocalSharedStore:
+    """Stand-in for a redis client shared by several workers"""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        self.data[key] = value
+
+    def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key: str) -> int:
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+class UnavailableStore(LocalSharedStore):
+    """Shared store that is down for writes"""
+
+    def incr(self, key: str) -> int:
+        raise ConnectionError("store unavailable")
+
+
+@pytest.fixture
+def shared_store(app: Flask) -> Generator[LocalSharedStore, None, None]:
+    store = LocalSharedStore()
+    response_cache.init_app(app, backend=SharedCacheBackend(store))
+    yield store
+    response_cache.init_app(app)
+
+
+def list_queries(db: DBConfig, client: FlaskClient, url: str, headers: Mapping[str, str]) -> tuple[Any, list[str]]:
+    statements: list[str] = []
+
+    def record(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(db.get_engine(), "before_cursor_execute", record)
+    try:
+        res = client.get(url, headers=headers)
+    finally:
+        event.remove(db.get_engine(), "before_cursor_execute", record)
+
+    table = url.rsplit("/", 1)[-1]
+    return res, [statement for statement in statements if re.search(rf"\bFROM {table}\b", statement)]
+
+
+class TestResponseCache:
+    def test_hit_skips_loading(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        first, queries = list_queries(db, client, "/api/v1/books", regular_user_headers)
+        assert first.status_code == 200
+        assert queries
+
+        second, queries = list_queries(db, client, "/api/v1/books", regular_user_headers)
+        assert second.status_code == 200
+        assert queries == []
+        assert second.data == first.data
+        assert second.headers["ETag"] == first.headers["ETag"]
+        assert isinstance(response_cache.backend, LocalCacheBackend)
+        assert response_cache.backend.entries.stats()["hits"] == 1
+
+    def test_write_invalidates(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/authors", headers=regular_user_headers)
+        assert len(res.json["authors"]) == 1
+
+        data = {"first_name": "new", "last_name": "author"}
+        res = client.post("/api/v1/authors", json=data, headers=regular_user_headers)
+        assert res.status_code == 201
+
+        res = client.get("/api/v1/authors", headers=regular_user_headers)
+        assert len(res.json["authors"]) == 2
+
+    def test_keyed_by_role_and_query_string(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+        superadmin_headers: Mapping[str, str],
+    ) -> None:
+
+        client.get("/api/v1/authors", headers=regular_user_headers)
+        client.get("/api/v1/authors", headers=superadmin_headers)
+        client.get("/api/v1/authors?page=2", headers=regular_user_headers)
+
+        assert response_cache.backend.entries.stats()["size"] == 3
+        assert response_cache.backend.entries.stats()["hits"] == 0
+
+    def test_hit_answers_if_none_match(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        etag = client.get("/api/v1/authors", headers=regular_user_headers).headers["ETag"]
+
+        res = client.get("/api/v1/authors", headers={**regular_user_headers, "If-None-Match": etag})
+        assert res.status_code == 304
+        assert response_cache.backend.entries.stats()["hits"] == 1
+
+    def test_shared_backend(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        shared_store: LocalSharedStore,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        first, queries = list_queries(db, client, "/api/v1/authors", regular_user_headers)
+        assert queries
+
+        second, queries = list_queries(db, client, "/api/v1/authors", regular_user_headers)
+        assert queries == []
+        assert second.data == first.data
+
+        # A write in another worker only moves the shared counters
+        shared_store.incr("shadow_lib:version:authors")
+
+        third, queries = list_queries(db, client, "/api/v1/authors", regular_user_headers)
+        assert queries
+        assert third.data == first.data
+
+        # Local writes are forwarded to the shared counters
+        data = {"first_name": "new", "last_name": "author"}
+        client.post("/api/v1/authors", json=data, headers=regular_user_headers)
+
+        res = client.get("/api/v1/authors", headers=regular_user_headers)
+        assert len(res.json["authors"]) == 2
+
+    def test_local_entries_expire(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_author: Author,
+        regular_user_headers: Mapping[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+
+        client.get("/api/v1/authors", headers=regular_user_headers)
+        monkeypatch.setattr(response_cache, "ttl", -1)
+        client.get("/api/v1/authors?page=2", headers=regular_user_headers)
+
+        client.get("/api/v1/authors?page=2", headers=regular_user_headers)
+        client.get("/api/v1/authors", headers=regular_user_headers)
+        stats = response_cache.backend.entries.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 3)
+
+    def test_shared_counters_bumped_on_commit_only(
+        self,
+        db: DBConfig,
+        shared_store: LocalSharedStore,
+        simple_author: Author,
+    ) -> None:
+
+        before = shared_store.get("shadow_lib:version:authors")
+
+        simple_author.first_name = "renamed"
+        db.session.flush()
+        assert shared_store.get("shadow_lib:version:authors") == before
+
+        db.session.commit()
+        assert int(shared_store.get("shadow_lib:version:authors")) == int(before or 0) + 1
+
+    def test_shared_store_outage_keeps_writes(
+        self,
+        db: DBConfig,
+        app: Flask,
+        client: FlaskClient,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        response_cache.init_app(app, backend=SharedCacheBackend(UnavailableStore()))
+        try:
+            data = {"first_name": "new", "last_name": "author"}
+            res = client.post("/api/v1/authors", json=data, headers=regular_user_headers)
+        finally:
+            response_cache.init_app(app)
+
+        assert res.status_code == 201
+        res = client.get("/api/v1/authors", headers=regular_user_headers)
+        assert len(res.json["authors"]) == 1
+
+    def test_shared_counters_invalidate_book_search(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        shared_store: LocalSharedStore,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+
+        client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        assert book_search_cache.stats()["hits"] == 1
+
+        # A catalogue write in another worker
+        shared_store.incr("shadow_lib:version:books")
+
+        client.get("/api/v1/books/search?q=test", headers=regular_user_headers)
+        assert book_search_cache.stats()["hits"] == 1
+        assert book_search_cache.stats()["misses"] == 2
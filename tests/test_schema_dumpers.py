@@ -0,0 +1,56 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Mapping
+
+from flask import Flask
+from flask.testing import FlaskClient
+
+from shadow_lib.api.schemas import BookSchema, UserSchema, schema_dumper
+from shadow_lib.models import Author, Book, User
+from shadow_lib.models.db import DBConfig
+
+
+class TestSchemaDumper:
+    def test_one_instance_per_options(self) -> None:
+        assert schema_dumper(BookSchema) is schema_dumper(BookSchema)
+        assert schema_dumper(UserSchema, exclude=["password"]) is schema_dumper(UserSchema, exclude=("password",))
+        assert schema_dumper(UserSchema, exclude=["password"]) is not schema_dumper(UserSchema)
+
+    def test_built_outside_requests(self, app: Flask, regular_user: User) -> None:
+        # Reading the current user is deferred to validation
+        schema = UserSchema(exclude=["password"])
+
+        dumped = schema.dump(regular_user)
+        assert dumped["email"] == regular_user.email
+        assert "password" not in dumped
+
+    def test_shared_between_threads(self) -> None:
+        authors = [Author(id=uuid.uuid4(), first_name="Italo", last_name=f"Calvino{index}") for index in range(5)]
+        books = []
+        for index in range(200):
+            book = Book(id=uuid.uuid4(), title=f"Book {index}", EAN="EAN", SKU="SKU", release_date=date(2020, 1, 1), qty=1)
+            book.authors = authors[index % 5:]
+            books.append(book)
+
+        expected = BookSchema(many=True).dump(books)
+        schema = schema_dumper(BookSchema)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: schema.dump(books, many=True), range(32)))
+
+        assert all(result == expected for result in results)
+
+    def test_api_output_unchanged(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        regular_user: User,
+        superadmin_headers: Mapping[str, str],
+    ) -> None:
+
+        res = client.get("/api/v1/users", headers=superadmin_headers)
+
+        assert res.status_code == 200
+        assert {user["email"] for user in res.json["users"]} == {"normaluser@email.com", "superuser@email.com"}
+        assert all("password" not in user for user in res.json["users"])
@@ -0,0 +1,434 @@
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Mapping
+
+from click.testing import CliRunner
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event, func, select, update
+
+from shadow_lib.commands import shard_stock
+from shadow_lib.models import Book, BookHold, BookStockSlot, BorrowedBook, Customer, Order, User
+from shadow_lib.models.db import DBConfig
+from shadow_lib.models.versions import table_versions
+
+
+class TestDecrementStock:
+    def test_takes_only_available_copies(self, db: DBConfig, simple_book: Book) -> None:
+        before = table_versions.get("books")
+
+        assert Book.decrement_stock(simple_book.id, 15) == 5
+        assert simple_book.qty == 5
+        assert Book.decrement_stock(simple_book.id, 6) is None
+        assert Book.increment_stock(simple_book.id, 2) == 7
+
+        db.session.commit()
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 7
+        # Caches built on the books table are dropped
+        assert table_versions.get("books") > before
+
+    def test_concurrent_borrowings_never_oversell(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        available = simple_book.qty
+        attempts = available + 24
+        start = threading.Event()
+        statements = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append(statement)
+
+        def borrow() -> int:
+            start.wait()
+            data = dict(book_id=str(simple_book.id), order_id=str(simple_order.id), qty=1)
+            return app.test_client().post("/api/v1/borrowed-books", json=data, headers=regular_user_headers).status_code
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [executor.submit(borrow) for _ in range(attempts)]
+                start.set()
+                statuses = [future.result() for future in futures]
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+
+        assert statuses.count(201) == available
+        assert statuses.count(422) == attempts - available
+
+        # Without holds, each borrowing checks and takes the stock in one UPDATE
+        # and nothing else locks the book
+        stock_updates = [statement for statement in statements if statement.startswith("UPDATE books ")]
+        assert len(stock_updates) == attempts
+        assert not any("pg_advisory" in statement for statement in statements)
+        assert not any(statement.startswith("SELECT") and " FOR " in statement for statement in statements)
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 0
+        assert BorrowedBook.count() == 1 + available
+
+
+    def test_held_books_are_taken_under_the_hold_lock(
+        self, db: DBConfig, simple_book: Book, simple_book_2: Book, regular_user: User
+    ) -> None:
+        BookHold.place(simple_book.id, 15, ttl=60, current_user=regular_user)
+        db.session.commit()
+        statements = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append(statement)
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            left = Book.decrement_stocks({simple_book.id: 6, simple_book_2.id: 6})
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+
+        # The held copies stay, the book without holds is taken straight away
+        assert left == {simple_book_2.id: 14}
+        assert len([statement for statement in statements if "pg_advisory_xact_lock_shared" in statement]) == 1
+        assert Book.decrement_stock(simple_book.id, 5) == 15
+        db.session.rollback()
+
+        # Once the holds can't be active any more, the hold lock isn't taken
+        db.session.execute(update(Book).values(held_until=func.now() - timedelta(seconds=1)))
+        db.session.execute(update(BookHold).values(expires_at=func.now() - timedelta(seconds=1)))
+        db.session.commit()
+        statements.clear()
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        try:
+            assert Book.decrement_stock(simple_book.id, 20) == 0
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+        assert not any("pg_advisory" in statement for statement in statements)
+
+
+class TestOrderStock:
+    def test_failed_order_keeps_stock(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            borrowed_books=[
+                dict(book_id=str(simple_book.id), qty=5),
+                dict(book_id=str(simple_book_2.id), qty=1000),
+            ],
+        )
+
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 422
+        assert res.json["borrowed_books"]["book"] == [f"Quantity for this book {simple_book_2.id} is too much"]
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 20
+        assert Book.get(simple_book_2.id).qty == 20
+
+    def test_lowering_borrowed_quantity_gives_copies_back(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        br_book = simple_order.borrowed_books[0]
+        Book.decrement_stock(simple_book.id, br_book.qty)
+        db.session.commit()
+
+        res = client.patch(
+            f"/api/v1/borrowed-books/{br_book.id}",
+            json=dict(order_id=str(simple_order.id), qty=1),
+            headers=regular_user_headers,
+        )
+
+        assert res.status_code == 200
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 19
+
+
+class TestOrderPlacement:
+    def test_one_stock_statement_and_one_commit(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            borrowed_books=[dict(book_id=str(book.id), qty=2) for book in [simple_book, simple_book_2, simple_book_3]],
+        )
+        statements = []
+        commits = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append(statement)
+
+        def commit(conn: Any) -> None:
+            commits.append(True)
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        event.listen(db.get_engine(), "commit", commit)
+        try:
+            res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+            event.remove(db.get_engine(), "commit", commit)
+
+        assert res.status_code == 201
+        assert len([statement for statement in statements if statement.startswith("UPDATE books")]) == 1
+        assert len(commits) == 1
+
+        db.session.expire_all()
+        assert [Book.get(book.id).qty for book in [simple_book, simple_book_2, simple_book_3]] == [18, 18, 18]
+
+    def test_lines_of_the_same_book_add_up(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        data = dict(
+            customer=str(simple_customer.id),
+            due_date="2022-10-10",
+            borrowed_books=[dict(book_id=str(simple_book.id), qty=15), dict(book_id=str(simple_book.id), qty=15)],
+        )
+
+        res = client.post("/api/v1/orders", json=data, headers=regular_user_headers)
+
+        assert res.status_code == 422
+        assert res.json["borrowed_books"]["book"] == [f"Quantity for this book {simple_book.id} is too much"]
+        assert Order.count() == 0
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 20
+
+    def test_concurrent_orders_in_any_book_order(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        attempts = 30
+        start = threading.Event()
+
+        def place(index: int) -> int:
+            books = [simple_book, simple_book_2] if index % 2 else [simple_book_2, simple_book]
+            data = dict(
+                customer=str(simple_customer.id),
+                due_date="2022-10-10",
+                borrowed_books=[dict(book_id=str(book.id), qty=1) for book in books],
+            )
+            start.wait()
+            return app.test_client().post("/api/v1/orders", json=data, headers=regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(place, index) for index in range(attempts)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses.count(201) == 20
+        assert statuses.count(422) == attempts - 20
+
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 0
+        assert Book.get(simple_book_2.id).qty == 0
+        assert Order.count() == 20
+
+
+class TestRestoreStock:
+    def order_of_30_lines(self, customer: Customer, books: list[Book]) -> Order:
+        order = Order(customer_id=customer.id, due_date="2022-10-10")
+        order.borrowed_books = [BorrowedBook(book_id=books[index % len(books)].id, qty=1) for index in range(30)]
+        order.save()
+        return order
+
+    def test_close_in_one_statement(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_book_3: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        books = [simple_book, simple_book_2, simple_book_3]
+        order = self.order_of_30_lines(simple_customer, books)
+        db.session.expire_all()
+        statements = []
+        commits = []
+
+        def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append(statement)
+
+        def commit(conn: Any) -> None:
+            commits.append(True)
+
+        event.listen(db.get_engine(), "before_cursor_execute", record)
+        event.listen(db.get_engine(), "commit", commit)
+        try:
+            res = client.patch(f"/api/v1/orders/{order.id}/close", headers=regular_user_headers)
+        finally:
+            event.remove(db.get_engine(), "before_cursor_execute", record)
+            event.remove(db.get_engine(), "commit", commit)
+
+        assert res.status_code == 200
+        assert res.json["order"]["has_been_returned"] is True
+        assert len([statement for statement in statements if statement.startswith("UPDATE books")]) == 1
+        assert not [statement for statement in statements if statement.startswith("SELECT books")]
+        assert len(commits) == 1
+
+        db.session.expire_all()
+        # 10 lines of one copy for each book
+        assert [Book.get(book.id).qty for book in books] == [30, 30, 30]
+
+    def test_delete_gives_copies_back(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        order = self.order_of_30_lines(simple_customer, [simple_book, simple_book_2])
+
+        res = client.delete(f"/api/v1/orders/{order.id}", headers=regular_user_headers)
+
+        assert res.status_code == 200
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 35
+        assert Book.get(simple_book_2.id).qty == 35
+        assert BorrowedBook.count() == 0
+
+
+def slot_quantities(db: DBConfig, book: Book) -> list[int]:
+    slots_query = select(BookStockSlot.qty).where(BookStockSlot.book_id == book.id).order_by(BookStockSlot.slot)
+    return db.session.execute(slots_query).scalars().all()
+
+
+class TestShardedStock:
+    def test_payload_shows_the_whole_stock(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_order: Order,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        result = CliRunner().invoke(shard_stock, [str(simple_book.id), "3"])
+        assert result.exit_code == 0
+        assert slot_quantities(db, simple_book) == [7, 7, 6]
+
+        res = client.get(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers)
+        assert res.json["book"]["qty"] == 20
+        assert "stock_slots" not in res.json["book"]
+
+        data = dict(book_id=str(simple_book.id), order_id=str(simple_order.id), qty=2)
+        res = client.post("/api/v1/borrowed-books", json=data, headers=regular_user_headers)
+        assert res.status_code == 201
+
+        res = client.get(f"/api/v1/books/{simple_book.id}", headers=regular_user_headers)
+        assert res.json["book"]["qty"] == 18
+        assert sum(slot_quantities(db, simple_book)) == 18
+
+        search = dict(q=simple_book.title, in_stock=True)
+        res = client.get("/api/v1/books/search", query_string=search, headers=regular_user_headers)
+        assert [book["id"] for book in res.json["books"]] == [str(simple_book.id)]
+
+    def test_sweeps_fragmented_slots_and_the_shelf(self, db: DBConfig, simple_book: Book) -> None:
+        Book.shard_stock(simple_book.id, 4)
+        Book.increment_stock(simple_book.id, 3)
+        db.session.commit()
+
+        # No slot has 6 copies, they are taken from the first ones
+        assert Book.decrement_stock(simple_book.id, 6) == 17
+        assert slot_quantities(db, simple_book) == [0, 4, 5, 5]
+        assert Book.decrement_stock(simple_book.id, 17) == 0
+        assert Book.decrement_stock(simple_book.id, 1) is None
+        db.session.commit()
+
+        db.session.expire_all()
+        book = Book.get(simple_book.id)
+        assert (book.qty, book.slots_qty) == (0, 0)
+
+    def test_patch_and_gather_back(
+        self,
+        db: DBConfig,
+        client: FlaskClient,
+        simple_book: Book,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        Book.shard_stock(simple_book.id, 2)
+        db.session.commit()
+
+        res = client.patch(f"/api/v1/books/{simple_book.id}", json=dict(qty=30), headers=regular_user_headers)
+        assert res.status_code == 200
+        assert res.json["book"]["qty"] == 30
+        assert slot_quantities(db, simple_book) == [15, 15]
+
+        result = CliRunner().invoke(shard_stock, [str(simple_book.id), "0"])
+        assert result.exit_code == 0
+        db.session.expire_all()
+        assert Book.get(simple_book.id).qty == 30
+        assert db.session.execute(select(func.count()).select_from(BookStockSlot)).scalar() == 0
+
+    def test_concurrent_orders_never_oversell(
+        self,
+        app: Flask,
+        db: DBConfig,
+        simple_book: Book,
+        simple_book_2: Book,
+        simple_customer: Customer,
+        regular_user_headers: Mapping[str, str],
+    ) -> None:
+        Book.shard_stock(simple_book.id, 4)
+        db.session.commit()
+        attempts = 30
+        start = threading.Event()
+
+        def place() -> int:
+            data = dict(
+                customer=str(simple_customer.id),
+                due_date="2022-10-10",
+                borrowed_books=[dict(book_id=str(book.id), qty=1) for book in [simple_book, simple_book_2]],
+            )
+            start.wait()
+            return app.test_client().post("/api/v1/orders", json=data, headers=regular_user_headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(place) for _ in range(attempts)]
+            start.set()
+            statuses = [future.result() for future in futures]
+
+        assert statuses.count(201) == 20
+        assert statuses.count(422) == attempts - 20
+
+        db.session.expire_all()
+        assert slot_quantities(db, simple_book) == [0, 0, 0, 0]
+        assert Book.get(simple_book_2.id).qty == 0